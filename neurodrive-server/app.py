@@ -9,6 +9,9 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.providers.llm.client_pool import close_all as close_llm_clients
+from core.providers.tools.server_mcp.mcp_pool import mcp_pool
+from core.utils.report_pipeline import report_pipeline
 
 TAG = __name__
 logger = setup_logging()
@@ -128,6 +131,12 @@ async def main():
             timeout=3.0,
             return_when=asyncio.ALL_COMPLETED,
         )
+        # 关闭共享的LLM连接池
+        await close_llm_clients()
+        # 关闭共享的服务端MCP子进程
+        await mcp_pool.shutdown()
+        # 未上报的聊天记录写入磁盘，下次启动后补报
+        report_pipeline.close()
         print("服务器已关闭，程序退出。")
 
 
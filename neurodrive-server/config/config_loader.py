@@ -1,8 +1,21 @@
 import os
 import yaml
+import threading
 from collections.abc import Mapping
 from config.manage_api_client import init_service, get_server_config, get_agent_models
 
+# 仅在本地配置中维护的运行时参数，从API读取配置时同样以本地为准
+LOCAL_ONLY_KEYS = [
+    "worker_pools",
+    "mcp_pool",
+    "tts_cache",
+    "device_config_cache",
+    "provider_pool",
+    "cache_backend",
+    "vision",
+    "chat_report",
+]
+
 
 def get_project_dir():
     """获取项目根目录"""
@@ -15,32 +28,83 @@ def read_config(config_path):
     return config
 
 
+class ConfigStore:
+    """全局配置快照
+
+    配置只在启动时加载一次，之后通过publish整体替换并递增版本号；
+    已发布的配置不再原地修改，连接级的差异通过ConfigOverlay写时复制
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = None
+        self.version = 0
+
+    def get(self):
+        return self._config
+
+    def publish(self, config) -> int:
+        """发布新的配置快照，返回新版本号"""
+        with self._lock:
+            self._config = config
+            self.version += 1
+            return self.version
+
+
+config_store = ConfigStore()
+_load_lock = threading.Lock()
+
+
+class ConfigOverlay(dict):
+    """连接级配置
+
+    浅拷贝全局快照的顶层，嵌套配置与快照共享；
+    需要修改嵌套配置时先调用writable按路径复制，避免影响快照和其他连接
+    """
+
+    def __init__(self, base):
+        super().__init__(base)
+        self.version = config_store.version
+        self._owned = set()
+
+    def writable(self, *path) -> dict:
+        """返回path指向的可修改字典，路径上尚未复制的层级按需复制"""
+        node = self
+        for depth, key in enumerate(path, start=1):
+            if path[:depth] not in self._owned:
+                node[key] = dict(node.get(key) or {})
+                self._owned.add(path[:depth])
+            node = node[key]
+        return node
+
+
 def load_config():
-    """加载配置文件"""
-    from core.utils.cache.manager import cache_manager, CacheType
-
-    # 检查缓存
-    cached_config = cache_manager.get(CacheType.CONFIG, "main_config")
-    if cached_config is not None:
-        return cached_config
-
-    default_config_path = get_project_dir() + "config.yaml"
-    custom_config_path = get_project_dir() + "data/.config.yaml"
-
-    # 加载默认配置
-    default_config = read_config(default_config_path)
-    custom_config = read_config(custom_config_path)
-
-    if custom_config.get("manager-api", {}).get("url"):
-        config = get_config_from_api(custom_config)
-    else:
-        # 合并配置
-        config = merge_configs(default_config, custom_config)
-    # 初始化目录
-    ensure_directories(config)
-
-    # 缓存配置
-    cache_manager.set(CacheType.CONFIG, "main_config", config)
+    """加载配置文件（只在首次调用时读取，之后返回当前快照）"""
+    config = config_store.get()
+    if config is not None:
+        return config
+
+    with _load_lock:
+        config = config_store.get()
+        if config is not None:
+            return config
+
+        default_config_path = get_project_dir() + "config.yaml"
+        custom_config_path = get_project_dir() + "data/.config.yaml"
+
+        # 加载默认配置
+        default_config = read_config(default_config_path)
+        custom_config = read_config(custom_config_path)
+
+        if custom_config.get("manager-api", {}).get("url"):
+            config = get_config_from_api(custom_config)
+        else:
+            # 合并配置
+            config = merge_configs(default_config, custom_config)
+        # 初始化目录
+        ensure_directories(config)
+
+        config_store.publish(config)
     return config
 
 
@@ -68,6 +132,9 @@ def get_config_from_api(config):
             "vision_explain": config["server"].get("vision_explain", ""),
             "auth_key": config["server"].get("auth_key", ""),
         }
+    for key in LOCAL_ONLY_KEYS:
+        if config.get(key) is not None:
+            config_data[key] = config[key]
     return config_data
 
 
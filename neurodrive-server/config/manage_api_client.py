@@ -1,7 +1,7 @@
 import os
 import time
 import base64
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import httpx
 
@@ -197,6 +197,35 @@ def report(
         return None
 
 
+def report_batch(records: List[Dict]) -> None:
+    """批量上报聊天记录（单次请求不重试，失败时抛出异常，由上报流水线落盘后重试）"""
+    ManageApiClient._instance._request(
+        "POST", "/agent/chat-history/report/batch", json={"records": records}
+    )
+
+
+def report_record(record: Dict) -> None:
+    """上报单条聊天记录（manager-api不支持批量接口时使用，不重试）"""
+    ManageApiClient._instance._request(
+        "POST", "/agent/chat-history/report", json=record
+    )
+
+
+def is_endpoint_missing(exception: Exception) -> bool:
+    """manager-api是否不存在该接口（旧版本）"""
+    return isinstance(exception, httpx.HTTPStatusError) and (
+        exception.response.status_code in (404, 405)
+    )
+
+
+def is_retryable(exception: Exception) -> bool:
+    """网络错误、超时或服务端繁忙，稍后可以重试"""
+    return ManageApiClient._should_retry(exception)
+
+
+def is_api_ready() -> bool:
+    return ManageApiClient._instance is not None
+
 
 def get_car_wakeup_word(device_id: str) -> Optional[str]:
     """通过车载设备ID获取唤醒词（car_name）"""
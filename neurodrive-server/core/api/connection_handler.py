@@ -78,11 +78,7 @@ class ConnectionHandler(BaseHandler):
                 return {"success": False, "message": "WebSocket服务器未初始化"}
             
             # 查找指定设备的连接
-            target_handler = None
-            for handler in self.websocket_server.active_connections:
-                if hasattr(handler, 'device_id') and handler.device_id == device_id:
-                    target_handler = handler
-                    break
+            target_handler = self.websocket_server.get_connection(device_id)
             
             if target_handler:
                 # 主动关闭连接
@@ -62,13 +62,7 @@ class DeviceControlHandler(BaseHandler):
                 )
 
             # 查找目标设备连接
-            target_connection = None
-            print(f"正在查找设备连接: {device_id}")
-            for conn in self.websocket_server.active_connections:
-                if conn.device_id == device_id:
-                    target_connection = conn
-                    print(f"找到设备连接: {conn.device_id}")
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 try:
@@ -112,15 +106,14 @@ class DeviceControlHandler(BaseHandler):
                 )
             except asyncio.TimeoutError:
                 is_online = False
-                for conn in self.websocket_server.active_connections:
-                    if hasattr(conn, "device_id") and conn.device_id == device_id and hasattr(conn, "websocket") and conn.websocket:
-                        try:
-                            pong_waiter = await conn.websocket.ping()
-                            await asyncio.wait_for(pong_waiter, timeout=1.0)
-                            is_online = True
-                        except Exception:
-                            is_online = False
-                        break
+                conn = self.websocket_server.get_connection(device_id)
+                if conn is not None and getattr(conn, "websocket", None):
+                    try:
+                        pong_waiter = await conn.websocket.ping()
+                        await asyncio.wait_for(pong_waiter, timeout=1.0)
+                        is_online = True
+                    except Exception:
+                        is_online = False
                 status_msg = "设备在线但未确认指令" if is_online else "设备未在线"
                 try:
                     new_status = 1 if is_online else 0
@@ -231,9 +224,11 @@ class DeviceControlHandler(BaseHandler):
             
         group_info = self.active_groups[group_id]
         
-        for member_device_id in group_info["members"]:
+        # 遍历副本，循环中会移除已断开的设备
+        for member_device_id in list(group_info["members"]):
             # 找到对应的连接并发送消息
-            if hasattr(conn, 'device_id') and conn.device_id == member_device_id:
+            conn = self.websocket_server.get_connection(member_device_id) if self.websocket_server else None
+            if conn is not None:
                     try:
                         # 检查WebSocket连接状态
                         if hasattr(conn, 'websocket') and conn.websocket and not conn.websocket.closed:
@@ -262,5 +257,4 @@ class DeviceControlHandler(BaseHandler):
                                 group_info["members"].remove(member_device_id)
                     except Exception as e:
                         print(f"向设备 {member_device_id} 发送群聊消息失败: {e}")
-                    break
     
\ No newline at end of file
@@ -13,7 +13,7 @@ class DeviceStatusHandler(BaseHandler):
         super().__init__(config)
         self.websocket_server = websocket_server
 
-    def _check_device_status(self, device_id):
+    async def _check_device_status(self, device_id):
         """检查特定设备的在线状态
         
         Args:
@@ -26,35 +26,34 @@ class DeviceStatusHandler(BaseHandler):
             return {"status": 0, "message": "WebSocket服务器未初始化"}
         
         # 查找指定设备
-        for conn in self.websocket_server.active_connections:
-            if hasattr(conn, "device_id") and conn.device_id == device_id:
-                device_info = {
-                    "status": 1,  # 在线
-                    "device_id": conn.device_id,
-                    "last_activity": getattr(conn, "last_activity_time", 0),
-                    "client_ip": getattr(conn, "client_ip", "unknown")
-                }
-                
-                # 如果有设备名称，也添加进去
-                if hasattr(conn, "device_name") and conn.device_name:
-                    device_info["device_name"] = conn.device_name
-                
-                
-                # 从缓存读取音量与麦克风状态
-                cache_key = f"device_info:{device_id}"
-                cached = cache_manager.get(CacheType.DEVICE_INFO, cache_key)
-                if cached is not None:
-                    if "volume" in cached:
-                        device_info["volume"] = cached["volume"]
-                    if "microphone" in cached:
-                        device_info["microphone"] = cached["microphone"]
-                
-                return device_info
-        
-        # 设备不在线
-        return {"status": 0, "device_id": device_id, "message": "设备离线"}
-
-    def _check_device_status_simple(self, device_id):
+        conn = self.websocket_server.get_connection(device_id)
+        if conn is None:
+            # 设备不在线
+            return {"status": 0, "device_id": device_id, "message": "设备离线"}
+
+        device_info = {
+            "status": 1,  # 在线
+            "device_id": conn.device_id,
+            "last_activity": getattr(conn, "last_activity_time", 0),
+            "client_ip": getattr(conn, "client_ip", "unknown")
+        }
+
+        # 如果有设备名称，也添加进去
+        if hasattr(conn, "device_name") and conn.device_name:
+            device_info["device_name"] = conn.device_name
+
+        # 从缓存读取音量与麦克风状态
+        cache_key = f"device_info:{device_id}"
+        cached = await cache_manager.aget(CacheType.DEVICE_INFO, cache_key)
+        if cached is not None:
+            if "volume" in cached:
+                device_info["volume"] = cached["volume"]
+            if "microphone" in cached:
+                device_info["microphone"] = cached["microphone"]
+
+        return device_info
+
+    async def _check_device_status_simple(self, device_id):
         """检查特定设备的在线状态（简化版本，仅返回status字段）
         
         Args:
@@ -67,21 +66,20 @@ class DeviceStatusHandler(BaseHandler):
             return {"status": 0}
         
         # 查找指定设备
-        for conn in self.websocket_server.active_connections:
-            if hasattr(conn, "device_id") and conn.device_id == device_id:
-                # 简化返回：status + 缓存的volume/microphone（如果有）
-                result = {"status": 1}
-                cache_key = f"device_info:{device_id}"
-                cached = cache_manager.get(CacheType.DEVICE_INFO, cache_key)
-                if cached is not None:
-                    if "volume" in cached:
-                        result["volume"] = cached["volume"]
-                    if "microphone" in cached:
-                        result["microphone"] = cached["microphone"]
-                return result
-        
-        # 设备不在线
-        return {"status": 0}
+        if self.websocket_server.get_connection(device_id) is None:
+            # 设备不在线
+            return {"status": 0}
+
+        # 简化返回：status + 缓存的volume/microphone（如果有）
+        result = {"status": 1}
+        cache_key = f"device_info:{device_id}"
+        cached = await cache_manager.aget(CacheType.DEVICE_INFO, cache_key)
+        if cached is not None:
+            if "volume" in cached:
+                result["volume"] = cached["volume"]
+            if "microphone" in cached:
+                result["microphone"] = cached["microphone"]
+        return result
 
     async def handle_get(self, request):
         """处理获取在线设备列表的GET请求，支持通过device_id查询特定设备状态"""
@@ -91,7 +89,7 @@ class DeviceStatusHandler(BaseHandler):
             
             if device_id:
                 # 查询特定设备状态
-                device_status = self._check_device_status(device_id)
+                device_status = await self._check_device_status(device_id)
                 response = web.Response(
                     text=json.dumps({
                         "success": True,
@@ -113,8 +111,8 @@ class DeviceStatusHandler(BaseHandler):
 
             # 获取在线设备列表
             online_devices = []
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id:
+            for conn in self.websocket_server.get_online_connections():
+                if conn.device_id:
                     device_info = {
                         "device_id": conn.device_id,
                         "last_activity": getattr(conn, "last_activity_time", 0),
@@ -125,18 +123,21 @@ class DeviceStatusHandler(BaseHandler):
                     if hasattr(conn, "device_name") and conn.device_name:
                         device_info["device_name"] = conn.device_name
                     
-                    # 从缓存读取音量与麦克风状态
-                    cache_key = f"device_info:{conn.device_id}"
-                    cached = cache_manager.get(CacheType.DEVICE_INFO, cache_key)
-                    if cached is not None:
-                        if "volume" in cached:
-                            device_info["volume"] = cached["volume"]
-                        if "microphone" in cached:
-                            device_info["microphone"] = cached["microphone"]
-
-
                     online_devices.append(device_info)
 
+            # 从缓存批量读取音量与麦克风状态
+            cached_infos = await cache_manager.aget_many(
+                CacheType.DEVICE_INFO,
+                [f"device_info:{device['device_id']}" for device in online_devices],
+            )
+            for device_info in online_devices:
+                cached = cached_infos.get(f"device_info:{device_info['device_id']}")
+                if cached is not None:
+                    if "volume" in cached:
+                        device_info["volume"] = cached["volume"]
+                    if "microphone" in cached:
+                        device_info["microphone"] = cached["microphone"]
+
             # 返回成功响应
             response = web.Response(
                 text=json.dumps({
@@ -185,7 +186,7 @@ class DeviceStatusHandler(BaseHandler):
                 return response
 
             # 查询设备状态（简化版本）
-            device_status = self._check_device_status_simple(device_id)
+            device_status = await self._check_device_status_simple(device_id)
             
             response = web.Response(
                 text=json.dumps(device_status),
@@ -78,11 +78,7 @@ class GroupHandler(BaseHandler):
         invitation_message = data.get("invitation_message", "邀请你加入群聊")
 
         # 查找发起建群的设备连接
-        creator_connection = None
-        for conn in self.websocket_server.active_connections:
-            if hasattr(conn, "device_id") and conn.device_id == device_id:
-                creator_connection = conn
-                break
+        creator_connection = self.websocket_server.get_connection(device_id)
 
         if not creator_connection:
             response = web.Response(
@@ -93,10 +89,9 @@ class GroupHandler(BaseHandler):
             return response
 
         # 检查是否有其他在线设备
-        online_devices = []
-        for conn in self.websocket_server.active_connections:
-            if hasattr(conn, "device_id") and conn.device_id != device_id:
-                online_devices.append(conn)
+        online_devices = self.websocket_server.get_online_connections(
+            exclude_device=device_id
+        )
 
         if not online_devices:
             response = web.Response(
@@ -186,11 +181,7 @@ class GroupHandler(BaseHandler):
             return response
         
         # 查找设备连接
-        target_connection = None
-        for conn in self.websocket_server.active_connections:
-            if hasattr(conn, "device_id") and conn.device_id == device_id:
-                target_connection = conn
-                break
+        target_connection = self.websocket_server.get_connection(device_id)
         
         if not target_connection:
             response = web.Response(
@@ -233,11 +224,7 @@ class GroupHandler(BaseHandler):
         group_id = data.get("group_id")
         
         # 查找设备连接
-        target_connection = None
-        for conn in self.websocket_server.active_connections:
-            if hasattr(conn, "device_id") and conn.device_id == device_id:
-                target_connection = conn
-                break
+        target_connection = self.websocket_server.get_connection(device_id)
         
         if not target_connection:
             response = web.Response(
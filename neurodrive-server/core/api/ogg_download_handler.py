@@ -26,15 +26,20 @@ def check_and_install_package(package_name):
 # 检查并安装 ffmpeg-python
 check_and_install_package("ffmpeg-python")
 
-import ffmpeg
+from core.utils.ogg_render_cache import ogg_render_cache
+from core.utils.scheduler import scheduler
 
 TAG = __name__
 
 """
 音频文件预下载
 1. 语音回复的内容预制
+2. 提示音按 (音色, 文本) 预渲染缓存，请求时直接返回磁盘上的OGG文件
 """
 
+# 流式返回multipart时每次读取的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
 HANNUO_INTRO = """各位汉诺的师兄、师姐们，大家好。我是绿仔，接下来我为大家隆重介绍汉诺集团，汉诺集团起于CDN,但不止于发展CDN， CDN的技术作用原理是把互联网上的内容以就近原则很好的分发给全国各地的用户。中国CDN市场规模在2029年预计会增长到1400亿元的规模。汉诺集团集研发、生产、运营、营销为一体的AI物联网科技集团，通过CDN技术提升用户数字化体验，以及AI应用解决方案。搭建边缘云计算为赋能的产品。我们搭建AI产品线，包括AI智能音箱、AI车载机器人、AI眼镜、智能手环等，而智慧云盒、富氢水机、共享充电宝、智能酒柜、防霸凌设备等搭建了边缘云计算，集学、用、玩、行、娱为一体。
 
 汉诺集团在CDN行业的核心优势涵盖三个方面，第一，国家工信部颁发的内容分发网络业务许可证，全国5600多家CDN企业中，只有1000家有这个证书。汉诺集团的经营范围是全国。
@@ -150,16 +155,58 @@ class OggDownloadHandler(BaseHandler):
             "hannuo_intro.ogg": HANNUO_INTRO
         }
 
-    async def handle_get(self, request: web.Request) -> web.Response:
+    async def prerender(self, tts=None):
+        """后台预渲染全部提示语，未指定TTS时使用配置中的默认TTS"""
+        if tts is None:
+            from core.utils.modules_initialize import initialize_tts
+
+            tts = await scheduler.run("io", initialize_tts, self.config)
+        return ogg_render_cache.ensure_prerendered(tts, self.file_string_map)
+
+    @staticmethod
+    def _output_file_name(base_name: str, idx: int) -> str:
+        return f"{base_name}.ogg" if idx == 1 else f"{base_name}_{idx-1}.ogg"
+
+    async def _stream_multipart(self, request: web.Request, parts) -> web.StreamResponse:
+        """以multipart/mixed格式流式返回多个OGG文件，不在内存中拼接完整响应"""
+        boundary = f"ogg_{uuid.uuid4().hex}"
+        headers = []
+        content_length = 0
+        for file_name, ogg_path in parts:
+            part_header = (
+                f"--{boundary}\r\n"
+                f"Content-Type: audio/ogg\r\n"
+                f"Content-Disposition: attachment; filename=\"{file_name}\"\r\n\r\n"
+            ).encode("utf-8")
+            headers.append(part_header)
+            content_length += len(part_header) + os.path.getsize(ogg_path) + 2
+        closing = f"--{boundary}--\r\n".encode("utf-8")
+        content_length += len(closing)
+
+        response = web.StreamResponse(
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"}
+        )
+        response.content_length = content_length
+        await response.prepare(request)
+        for part_header, (_, ogg_path) in zip(headers, parts):
+            await response.write(part_header)
+            with open(ogg_path, "rb") as f:
+                while True:
+                    chunk = await scheduler.run("io", f.read, STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await response.write(chunk)
+            await response.write(b"\r\n")
+        await response.write(closing)
+        await response.write_eof()
+        return response
+
+    async def handle_get(self, request: web.Request) -> web.StreamResponse:
         """
         处理单个文件下载请求
         URL 示例: http://47.109.177.102:18003/xiaozhi/voice_files?file=low_battery.ogg
         """
         try:
-            # TODO 自动清理历史文件
-
-            output_path = ""
-
             # 获取设备信息
             client_conn = None
             device_id = request.headers.get("device-id", "")
@@ -168,14 +215,12 @@ class OggDownloadHandler(BaseHandler):
             if len(device_id) == 0:
                 raise ValueError("Missing 'device_id' parameter")
             
-            for conn in self.websocket_server.active_connections:
-                print("check device id: ", conn.device_id, device_id, flush=True)
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    client_conn = conn
-                    break
+            client_conn = self.websocket_server.get_connection(device_id)
             if client_conn is None:
                 raise ValueError("Failed to find client connection")
 
+            # 新音色第一次出现时在后台预渲染全部提示语
+            ogg_render_cache.ensure_prerendered(client_conn.tts, self.file_string_map)
 
             requested = request.query.get('file')
             if not requested:
@@ -213,7 +258,6 @@ class OggDownloadHandler(BaseHandler):
             base_name = os.path.splitext(map_key)[0]
             if isinstance(response_obj, (list, tuple)):
                 index_str = request.query.get('index')
-                ext_name = ".ogg"
                 idx_int = None
                 if index_str is not None:
                     try:
@@ -228,137 +272,28 @@ class OggDownloadHandler(BaseHandler):
                     if idx_int < 1 or idx_int > len(response_obj):
                         raise ValueError(f"Index out of range: {idx_int}")
                     text = response_obj[idx_int - 1]
-                    tmp_file = client_conn.tts.generate_filename()
-                    max_repeat_time = 5
-                    while not os.path.exists(tmp_file) and max_repeat_time > 0:
-                        try:
-                            await client_conn.tts.text_to_speak(text, tmp_file)
-                        except Exception as e:
-                            print("text to speak error: ", e, flush=True)
-                            if os.path.exists(tmp_file):
-                                os.remove(tmp_file)
-                            max_repeat_time -= 1
-                    if max_repeat_time <= 0:
-                        raise ValueError(f"语音生成失败: {text}")
-                    output_file_name = f"{base_name}{ext_name}" if idx_int == 1 else f"{base_name}_{idx_int-1}{ext_name}"
-                    output_path = "./tmp_voice_files/" + output_file_name
-                    try:
-                        print(f"正在转换==>: {tmp_file}")
-                        (
-                            ffmpeg
-                            .input(tmp_file)
-                            .output(output_path, acodec='libopus', audio_bitrate='16k', ac=1, ar=16000, frame_duration=60)
-                            .run(overwrite_output=True)
-                        )
-                        print(f"转换成功: {output_file_name}\n")
-                    except Exception as e:
-                        raise ValueError(f"转换失败: {str(e)}\n")
-                    finally:
-                        if os.path.exists(tmp_file):
-                            os.remove(tmp_file)
+                    output_path = await ogg_render_cache.get(client_conn.tts, text)
+                    output_file_name = self._output_file_name(base_name, idx_int)
                     return web.FileResponse(
                         path=output_path,
                         headers={
                             "Content-Disposition": f"attachment; filename={output_file_name}"
                         }
                     )
-                generated_ogg_paths = []
-                for idx, text in enumerate(response_obj, start=1):
-                    tmp_file = client_conn.tts.generate_filename()
-                    max_repeat_time = 5
-                    while not os.path.exists(tmp_file) and max_repeat_time > 0:
-                        try:
-                            await client_conn.tts.text_to_speak(text, tmp_file)
-                        except Exception as e:
-                            print("text to speak error: ", e, flush=True)
-                            if os.path.exists(tmp_file):
-                                os.remove(tmp_file)
-                            max_repeat_time -= 1
-                    if max_repeat_time <= 0:
-                        raise ValueError(f"语音生成失败: {text}")
-                    output_file_name = f"{base_name}{ext_name}" if idx == 1 else f"{base_name}_{idx-1}{ext_name}"
-                    output_path = "./tmp_voice_files/" + output_file_name
-                    try:
-                        print(f"正在转换==>: {tmp_file}")
-                        (
-                            ffmpeg
-                            .input(tmp_file)
-                            .output(output_path, acodec='libopus', audio_bitrate='16k', ac=1, ar=16000, frame_duration=60)
-                            .run(overwrite_output=True)
-                        )
-                        print(f"转换成功: {output_file_name}\n")
-                        generated_ogg_paths.append(output_path)
-                    except Exception as e:
-                        raise ValueError(f"转换失败: {str(e)}\n")
-                    finally:
-                        if os.path.exists(tmp_file):
-                            os.remove(tmp_file)
-                boundary = f"ogg_{uuid.uuid4().hex}"
-                body = bytearray()
-                for ogg_path in generated_ogg_paths:
-                    part_header = (
-                        f"--{boundary}\r\n"
-                        f"Content-Type: audio/ogg\r\n"
-                        f"Content-Disposition: attachment; filename=\"{os.path.basename(ogg_path)}\"\r\n\r\n"
-                    ).encode("utf-8")
-                    body.extend(part_header)
-                    with open(ogg_path, "rb") as f:
-                        body.extend(f.read())
-                    body.extend(b"\r\n")
-                body.extend(f"--{boundary}--\r\n".encode("utf-8"))
-                return web.Response(
-                    body=bytes(body),
-                    headers={
-                        "Content-Type": f"multipart/mixed; boundary={boundary}"
-                    }
+                # 并发获取所有条目，已缓存的直接返回
+                ogg_paths = await asyncio.gather(
+                    *(ogg_render_cache.get(client_conn.tts, text) for text in response_obj)
                 )
-            else:
-                response_str = response_obj
-                print("response_str===>", response_str, flush=True)
-
-            # tts生成音频文件
-            tmp_file = client_conn.tts.generate_filename()
-            max_repeat_time = 5
-            while not os.path.exists(tmp_file) and max_repeat_time > 0:
-                try:
-                    await client_conn.tts.text_to_speak(response_str, tmp_file)
-                except Exception as e:
-                    print("text to speak error: ", e, flush=True)
-                    if os.path.exists(tmp_file):
-                        os.remove(tmp_file)
-                    max_repeat_time -= 1
-
-            if max_repeat_time > 0:
-                print(
-                    f"语音生成成功: {response_str}:{tmp_file}，重试{5 - max_repeat_time}次"
-                )
-            else:
-                raise ValueError(f"语音生成失败: {response_str}，请检查网络或服务是否正常")
+                parts = [
+                    (self._output_file_name(base_name, idx), ogg_path)
+                    for idx, ogg_path in enumerate(ogg_paths, start=1)
+                ]
+                return await self._stream_multipart(request, parts)
 
-            # 音频文件转ogg
-            # base_tmp_file, _ = os.path.splitext(tmp_file)  # 忽略原扩展名
-            # ogg_file_path = base_tmp_file + ".ogg"  # 直接替换为 .ogg
-            # output_path = (self.tmp_dir / file_name).resolve()
-            # print("output_path===>", tmp_file, output_path, flush=True)
-            # output_path = "test.ogg"
+            response_str = response_obj
+            print("response_str===>", response_str, flush=True)
+            output_path = await ogg_render_cache.get(client_conn.tts, response_str)
             output_file_name = f"{base_name}.ogg"
-            output_path = "./tmp_voice_files/" + output_file_name
-            try:
-                print(f"正在转换==>: {tmp_file}")
-                (
-                    ffmpeg
-                    .input(tmp_file)
-                    .output(output_path, acodec='libopus', audio_bitrate='16k', ac=1, ar=16000, frame_duration=60)
-                    .run(overwrite_output=True)
-                )
-                print(f"转换成功: {output_file_name}\n")
-            except Exception as e:
-                raise ValueError(f"转换失败: {str(e)}\n")
- 
-            print(output_path, flush=True)
-            if os.path.exists(tmp_file):
-                os.remove(tmp_file)
-
             return web.FileResponse(
                 path=output_path,
                 headers={
@@ -374,11 +309,3 @@ class OggDownloadHandler(BaseHandler):
         except Exception as e:
             print(f"error: {e}", flush=True)
             return web.json_response({"error": "Internal server error"}, status=500)
-
-        finally:
-            # BUG: 可能先删除，然后再返回web.FileResponse
-            # if os.path.exists(output_path):
-            #     print("remove output path: ", output_path, flush=True)
-            #     os.remove(output_path)
-            pass
-            
\ No newline at end of file
@@ -120,11 +120,7 @@ class PeripheralControlHandler(BaseHandler):
                 return response
 
             # 查找目标设备连接
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -170,7 +166,7 @@ class PeripheralControlHandler(BaseHandler):
                     
                     # 检查缓存中的最新值
                     cache_key = f"device_info:{device_id}"
-                    cached_info = cache_manager.get(CacheType.DEVICE_INFO, cache_key) or {}
+                    cached_info = await cache_manager.aget(CacheType.DEVICE_INFO, cache_key) or {}
                     current_volume = cached_info.get("volume", value)
                     
                     response = web.Response(
@@ -285,11 +281,7 @@ class PeripheralControlHandler(BaseHandler):
                 return response
 
             # 查找目标设备连接
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -335,7 +327,7 @@ class PeripheralControlHandler(BaseHandler):
                     
                     # 检查缓存中的最新值
                     cache_key = f"device_info:{device_id}"
-                    cached_info = cache_manager.get(CacheType.DEVICE_INFO, cache_key) or {}
+                    cached_info = await cache_manager.aget(CacheType.DEVICE_INFO, cache_key) or {}
                     # 统一使用缓存键"microphone"（设备回复处理处已写入该键）
                     current_mic = cached_info.get("microphone", value)
                     
@@ -602,11 +594,7 @@ class PeripheralControlHandler(BaseHandler):
                 return response
 
             # 查找目标设备连接
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -716,7 +704,7 @@ class PeripheralControlHandler(BaseHandler):
             # 更新设备信息缓存
             try:
                 cache_key = f"device_info:{device_id}"
-                current = cache_manager.get(CacheType.DEVICE_INFO, cache_key) or {}
+                current = await cache_manager.aget(CacheType.DEVICE_INFO, cache_key) or {}
                 if content == "volume" and normalized_value is not None:
                     current["volume"] = normalized_value
                 elif content in ["microphone", "mic"] and normalized_value is not None:
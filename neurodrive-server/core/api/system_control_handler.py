@@ -2,6 +2,16 @@ import json
 import asyncio
 from aiohttp import web
 from core.api.base_handler import BaseHandler
+from core.utils.scheduler import scheduler
+from core.providers.tools.server_mcp import mcp_pool
+from core.utils.tts_audio_cache import tts_audio_cache
+from core.utils.tts_pipeline import tts_pipeline_stats
+from core.utils.group_broadcast import group_broadcaster
+from core.utils.device_config_cache import device_config_cache
+from core.utils.provider_pool import provider_pool
+from core.utils.cache.manager import cache_manager
+from core.utils.vision_pipeline import vision_pipeline
+from core.utils.report_pipeline import report_pipeline
 
 TAG = __name__
 
@@ -12,7 +22,7 @@ class SystemControlHandler(BaseHandler):
         self.websocket_server = websocket_server
 
     async def handle_post(self, request):
-        """处理POST请求 - 系统控制（重启和删除ogg）"""
+        """处理POST请求 - 系统控制（重启、删除ogg、调试和失效配置缓存）"""
         try:
             # 解析请求数据
             data = await request.json()
@@ -24,6 +34,8 @@ class SystemControlHandler(BaseHandler):
                 return await self._handle_del_ogg(request, data)
             elif action == "debug":
                 return await self._handle_debug(request, data)
+            elif action == "invalidate_config":
+                return await self._handle_invalidate_config(request, data)
             else:
                 response = web.Response(
                     text=json.dumps({"success": False, "message": f"不支持的操作: {action}"}),
@@ -76,11 +88,7 @@ class SystemControlHandler(BaseHandler):
                 return response
 
             # 查找目标设备连接
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -161,11 +169,7 @@ class SystemControlHandler(BaseHandler):
                 return response
 
             # 查找目标设备连接
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -221,6 +225,25 @@ class SystemControlHandler(BaseHandler):
             self._add_cors_headers(response)
             return response
 
+    async def _handle_invalidate_config(self, request, data):
+        """处理设备配置缓存失效请求，不传device_id时失效全部设备"""
+        device_id = data.get("device_id")
+        removed = device_config_cache.invalidate(device_id)
+        self.logger.info(f"已失效设备配置缓存: {device_id or '全部设备'}，共 {removed} 条")
+        response = web.Response(
+            text=json.dumps({
+                "success": True,
+                "message": "设备配置缓存已失效，下次连接时重新获取",
+                "data": {
+                    "device_id": device_id,
+                    "removed": removed
+                }
+            }),
+            content_type="application/json"
+        )
+        self._add_cors_headers(response)
+        return response
+
     async def _handle_debug(self, request, data):
         """处理设备调整电阻请求"""
         try:
@@ -243,11 +266,7 @@ class SystemControlHandler(BaseHandler):
                 self._add_cors_headers(response)
                 return response
 
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -304,10 +323,11 @@ class SystemControlHandler(BaseHandler):
             # 获取在线设备数量
             online_devices_count = 0
             if self.websocket_server and hasattr(self.websocket_server, "active_connections"):
-                online_devices_count = len([
-                    conn for conn in self.websocket_server.active_connections 
-                    if hasattr(conn, "device_id") and conn.device_id
-                ])
+                online_devices_count = len(self.websocket_server.device_connections)
+
+            # 本地ASR批量推理统计
+            asr_engine = getattr(getattr(self.websocket_server, "_asr", None), "engine", None)
+            asr_batch_stats = asr_engine.stats() if asr_engine is not None else None
 
             response = web.Response(
                 text=json.dumps({
@@ -316,8 +336,22 @@ class SystemControlHandler(BaseHandler):
                     "data": {
                         "endpoint": "/xiaozhi/system/control",
                         "methods": ["POST", "GET"],
-                        "supported_actions": ["reboot", "del_ogg", "debug"],
-                        "online_devices": online_devices_count
+                        "supported_actions": [
+                            "reboot", "del_ogg", "debug", "invalidate_config"
+                        ],
+                        "online_devices": online_devices_count,
+                        "worker_pools": scheduler.stats(),
+                        "mcp_servers": mcp_pool.stats(),
+                        "tts_cache": tts_audio_cache.stats(),
+                        "tts_pipeline": tts_pipeline_stats.stats(),
+                        "group_broadcast": group_broadcaster.stats(),
+                        "asr_batch": asr_batch_stats,
+                        "device_config_cache": device_config_cache.stats(),
+                        "provider_pool": provider_pool.stats(),
+                        "cache": cache_manager.stats(),
+                        "cache_backend": cache_manager.backend_stats(),
+                        "vision": vision_pipeline.stats(),
+                        "chat_report": report_pipeline.stats(),
                     }
                 }),
                 content_type="application/json"
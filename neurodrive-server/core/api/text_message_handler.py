@@ -64,11 +64,7 @@ class TextMessageHandler(BaseHandler):
                 return response
 
             # 查找目标设备连接
-            target_connection = None
-            for conn in self.websocket_server.active_connections:
-                if hasattr(conn, "device_id") and conn.device_id == device_id:
-                    target_connection = conn
-                    break
+            target_connection = self.websocket_server.get_connection(device_id)
 
             if not target_connection:
                 response = web.Response(
@@ -191,10 +187,7 @@ class TextMessageHandler(BaseHandler):
             # 获取在线设备数量
             online_devices_count = 0
             if self.websocket_server and hasattr(self.websocket_server, "active_connections"):
-                online_devices_count = len([
-                    conn for conn in self.websocket_server.active_connections 
-                    if hasattr(conn, "device_id") and conn.device_id
-                ])
+                online_devices_count = len(self.websocket_server.device_connections)
 
             response = web.Response(
                 text=json.dumps({
@@ -1,12 +1,10 @@
 import json
-import copy
 from aiohttp import web
 from config.logger import setup_logging
 from core.utils.util import get_vision_url, is_valid_image_file
-from core.utils.vllm import create_instance
-from config.config_loader import get_private_config_from_api
+from core.utils.vision_pipeline import vision_pipeline
+from core.utils.device_config_cache import device_config_cache
 from core.utils.auth import AuthToken
-import base64
 from typing import Tuple, Optional
 from plugins_func.register import Action
 
@@ -22,6 +20,7 @@ class VisionHandler:
         self.logger = setup_logging()
         # 初始化认证工具
         self.auth = AuthToken(config["server"]["auth_key"])
+        vision_pipeline.configure(config)
 
     def _create_error_response(self, message: str) -> dict:
         """创建统一的错误响应格式"""
@@ -89,14 +88,12 @@ class VisionHandler:
                     "不支持的文件格式，请上传有效的图片文件（支持JPEG、PNG、GIF、BMP、TIFF、WEBP格式）"
                 )
 
-            # 将图片转换为base64编码
-            image_base64 = base64.b64encode(image_data).decode("utf-8")
-
-            # 如果开启了智控台，则从智控台获取模型配置
-            current_config = copy.deepcopy(self.config)
+            # 如果开启了智控台，则从智控台获取模型配置（按设备缓存）
+            # 这里只读取配置，无需复制
+            current_config = self.config
             read_config_from_api = current_config.get("read_config_from_api", False)
             if read_config_from_api:
-                current_config = get_private_config_from_api(
+                current_config = await device_config_cache.get_async(
                     current_config,
                     device_id,
                     client_id,
@@ -106,21 +103,16 @@ class VisionHandler:
             if not select_vllm_module:
                 raise ValueError("您还未设置默认的视觉分析模块")
 
-            vllm_type = (
-                select_vllm_module
-                if "type" not in current_config["VLLM"][select_vllm_module]
-                else current_config["VLLM"][select_vllm_module]["type"]
-            )
-
+            vllm_config = current_config["VLLM"][select_vllm_module]
+            vllm_type = vllm_config.get("type", select_vllm_module)
             if not vllm_type:
                 raise ValueError(f"无法找到VLLM模块对应的供应器{vllm_type}")
 
-            vllm = create_instance(
-                vllm_type, current_config["VLLM"][select_vllm_module]
+            # 图片缩放、编码和模型调用都不在事件循环中阻塞执行
+            result = await vision_pipeline.explain(
+                select_vllm_module, vllm_config, question, image_data
             )
 
-            result = vllm.response(question, image_base64)
-
             return_json = {
                 "success": True,
                 "action": Action.RESPONSE.name,
@@ -131,7 +123,7 @@ class VisionHandler:
                 text=json.dumps(return_json, separators=(",", ":")),
                 content_type="application/json",
             )
-        except ValueError as e:
+        except (ValueError, TimeoutError) as e:
             self.logger.bind(tag=TAG).error(f"MCP Vision POST请求异常: {e}")
             return_json = self._create_error_response(str(e))
             response = web.Response(
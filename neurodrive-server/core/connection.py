@@ -1,6 +1,5 @@
 import os
 import sys
-import copy
 import json
 import uuid
 import time
@@ -14,6 +13,7 @@ from core.utils.util import (
     extract_json_from_string,
     check_vad_update,
     check_asr_update,
+    check_llm_update,
     filter_sensitive_info,
 )
 from typing import Dict, Any
@@ -23,10 +23,14 @@ from core.utils.modules_initialize import (
     initialize_modules,
     initialize_tts,
     initialize_asr,
+    initialize_llm,
 )
-from core.handle.reportHandle import report
+from core.utils.provider_pool import provider_pool
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
+from core.utils.scheduler import scheduler, SessionQueue
+from core.utils.speculative import SpeculativeTurn
+from core.utils.device_config_cache import device_config_cache
+from core.utils.audio_buffer import PcmRingBuffer
 from core.utils.dialogue import Message, Dialogue
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
@@ -34,7 +38,7 @@ from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action, ActionResponse
 from core.auth import AuthMiddleware, AuthenticationError
-from config.config_loader import get_private_config_from_api
+from config.config_loader import ConfigOverlay
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
@@ -70,7 +74,8 @@ class ConnectionHandler:
         server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        # 共享全局配置快照，差异化配置写时复制
+        self.config = ConfigOverlay(config)
         self.session_id = str(uuid.uuid4())
         self.logger = setup_logging()
         self.server = server  # 保存server实例的引用
@@ -103,11 +108,10 @@ class ConnectionHandler:
         # 线程任务相关
         self.loop = asyncio.get_event_loop()
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
+        # 使用全局共享线程池，不再为每个连接单独创建
+        self.executor = scheduler.get_pool("chat")
 
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 聊天记录由全局上报流水线批量上报
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
@@ -121,23 +125,30 @@ class ConnectionHandler:
         self.llm = _llm
         self.memory = _memory
         self.intent = _intent
+        # 本连接从实例池获取的提供者，关闭连接时归还
+        self.pooled_providers = []
 
         # 为每个连接单独管理声纹识别
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
+        # 解码后的PCM只写入一次，VAD/ASR/声纹/上报通过视图读取
+        self.audio_ring = PcmRingBuffer()
         self.client_have_voice = False
         self.last_activity_time = 0.0  # 统一的活动时间戳（毫秒）
         self.client_voice_stop = False
         self.client_voice_window = deque(maxlen=5)
         self.last_is_voice = False
+        # VAD实现的连接私有状态（解码器、模型循环状态等）
+        self.vad_session = None
 
         # asr相关变量
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
         self.asr_audio = []
-        self.asr_audio_queue = queue.Queue()
+        self.asr_audio_queue = SessionQueue()
+        # 本地ASR边说边识别的中间状态
+        self.partial_asr = None
 
         # llm相关变量
         self.llm_finish_task = True
@@ -187,6 +198,9 @@ class ConnectionHandler:
         self.candidate_group_name = None
         self.wait_for_response = 0 # 1. 群聊名称，2. 是否同意加群, 3. 待确认讯息
         self.intent_chat_id = {}
+        # 各轮对话在意图判定期间暂存的LLM输出与正在运行的LLM任务
+        self.speculative_turns = {}
+        self.chat_tasks = {}
         self.asr_num = 0
         self.abort_asr_start = -1
         self.first_asr_audio_time = -1
@@ -228,6 +242,8 @@ class ConnectionHandler:
             # 认证通过,继续处理
             self.websocket = ws
             self.device_id = self.headers.get("device-id", None)
+            if self.server is not None:
+                self.server.register_device(self)
 
             # 初始化活动时间戳
             self.last_activity_time = time.time() * 1000
@@ -240,11 +256,12 @@ class ConnectionHandler:
             if self.heartbeat_enabled:
                 self.heartbeat_task = asyncio.create_task(self._heartbeat_monitor())
 
-            self.welcome_msg = self.config["xiaozhi"]
+            # 欢迎消息会按连接写入session_id等字段，不能直接修改共享的配置快照
+            self.welcome_msg = dict(self.config["xiaozhi"])
             self.welcome_msg["session_id"] = self.session_id
 
             # 获取差异化配置
-            self._initialize_private_config()
+            await self._initialize_private_config()
             # 异步初始化
             self.executor.submit(self._initialize_components)
 
@@ -320,9 +337,9 @@ class ConnectionHandler:
                         except Exception:
                             pass
 
-                # 启动线程保存记忆，不等待完成
-                threading.Thread(target=save_memory_task, daemon=True).start()
-                self.logger.bind(tag=TAG).info("记忆保存线程已启动")
+                # 提交到共享线程池保存记忆，不等待完成
+                scheduler.submit("io", save_memory_task)
+                self.logger.bind(tag=TAG).info("记忆保存任务已提交")
             else:
                 self.logger.bind(tag=TAG).info("记忆模块未初始化，跳过保存")
         except Exception as e:
@@ -442,8 +459,6 @@ class ConnectionHandler:
             self._initialize_memory()
             """加载意图识别"""
             self._initialize_intent()
-            """初始化上报线程"""
-            self._init_report_threads()
             """更新系统提示词"""
             self._init_prompt_enhancement()
 
@@ -460,19 +475,6 @@ class ConnectionHandler:
             self.change_system_prompt(enhanced_prompt)
             self.logger.bind(tag=TAG).info("系统提示词已增强更新")
 
-    def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
-        if not self.read_config_from_api or self.need_bind:
-            return
-        if self.chat_history_conf == 0:
-            return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
-            )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
-
     def _initialize_tts(self):
         """初始化TTS"""
         tts = None
@@ -513,14 +515,14 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"声纹识别初始化失败: {str(e)}")
 
-    def _initialize_private_config(self):
+    async def _initialize_private_config(self):
         """如果是从配置文件获取，则进行二次实例化"""
         if not self.read_config_from_api:
             return
         """从接口获取差异化的配置进行二次实例化，非全量重新实例化"""
         try:
             begin_time = time.time()
-            private_config = get_private_config_from_api(
+            private_config = await device_config_cache.get_async(
                 self.config,
                 self.headers.get("device-id"),
                 self.headers.get("client-id", self.headers.get("device-id")),
@@ -553,49 +555,50 @@ class ConnectionHandler:
 
         if init_vad:
             self.config["VAD"] = private_config["VAD"]
-            self.config["selected_module"]["VAD"] = private_config["selected_module"][
-                "VAD"
-            ]
+            self.config.writable("selected_module")["VAD"] = private_config[
+                "selected_module"
+            ]["VAD"]
         if init_asr:
             self.config["ASR"] = private_config["ASR"]
-            self.config["selected_module"]["ASR"] = private_config["selected_module"][
-                "ASR"
-            ]
+            self.config.writable("selected_module")["ASR"] = private_config[
+                "selected_module"
+            ]["ASR"]
         if private_config.get("TTS", None) is not None:
             init_tts = True
             self.config["TTS"] = private_config["TTS"]
-            self.config["selected_module"]["TTS"] = private_config["selected_module"][
-                "TTS"
-            ]
+            self.config.writable("selected_module")["TTS"] = private_config[
+                "selected_module"
+            ]["TTS"]
         if private_config.get("LLM", None) is not None:
-            init_llm = True
+            # 与全局配置相同时沿用服务端已创建的LLM实例
+            init_llm = check_llm_update(self.common_config, private_config)
             self.config["LLM"] = private_config["LLM"]
-            self.config["selected_module"]["LLM"] = private_config["selected_module"][
-                "LLM"
-            ]
+            self.config.writable("selected_module")["LLM"] = private_config[
+                "selected_module"
+            ]["LLM"]
         if private_config.get("VLLM", None) is not None:
             self.config["VLLM"] = private_config["VLLM"]
-            self.config["selected_module"]["VLLM"] = private_config["selected_module"][
-                "VLLM"
-            ]
+            self.config.writable("selected_module")["VLLM"] = private_config[
+                "selected_module"
+            ]["VLLM"]
         if private_config.get("Memory", None) is not None:
             init_memory = True
             self.config["Memory"] = private_config["Memory"]
-            self.config["selected_module"]["Memory"] = private_config[
+            self.config.writable("selected_module")["Memory"] = private_config[
                 "selected_module"
             ]["Memory"]
         if private_config.get("Intent", None) is not None:
             init_intent = True
             self.config["Intent"] = private_config["Intent"]
             model_intent = private_config.get("selected_module", {}).get("Intent", {})
-            self.config["selected_module"]["Intent"] = model_intent
+            self.config.writable("selected_module")["Intent"] = model_intent
             # 加载插件配置
             if model_intent != "Intent_nointent":
                 plugin_from_server = private_config.get("plugins", {})
                 for plugin, config_str in plugin_from_server.items():
                     plugin_from_server[plugin] = json.loads(config_str)
                 self.config["plugins"] = plugin_from_server
-                self.config["Intent"][self.config["selected_module"]["Intent"]][
+                self.config.writable("Intent", model_intent)[
                     "functions"
                 ] = plugin_from_server.keys()
         if private_config.get("prompt", None) is not None:
@@ -612,7 +615,9 @@ class ConnectionHandler:
         if private_config.get("mcp_endpoint", None) is not None:
             self.config["mcp_endpoint"] = private_config["mcp_endpoint"]
         try:
-            modules = initialize_modules(
+            modules = await scheduler.run(
+                "io",
+                initialize_modules,
                 self.logger,
                 private_config,
                 init_vad,
@@ -633,6 +638,7 @@ class ConnectionHandler:
             self.asr = modules["asr"]
         if modules.get("llm", None) is not None:
             self.llm = modules["llm"]
+            self.pooled_providers.append(self.llm)
         if modules.get("intent", None) is not None:
             self.intent = modules["intent"]
         if modules.get("memory", None) is not None:
@@ -663,14 +669,11 @@ class ConnectionHandler:
                 "llm"
             ]
             if memory_llm_name and memory_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
+                # 如果配置了专用LLM，则从实例池获取
                 memory_llm_config = self.config["LLM"][memory_llm_name]
                 memory_llm_type = memory_llm_config.get("type", memory_llm_name)
-                memory_llm = llm_utils.create_instance(
-                    memory_llm_type, memory_llm_config
-                )
+                memory_llm = initialize_llm(memory_llm_name, memory_llm_config)
+                self.pooled_providers.append(memory_llm)
                 self.logger.bind(tag=TAG).info(
                     f"为记忆总结创建了专用LLM: {memory_llm_name}, 类型: {memory_llm_type}"
                 )
@@ -706,14 +709,11 @@ class ConnectionHandler:
             ]
 
             if intent_llm_name and intent_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
+                # 如果配置了专用LLM，则从实例池获取
                 intent_llm_config = self.config["LLM"][intent_llm_name]
                 intent_llm_type = intent_llm_config.get("type", intent_llm_name)
-                intent_llm = llm_utils.create_instance(
-                    intent_llm_type, intent_llm_config
-                )
+                intent_llm = initialize_llm(intent_llm_name, intent_llm_config)
+                self.pooled_providers.append(intent_llm)
                 self.logger.bind(tag=TAG).info(
                     f"为意图识别创建了专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
                 )
@@ -735,52 +735,10 @@ class ConnectionHandler:
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, tool_call=False, depth=0, chat_id=None):
+    async def chat_async(self, query, tool_call=False, depth=0, chat_id=None):
+        """在事件循环中流式调用LLM，意图命中或客户端打断时通过取消任务结束"""
         st = time.time()
         print("ready...chat...==================", chat_id, st, depth, flush=True)
-        def check_chat_stopped():
-            val = self.intent_chat_id.get(chat_id) if chat_id is not None else None
-            if val == 2:
-                print("chat id: stopped", chat_id)
-                if self.dialogue:
-                    self.dialogue.pop()
-                return True
-            return False
-        
-        def force_check_chat_stopped():
-            if chat_id is None:
-                return False
-            start_time = time.monotonic()
-            max_wait = float(self.config.get("intent_max_wait_seconds", 2.0))
-            while True:
-                val = self.intent_chat_id.get(chat_id)
-                if val != 1:
-                    break
-                if self.stop_event.is_set() or self.client_abort:
-                    break
-                if time.monotonic() - start_time >= max_wait:
-                    break
-                if val == 2:
-                    print("check in loop: chat id: stopped", chat_id)
-                    if self.dialogue:
-                        self.dialogue.pop()
-                    return True
-                print("check intent", chat_id, val, flush=True)
-                time.sleep(0.2)
-            print("force checked done", flush=True)
-            return False
-        
-        def send_last():
-            if depth == 0:
-                self.tts.tts_text_queue.put(
-                    TTSMessageDTO(
-                        sentence_id=self.sentence_id,
-                        sentence_type=SentenceType.LAST,
-                        content_type=ContentType.ACTION,
-                    )
-                )
-            self.llm_finish_task = True
-        
 
         if len(query) == 0:
             print("empty query: ===> ", flush=True)
@@ -792,7 +750,7 @@ class ConnectionHandler:
         if not tool_call:
             self.dialogue.put(Message(role="user", content=query))
 
-        if check_chat_stopped():
+        if self._check_chat_stopped(chat_id):
             self.llm_finish_task = True
             return False
 
@@ -800,13 +758,15 @@ class ConnectionHandler:
         # 为最顶层时新建会话ID和发送FIRST请求
         if depth == 0:
             self.sentence_id = str(uuid.uuid4().hex)
+            self.tts.begin_turn()
             print("add first sentence ....", chat_id, flush=True)
-            self.tts.tts_text_queue.put(
+            self._put_chat_tts(
+                chat_id,
                 TTSMessageDTO(
                     sentence_id=self.sentence_id,
                     sentence_type=SentenceType.FIRST,
                     content_type=ContentType.ACTION,
-                )
+                ),
             )
 
         # Define intent functions
@@ -815,18 +775,65 @@ class ConnectionHandler:
             functions = self.func_handler.get_functions()
         response_message = []
 
+        try:
+            return await self._chat_stream(
+                query, depth, chat_id, functions, response_message, st
+            )
+        except asyncio.CancelledError:
+            # 意图已处理或客户端打断，结束本轮对话
+            self.logger.bind(tag=TAG).debug(f"对话已取消: {chat_id}")
+            if not self._check_chat_stopped(chat_id) and len(response_message) > 0:
+                self.dialogue.put(
+                    Message(role="assistant", content="".join(response_message))
+                )
+            self._send_last(depth, chat_id)
+            if chat_id is not None:
+                self.intent_chat_id.pop(chat_id, None)
+            if depth > 0:
+                # 嵌套调用（工具调用后的续写）继续向上抛出，由最顶层结束本轮对话，
+                # 否则外层会在取消后继续执行
+                raise
+            return False
+
+    def _check_chat_stopped(self, chat_id):
+        val = self.intent_chat_id.get(chat_id) if chat_id is not None else None
+        if val == 2:
+            print("chat id: stopped", chat_id)
+            if self.dialogue:
+                self.dialogue.pop()
+            return True
+        return False
+
+    def _put_chat_tts(self, chat_id, message):
+        """下发LLM输出到TTS，意图判定完成前暂存在本轮的推测缓冲中"""
+        turn = self.speculative_turns.get(chat_id) if chat_id is not None else None
+        if turn is not None:
+            turn.put(message)
+        else:
+            self.tts.tts_text_queue.put(message)
+
+    def _send_last(self, depth, chat_id=None):
+        if depth == 0:
+            self._put_chat_tts(
+                chat_id,
+                TTSMessageDTO(
+                    sentence_id=self.sentence_id,
+                    sentence_type=SentenceType.LAST,
+                    content_type=ContentType.ACTION,
+                ),
+            )
+        self.llm_finish_task = True
+
+    async def _chat_stream(self, query, depth, chat_id, functions, response_message, st):
         try:
             # 使用带记忆的对话
             memory_str = None
             if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
+                memory_str = await self.memory.query_memory(query)
 
             if self.intent_type == "function_call" and functions is not None:
                 # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
+                llm_responses = self.llm.response_with_functions_async(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
@@ -834,7 +841,7 @@ class ConnectionHandler:
                     functions=functions,
                 )
             else:
-                llm_responses = self.llm.response(
+                llm_responses = self.llm.response_async(
                     self.session_id,
                     self.dialogue.get_llm_dialogue_with_memory(
                         memory_str, self.config.get("voiceprint", {})
@@ -844,16 +851,11 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return None
         
-        if check_chat_stopped():
-            send_last()
+        if self._check_chat_stopped(chat_id):
+            self._send_last(depth, chat_id)
             return False
         
-        # 强制等待 
         print("ready...chat...==================1666", time.time()-st, depth, chat_id, flush=True)
-        # if force_check_chat_stopped():
-        #     send_last()
-        #     return False
-
 
         # 处理流式响应
         tool_call_flag = False
@@ -862,10 +864,10 @@ class ConnectionHandler:
         function_arguments = ""
         content_arguments = ""
         self.client_abort = False
-        for response in llm_responses:
+        async for response in llm_responses:
             print("response time: ", time.time() - st, flush=True)
-            if check_chat_stopped():
-                send_last()
+            if self._check_chat_stopped(chat_id):
+                self._send_last(depth, chat_id)
                 break
             
             if self.client_abort:
@@ -894,14 +896,17 @@ class ConnectionHandler:
                 content = response
             if content is not None and len(content) > 0:
                 if not tool_call_flag:
+                    if not response_message:
+                        self.tts.mark_first_token()
                     response_message.append(content)
-                    self.tts.tts_text_queue.put(
+                    self._put_chat_tts(
+                        chat_id,
                         TTSMessageDTO(
                             sentence_id=self.sentence_id,
                             sentence_type=SentenceType.MIDDLE,
                             content_type=ContentType.TEXT,
                             content_detail=content,
-                        )
+                        ),
                     )
 
         print("222---<>", flush=True)
@@ -947,13 +952,12 @@ class ConnectionHandler:
                 }
 
                 # 使用统一工具处理器处理所有工具调用
-                result = asyncio.run_coroutine_threadsafe(
-                    self.func_handler.handle_llm_function_call(
-                        self, function_call_data
-                    ),
-                    self.loop,
-                ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
+                result = await self.func_handler.handle_llm_function_call(
+                    self, function_call_data
+                )
+                await self._handle_function_result(
+                    result, function_call_data, depth=depth
+                )
 
         print("61234", depth, flush=True)
 
@@ -964,12 +968,13 @@ class ConnectionHandler:
             )
         if depth == 0:
             print("add SentenceType.LAST", chat_id, flush=True)
-            self.tts.tts_text_queue.put(
+            self._put_chat_tts(
+                chat_id,
                 TTSMessageDTO(
                     sentence_id=self.sentence_id,
                     sentence_type=SentenceType.LAST,
                     content_type=ContentType.ACTION,
-                )
+                ),
             )
         else:
             print("without sentence last", flush=True)
@@ -986,7 +991,7 @@ class ConnectionHandler:
 
         return True
 
-    def _handle_function_result(self, result, function_call_data, depth):
+    async def _handle_function_result(self, result, function_call_data, depth):
         if result.action == Action.RESPONSE:  # 直接回复前端
             text = result.response
             self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
@@ -1023,7 +1028,7 @@ class ConnectionHandler:
                         content=text,
                     )
                 )
-                self.chat(text, tool_call=True, depth=depth + 1)
+                await self.chat_async(text, tool_call=True, depth=depth + 1)
         elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
             text = result.response if result.response else result.result
             self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
@@ -1031,42 +1036,6 @@ class ConnectionHandler:
         else:
             pass
 
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
-        while not self.stop_event.is_set():
-            try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
-                if item is None:  # 检测毒丸对象
-                    break
-                try:
-                    # 检查线程池状态
-                    if self.executor is None:
-                        continue
-                    # 提交任务到线程池
-                    self.executor.submit(
-                        self._process_report, *item
-                    )
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
-
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
-
-    def _process_report(self, type, text, audio_data, report_time):
-        """处理上报任务"""
-        try:
-            # 执行上报（传入二进制数据）
-            report(self, type, text, audio_data, report_time)
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
-
     def clearSpeakStatus(self):
         self.client_is_speaking = False
         self.logger.bind(tag=TAG).debug(f"清除服务端讲话状态")
@@ -1158,15 +1127,16 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
-            # 最后关闭线程池（避免阻塞）
-            if self.executor:
-                try:
-                    self.executor.shutdown(wait=False)
-                except Exception as executor_error:
-                    self.logger.bind(tag=TAG).error(
-                        f"关闭线程池时出错: {executor_error}"
-                    )
-                self.executor = None
+            # 归还从实例池获取的提供者
+            for provider in self.pooled_providers:
+                release_session = getattr(provider, "release_session", None)
+                if release_session:
+                    release_session(self.session_id)
+                provider_pool.release(provider)
+            self.pooled_providers = []
+
+            # 线程池为全局共享，这里只释放引用
+            self.executor = None
 
             self.logger.bind(tag=TAG).info("连接资源已释放")
         except Exception as e:
@@ -1182,12 +1152,13 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).debug(
                 f"开始清理: TTS队列大小={self.tts.tts_text_queue.qsize()}, 音频队列大小={self.tts.tts_audio_queue.qsize()}"
             )
+            # 递增TTS轮次代号，正在合成和已预取的句子不再播放
+            self.tts.interrupt()
 
             # 使用非阻塞方式清空队列
             for q in [
                 self.tts.tts_text_queue,
                 self.tts.tts_audio_queue,
-                self.report_queue,
             ]:
                 if not q:
                     continue
@@ -1202,16 +1173,16 @@ class ConnectionHandler:
             )
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytearray()
+        self.audio_ring.skip_pending()
+        self.audio_ring.start_utterance()
         self.client_have_voice = False
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
-            # Use the existing chat method
-            self.chat(text)
+            await self.chat_async(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -1298,5 +1269,49 @@ class ConnectionHandler:
     async def submit_chat_async(self, actual_text, chat_id=None):
         self.set_state_thinking()
         await send_stt_message(self, actual_text)
-        # await self.loop.run_in_executor(self.executor, self.chat, actual_text, chat_id)
-        self.executor.submit(self.chat, actual_text, tool_call=False, depth=0, chat_id=chat_id)
\ No newline at end of file
+        # LLM流式响应直接在事件循环中处理，不再占用chat线程
+        task = asyncio.create_task(
+            self.chat_async(actual_text, tool_call=False, depth=0, chat_id=chat_id)
+        )
+        task_key = chat_id if chat_id is not None else id(task)
+        self.chat_tasks[task_key] = task
+        task.add_done_callback(lambda _: self._on_chat_task_done(task_key))
+
+    def _on_chat_task_done(self, task_key):
+        self.chat_tasks.pop(task_key, None)
+        turn = self.speculative_turns.get(task_key)
+        # 仍在等待意图判定的缓冲交给判定结果处理
+        if turn is not None and not turn.pending:
+            self.speculative_turns.pop(task_key, None)
+
+    def begin_intent_check(self, chat_id):
+        """开始一轮意图判定，LLM输出先进入推测缓冲"""
+        self.intent_chat_id[chat_id] = 1
+        turn = SpeculativeTurn(self.tts.tts_text_queue.put)
+        turn.release_after(float(self.config.get("intent_max_wait_seconds", 2.0)))
+        self.speculative_turns[chat_id] = turn
+
+    def set_intent_verdict(self, chat_id, handled):
+        """记录意图判定结果：未命中立即放出缓冲，命中则丢弃缓冲并取消同一轮的LLM任务"""
+        self.intent_chat_id[chat_id] = 2 if handled else 3
+        if chat_id in self.chat_tasks:
+            # 缓冲保留到LLM任务结束，保证被取消的任务不会再下发输出
+            turn = self.speculative_turns.get(chat_id)
+        else:
+            turn = self.speculative_turns.pop(chat_id, None)
+        if handled:
+            if turn is not None:
+                turn.drop()
+            task = self.chat_tasks.get(chat_id)
+            if task is not None and not task.done():
+                task.cancel()
+        elif turn is not None:
+            turn.release()
+
+    def cancel_chat_tasks(self):
+        """客户端打断时丢弃暂存的输出并取消所有进行中的LLM任务"""
+        for turn in list(self.speculative_turns.values()):
+            turn.drop()
+        for task in list(self.chat_tasks.values()):
+            if not task.done():
+                task.cancel()
\ No newline at end of file
@@ -12,57 +12,12 @@ from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
 from core.utils.user_wakeup_words import user_wakeup_words_manager
 from plugins_func.functions.create_group import handle_create_group_async
 from core.handle.abortHandle import handleAbortMessage
+from core.utils.intent_matcher import KeywordMatcher, normalize_text, is_negated_hit
 import re
+import functools
 
 TAG = __name__
 
-import difflib
-
-def _normalize_text(t: str) -> str:
-    if not isinstance(t, str):
-        return ''
-    t = t.strip()
-    replacements = {
-        '打開': '打开', '开启': '打开', '开开': '打开',
-        '關': '关', '關閉': '关闭', '关上': '关闭', '關上': '关闭', '关关': '关闭',
-        '車': '车', '燈': '灯', '後備箱': '后备箱', '車窗': '车窗', '車門': '车门',
-        '音量': '音量', '聲音': '声音',
-        '門': '门', '窗戶': '窗户',
-        '雙閃': '双闪', '應急燈': '应急灯', '緊急燈': '紧急灯',
-        '霧燈': '雾灯', '示寬燈': '示宽灯', '位置燈': '位置灯',
-        '駐車燈': '停车灯', '後': '后', '前排': '前', '後排': '后',
-        '主駕': '主驾', '副駕': '副驾'
-    }
-    for k, v in replacements.items():
-        t = t.replace(k, v)
-    return t
-
-def _is_negated(text: str, keyword: str) -> bool:
-    idx = text.find(keyword)
-    if idx == -1:
-        return False
-    window = text[max(0, idx - 4): idx + len(keyword)]
-    negatives = ['不', '不要', '别', '别开', '取消', '先不', '先不要', '先别', '暂时不要', '暂时别']
-    return any(n in window for n in negatives)
-
-def _fuzzy_contains(text: str, keyword: str, threshold: float = 0.85) -> bool:
-    t = _normalize_text(text.lower())
-    k = _normalize_text(keyword.lower())
-    if k in t:
-        return not _is_negated(t, k)
-    sm = difflib.SequenceMatcher(None, t, k)
-    match = sm.find_longest_match(0, len(t), 0, len(k))
-    if match.size == 0:
-        return False
-    score = match.size / len(k) if len(k) > 0 else 0.0
-    if score < threshold:
-        return False
-    start = match.a
-    end = start + match.size
-    window = t[max(0, start - 4): end]
-    negatives = ['不', '不要', '别', '别开', '取消', '先不', '先不要', '先别', '暂时不要', '暂时别']
-    return not any(n in window for n in negatives)
-
 cmd_keywords = {
     "wakeup": [["小宝小宝", "绿仔", "爵士"], "我在呢", "c1.p3", "唤醒指令"],
     "exit": (["退出", "再见", "拜拜", "结束对话"], "再见", "c1.p3", "唤醒指令"),
@@ -302,64 +257,120 @@ async def process_commands(conn, cmd_list, original_text=None):
     return executed
 
             
-async def check_exact_match(conn, text, exclude_cmds=[]):
+DEFAULT_WAKEUP_WORDS = ("小宝小宝", "绿仔", "爵士")
+
+# 规则判断用到的词，与指令关键词一起编译进匹配器
+_DOOR_WORDS = ("车门", "门")
+_WINDOW_WORDS = ("车窗", "窗户", "窗")
+_OPEN_WORDS = ("打开", "开", "升", "升起", "升上", "抬起", "升高")
+_CLOSE_WORDS = ("关闭", "关", "降", "降下", "下降", "落下", "降低")
+_LOWER_WORDS = ("降", "降下", "下降", "落下", "降低")
+_RAISE_WORDS = ("升", "升起", "升上", "抬起", "升高")
+_OPEN_ALT_WORDS = ("降", "降下", "下降", "落下")
+_CLOSE_ALT_WORDS = ("升", "升起", "升上", "抬起")
+_UNLOCK_WORDS = ("解锁", "解鎖")
+_FLASHER_WORDS = ("双闪", "应急灯", "紧急灯", "危险警示灯", "危险报警灯", "警示灯")
+_FRONT_FOG_WORDS = ("前雾灯", "前雾")
+_REAR_FOG_WORDS = ("后雾灯", "后雾")
+_STOP_LIGHT_WORDS = ("停车灯", "示宽灯", "位置灯")
+_HEAD_LIGHT_WORDS = ("车灯", "大灯")
+_OTHER_LIGHT_WORDS = _FLASHER_WORDS + _STOP_LIGHT_WORDS + ("雾灯",)
+_LEFT_WORDS = ("左", "主驾", "驾驶位", "驾驶员")
+_RIGHT_WORDS = ("右", "副驾", "副驾驶")
+_FRONT_WORDS = ("前", "前排", "驾驶位", "副驾", "主驾")
+_REAR_WORDS = ("后", "后排", "后座")
+_POSITION_WORDS = ("左", "右", "前", "后", "主驾", "副驾", "驾驶位", "副驾驶", "前排", "后排")
+
+_RULE_WORDS = set(
+    _DOOR_WORDS + _WINDOW_WORDS + _OPEN_WORDS + _CLOSE_WORDS + _UNLOCK_WORDS
+    + _FLASHER_WORDS + _FRONT_FOG_WORDS + _REAR_FOG_WORDS + _STOP_LIGHT_WORDS
+    + _HEAD_LIGHT_WORDS + _OTHER_LIGHT_WORDS + _LEFT_WORDS + _RIGHT_WORDS
+    + _FRONT_WORDS + _REAR_WORDS + _POSITION_WORDS
+)
+
+
+@functools.lru_cache(maxsize=256)
+def get_command_matcher(wakeup_words=DEFAULT_WAKEUP_WORDS):
+    """按唤醒词获取编译好的指令匹配器（同一组唤醒词只编译一次）"""
+    commands = {cmd: keywords[0] for cmd, keywords in cmd_keywords.items()}
+    commands["wakeup"] = list(wakeup_words)
+    return KeywordMatcher(commands, extra_words=_RULE_WORDS)
+
+
+async def _get_device_matcher(conn):
     try:
         device_id = conn.headers.get("device-id")
         effective = await user_wakeup_words_manager.get_effective_wakeup_words(device_id)
         if effective and isinstance(effective, list) and len(effective) > 0:
-            cmd_keywords["wakeup"][0] = effective
-        else:
-            cmd_keywords["wakeup"][0] = ["小宝小宝","绿仔","爵士"]
+            return get_command_matcher(tuple(effective))
     except Exception as e:
         conn.logger.bind(tag=TAG).warning(f"检查车载唤醒词失败: {e}")
-        cmd_keywords["wakeup"][0] = ["小宝小宝","绿仔","爵士"]
+    return get_command_matcher()
+
+
+async def check_exact_match(conn, text, exclude_cmds=[]):
+    matcher = await _get_device_matcher(conn)
+    cmd = match_command(matcher, text, exclude_cmds)
+    if cmd:
+        conn.logger.bind(tag=TAG).info(f"检测到意图命令: {cmd}")
+    return cmd
+
+
+def match_command(matcher, text, exclude_cmds=()):
+    """规则匹配单条文本，返回指令代号；文本只经过一次自动机扫描"""
+    text_norm = normalize_text(text)
+    hits = matcher.scan(text_norm)
+
+    def has(words):
+        return any(w in hits for w in words)
 
-    text_norm = _normalize_text(text)
+    def negated(word):
+        return is_negated_hit(text_norm, hits, word)
 
-    has_door = any(w in text_norm for w in ["车门", "门"])
-    has_window = any(w in text_norm for w in ["车窗", "窗户", "窗"])
-    has_open_kw = any(w in text_norm for w in ["打开", "开", "升", "升起", "升上", "抬起", "升高"]) and not any(w in text_norm for w in ["降", "降下", "下降", "落下", "降低"])
-    has_close_kw = any(w in text_norm for w in ["关闭", "关", "降", "降下", "下降", "落下", "降低"]) and not any(w in text_norm for w in ["升", "升起", "升上", "抬起", "升高"])
-    has_unlock = any(w in text_norm for w in ["解锁", "解鎖"])
+    has_door = has(_DOOR_WORDS)
+    has_window = has(_WINDOW_WORDS)
+    has_open_kw = has(_OPEN_WORDS) and not has(_LOWER_WORDS)
+    has_close_kw = has(_CLOSE_WORDS) and not has(_RAISE_WORDS)
+    has_unlock = has(_UNLOCK_WORDS)
 
-    if any(w in text_norm for w in ["双闪", "应急灯", "紧急灯", "危险警示灯", "危险报警灯", "警示灯"]):
-        if has_close_kw and not _is_negated(text_norm, "关"):
+    if has(_FLASHER_WORDS):
+        if has_close_kw and not negated("关"):
             return "close_EmergencyFlasher"
-        if has_open_kw and not _is_negated(text_norm, "开"):
+        if has_open_kw and not negated("开"):
             return "open_EmergencyFlasher"
 
-    has_front_fog = any(w in text_norm for w in ["前雾灯", "前雾"]) 
-    has_rear_fog = any(w in text_norm for w in ["后雾灯", "后雾"]) 
-    has_fog_generic = "雾灯" in text_norm
+    has_front_fog = has(_FRONT_FOG_WORDS)
+    has_rear_fog = has(_REAR_FOG_WORDS)
+    has_fog_generic = "雾灯" in hits
     if (has_rear_fog or (has_fog_generic and not has_front_fog)):
-        if has_close_kw and not _is_negated(text_norm, "关"):
+        if has_close_kw and not negated("关"):
             return "close_RearFogLamp"
-        if has_open_kw and not _is_negated(text_norm, "开"):
+        if has_open_kw and not negated("开"):
             return "open_RearFogLamp"
 
-    if any(w in text_norm for w in ["停车灯", "示宽灯", "位置灯"]):
-        if has_close_kw and not _is_negated(text_norm, "关"):
+    if has(_STOP_LIGHT_WORDS):
+        if has_close_kw and not negated("关"):
             return "close_StopLight"
-        if has_open_kw and not _is_negated(text_norm, "开"):
+        if has_open_kw and not negated("开"):
             return "open_StopLight"
 
-    if any(w in text_norm for w in ["车灯", "大灯"]) and not any(w in text_norm for w in ["双闪", "应急灯", "紧急灯", "危险警示灯", "危险报警灯", "停车灯", "示宽灯", "位置灯", "雾灯"]):
-        if has_close_kw and not _is_negated(text_norm, "关"):
+    if has(_HEAD_LIGHT_WORDS) and not has(_OTHER_LIGHT_WORDS):
+        if has_close_kw and not negated("关"):
             return "light_off"
-        if has_open_kw and not _is_negated(text_norm, "开"):
+        if has_open_kw and not negated("开"):
             return "light_on"
 
     if has_window:
-        is_left = any(w in text_norm for w in ["左", "主驾", "驾驶位", "驾驶员"]) 
-        is_right = any(w in text_norm for w in ["右", "副驾", "副驾驶"]) 
-        is_front = any(w in text_norm for w in ["前", "前排", "驾驶位", "副驾", "主驾"]) 
-        is_rear = any(w in text_norm for w in ["后", "后排", "后座"]) 
-        has_open_alt = any(w in text_norm for w in ["降", "降下", "下降", "落下"]) 
-        has_close_alt = any(w in text_norm for w in ["升", "升起", "升上", "抬起"]) 
-        open_kw = (has_open_kw and not _is_negated(text_norm, "开")) or has_open_alt
-        close_kw = (has_close_kw and not _is_negated(text_norm, "关")) or has_close_alt
+        is_left = has(_LEFT_WORDS)
+        is_right = has(_RIGHT_WORDS)
+        is_front = has(_FRONT_WORDS)
+        is_rear = has(_REAR_WORDS)
+        has_open_alt = has(_OPEN_ALT_WORDS)
+        has_close_alt = has(_CLOSE_ALT_WORDS)
+        open_kw = (has_open_kw and not negated("开")) or has_open_alt
+        close_kw = (has_close_kw and not negated("关")) or has_close_alt
         if open_kw and close_kw:
-            if not any(w in text_norm for w in ["升","升起","升上","抬起"]):
+            if not has(_CLOSE_ALT_WORDS):
                 close_kw = False
         if is_left and is_front:
             if close_kw:
@@ -382,81 +393,79 @@ async def check_exact_match(conn, text, exclude_cmds=[]):
             if open_kw:
                 return "open_RightRearWindow"
 
-    if has_door and has_unlock and not _is_negated(text_norm, "解锁"):
+    if has_door and has_unlock and not negated("解锁"):
         return "unlock_door"
-    if has_door and has_open_kw and not _is_negated(text_norm, "开"):
+    if has_door and has_open_kw and not negated("开"):
         return "unlock_door"
     # 若已匹配到具体左/右/前/后窗的条件，上面已返回具体窗命令；
     # 仅在没有任何具体方位信息时，才匹配全车窗开/关
-    if has_window and not any(w in text_norm for w in ["左","右","前","后","主驾","副驾","驾驶位","副驾驶","前排","后排"]) and has_open_kw and not _is_negated(text_norm, "开"):
+    if has_window and not has(_POSITION_WORDS) and has_open_kw and not negated("开"):
         return "open_windows"
-    if has_window and not any(w in text_norm for w in ["左","右","前","后","主驾","副驾","驾驶位","副驾驶","前排","后排"]) and has_close_kw and not _is_negated(text_norm, "关"):
+    if has_window and not has(_POSITION_WORDS) and has_close_kw and not negated("关"):
         return "close_windows"
 
+    exact_cmds = matcher.exact_commands(text_norm, hits)
     # 若文本包含“解锁”，优先匹配解锁车门，并避免误识别为上锁
     skip_lock = False
-    if ("解锁" in text_norm) or ("解鎖" in text_norm):
-        for kw in cmd_keywords.get("unlock_door", [[], "", "", ""])[0]:
-            nkw = _normalize_text(kw)
-            if nkw in text_norm and not _is_negated(text_norm, nkw):
-                conn.logger.bind(tag=TAG).info("检测到意图命令: unlock_door")
-                return "unlock_door"
+    if has_unlock:
+        if "unlock_door" in exact_cmds:
+            return "unlock_door"
         skip_lock = True
 
-    for cmd, keywords in cmd_keywords.items():
+    for cmd in exact_cmds:
         if cmd in exclude_cmds:
             continue
         if skip_lock and cmd == "lock_door":
             continue
-        for kw in keywords[0]:
-            nkw = _normalize_text(kw)
-            if nkw in text_norm and not _is_negated(text_norm, nkw):
-                conn.logger.bind(tag=TAG).info(f"检测到意图命令: {cmd}")
-                return cmd
+        return cmd
 
-    for cmd, keywords in cmd_keywords.items():
-        if cmd in exclude_cmds:
-            continue
-        if any(_fuzzy_contains(text_norm, kw) for kw in keywords[0]):
-            conn.logger.bind(tag=TAG).info(f"检测到意图命令: {cmd}")
+    for cmd in matcher.fuzzy_commands(text_norm, hits):
+        if cmd not in exclude_cmds:
             return cmd
     return
 
+
 async def extract_rule_cmds(conn, text):
     try:
-        text_norm = _normalize_text(text)
-        matches = []
-        has_open_kw = any(w in text_norm for w in ["打开","开"]) and not any(w in text_norm for w in ["降","降下","下降","落下","降低"])
-        has_close_kw = any(w in text_norm for w in ["关闭","关"]) and not any(w in text_norm for w in ["升","升起","升上","抬起","升高"])
-        if has_open_kw and has_close_kw and ("打开" in text_norm) and not any(w in text_norm for w in ["升","升起","升上","抬起"]):
-            has_close_kw = False
-        for cmd, keywords in cmd_keywords.items():
-            for kw in keywords[0]:
-                if _fuzzy_contains(text_norm, kw):
-                    if cmd.startswith("close_") and not has_close_kw:
-                        continue
-                    if cmd.startswith("open_") and not has_open_kw and cmd not in ("unlock_door",):
-                        continue
-                    if cmd not in matches:
-                        matches.append(cmd)
-                    break
-        directional = {
-            "open_LeftFrontWindow","close_LeftFrontWindow",
-            "open_RightFrontWindow","close_RightFrontWindow",
-            "open_LeftRearWindow","close_LeftRearWindow",
-            "open_RightRearWindow","close_RightRearWindow",
-        }
-        if any(d in matches for d in directional):
-            matches = [m for m in matches if m not in ("open_windows","close_windows")]
-        for seg in re.split(r'[，,、;；。\.]+', text):
-            c = await check_exact_match(conn, seg)
-            if c and c not in matches:
-                matches.append(c)
+        matcher = await _get_device_matcher(conn)
+        matches = extract_commands(matcher, text)
+        if matches:
+            conn.logger.bind(tag=TAG).info(f"检测到意图命令: {matches}")
         return matches
     except Exception:
         return []
 
 
+def extract_commands(matcher, text):
+    """从整句中提取全部规则指令：整句模糊匹配加逐段精确匹配"""
+    text_norm = normalize_text(text)
+    hits = matcher.scan(text_norm)
+    matches = []
+    has_open_kw = any(w in hits for w in ["打开","开"]) and not any(w in hits for w in _LOWER_WORDS)
+    has_close_kw = any(w in hits for w in ["关闭","关"]) and not any(w in hits for w in _RAISE_WORDS)
+    if has_open_kw and has_close_kw and ("打开" in hits) and not any(w in hits for w in _CLOSE_ALT_WORDS):
+        has_close_kw = False
+    for cmd in matcher.fuzzy_commands(text_norm, hits):
+        if cmd.startswith("close_") and not has_close_kw:
+            continue
+        if cmd.startswith("open_") and not has_open_kw and cmd not in ("unlock_door",):
+            continue
+        matches.append(cmd)
+    directional = {
+        "open_LeftFrontWindow","close_LeftFrontWindow",
+        "open_RightFrontWindow","close_RightFrontWindow",
+        "open_LeftRearWindow","close_LeftRearWindow",
+        "open_RightRearWindow","close_RightRearWindow",
+    }
+    if any(d in matches for d in directional):
+        matches = [m for m in matches if m not in ("open_windows","close_windows")]
+    for seg in re.split(r'[，,、;；。\.]+', text):
+        c = match_command(matcher, seg)
+        if c and c not in matches:
+            matches.append(c)
+    return matches
+
+
 async def analyze_intent_with_llm(conn, text): # TODO 还是用func可能更靠谱
     """使用LLM分析用户意图"""
     print("analyze_intent_with_llm text: ", text)
@@ -571,12 +580,8 @@ async def handle_user_intent(conn, text):
         return True
         
     print(222, flush=True)
-    text_norm = _normalize_text(filtered_text)
-    cmds = []
-    for seg in re.split(r'[，,、;；。\\.]+', filtered_text):
-        c = await check_exact_match(conn, seg)
-        if c is not None and c not in cmds:
-            cmds.append(c)
+    text_norm = normalize_text(filtered_text)
+    # extract_rule_cmds 已包含逐段精确匹配
     cmds = await extract_rule_cmds(conn, filtered_text)
     if not cmds:
         control_terms = ("车窗","窗户","窗","车灯","灯","后备箱","发动机","引擎","车门","门","双闪","应急灯","紧急灯","雾灯","停车灯","音量","声音","冷","热","吵","安静")
@@ -597,7 +602,7 @@ async def handle_user_intent(conn, text):
     print(444, cmds if cmds else None, flush=True)
     if await check_hanuo_intent(conn, text):
         return True
-    text_norm2 = _normalize_text(text)
+    text_norm2 = normalize_text(text)
     return False
 
 
@@ -666,7 +671,7 @@ async def process_volume_set(conn, ori_cmd):
     """处理音量设置指令"""
     try:
         import re
-        text_norm = _normalize_text(ori_cmd)
+        text_norm = normalize_text(ori_cmd)
         numbers = re.findall(r'\d+', text_norm)
         volume = None
         if numbers:
@@ -781,29 +786,22 @@ async def broadcast_to_group_members(server, group_id, message, exclude_device=N
     if not hasattr(server, 'active_groups') or group_id not in server.active_groups:
         return
     
-    group_info = server.active_groups[group_id]
-    
-    for member_device_id in group_info['members']:
-        if exclude_device and member_device_id == exclude_device:
-            continue
-            
-        # 找到对应的连接并发送消息
-        for conn in server.active_connections:
-            if hasattr(conn, 'device_id') and conn.device_id == member_device_id:
-                tts_message = {
-                    "type": "tts",
-                    "content": message,
-                    "sentence_type": "normal"
-                }
-                try:
-                    await conn.websocket.send(json.dumps(tts_message))
-                except Exception as e:
-                    # 使用任意连接的logger实例
-                    if hasattr(conn, 'logger'):
-                        conn.logger.bind(tag=TAG).error(f"向设备 {member_device_id} 发送消息失败: {e}")
-                    else:
-                        print(f"向设备 {member_device_id} 发送消息失败: {e}")
-                break
+    tts_message = json.dumps({
+        "type": "tts",
+        "content": message,
+        "sentence_type": "normal"
+    })
+
+    # 通过设备索引直接找到在线成员的连接
+    for conn in server.get_group_connections(group_id, exclude_device=exclude_device):
+        try:
+            await conn.websocket.send(tts_message)
+        except Exception as e:
+            # 使用任意连接的logger实例
+            if hasattr(conn, 'logger'):
+                conn.logger.bind(tag=TAG).error(f"向设备 {conn.device_id} 发送消息失败: {e}")
+            else:
+                print(f"向设备 {conn.device_id} 发送消息失败: {e}")
 async def check_hanuo_intent(conn, text):
     """
     检查是否为汉诺集团相关意图
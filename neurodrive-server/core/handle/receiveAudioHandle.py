@@ -8,6 +8,7 @@ import json
 from core.handle.sendAudioHandle import SentenceType, send_stt_message, send_tts_message, sendAudio
 from core.utils.util import opus_datas_to_wav_bytes
 from core.utils.util import audio_to_data
+from core.utils.group_broadcast import group_broadcaster
 import uuid
 
 TAG = __name__
@@ -15,7 +16,7 @@ TAG = __name__
 
 async def handleAudioMessage(conn, audio):
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, audio)
+    have_voice = await conn.vad.detect(conn, audio)
     # print("debug have_voice: ", have_voice, conn.just_woken_up, flush=True)
     
     if hasattr(conn, 'control_cmd_active') and conn.control_cmd_active:
@@ -141,7 +142,7 @@ async def startToChat(conn, text):
 
     # 首先进行意图分析，使用实际文本内容
     chat_id = str(uuid.uuid4())
-    conn.intent_chat_id[chat_id] = 1
+    conn.begin_intent_check(chat_id)
     intent_task = asyncio.create_task(handle_user_intent(conn, actual_text))
     chat_task = asyncio.create_task(conn.submit_chat_async(actual_text, chat_id))
 
@@ -150,7 +151,7 @@ async def startToChat(conn, text):
             handled = task.result()
         except Exception:
             handled = False
-        conn.intent_chat_id[chat_id] = 2 if handled else 3
+        conn.set_intent_verdict(chat_id, handled)
         print("====>intent_handled: ", handled, chat_id, flush=True)
 
     intent_task.add_done_callback(_intent_done)
@@ -277,51 +278,29 @@ async def forward_audio_to_group(conn, audio):
 
         print("forward_audio_to_group", group_info['members'], flush=True)
         
-        # 遍历群组成员，转发音频给除发送者外的其他成员
+        # 收集除发送者外在线的成员连接
+        target_conns = []
         for member_device_id in group_info['members']:
             if member_device_id == sender_device_id:
                 continue  # 跳过发送者自己
-            
-            # 查找目标设备的连接
-            target_conn = None
-            for client_conn in conn.server.active_connections:
-                if hasattr(client_conn, 'device_id') and client_conn.device_id == member_device_id:
-                    target_conn = client_conn
-                    break
-            
+            target_conn = conn.server.get_connection(member_device_id)
             if target_conn and hasattr(target_conn, 'websocket'):
-                # try:
-                #     # 创建音频转发消息，包含发送者信息
-                #     audio_message = {
-                #         "type": "group_audio",
-                #         "sender_device_id": sender_device_id,
-                #         "group_id": group_id,
-                #         "audio_data": audio.hex() if isinstance(audio, bytes) else audio
-                #     }
-                    
-                #     # 发送音频数据给目标设备
-                #     await target_conn.websocket.send(json.dumps(audio_message))
-                # except Exception as e:
-                #     if hasattr(conn, 'logger'):
-                #         conn.logger.bind(tag=TAG).error(f"转发音频给设备 {member_device_id} 失败: {e}")
-                #     else:
-                #         print(f"转发音频给设备 {member_device_id} 失败: {e}")
-
-                try:
-                    target_conn.cient_is_listening = True
-
-                    print("ready to send voice to device: ", target_conn.device_id, flush=True)
-                    # await asyncio.wait_for(send_tts_message(target_conn, "start", None), timeout=5)
-                    await asyncio.wait_for(sendAudio(target_conn, audio), timeout=30) # 直接发送 TODO
-                    # await asyncio.wait_for(send_tts_message(target_conn, "stop"), timeout=5)
-
-                except asyncio.TimeoutError:
-                    print(f"Timeout sending to {target_conn.device_id}")
-                except Exception as e:
-                    print(f"Error sending to {target_conn.device_id}: {e}")
-
-                target_conn.clearSpeakStatus()
+                target_conn.cient_is_listening = True
+                target_conns.append(target_conn)
+
+        # 音频只节流一次，同时分发给所有成员
+        results = await group_broadcaster.broadcast(target_conns, audio)
+        failed = {
+            device_id: result
+            for device_id, result in results.items()
+            if result["dropped"] or result["detached"]
+        }
+        conn.logger.bind(tag=TAG).debug(
+            f"群聊音频转发完成: 成员 {len(results)} 个, 丢帧或摘除 {len(failed)} 个 {failed or ''}"
+        )
 
+        for target_conn in target_conns:
+            target_conn.clearSpeakStatus()
 
         # print("forward_audio_to_group 444", flush=True)
     except Exception as e:
@@ -1,56 +1,89 @@
 """
-TTS上报功能已集成到ConnectionHandler类中。
+聊天记录上报
 
 上报功能包括：
-1. 每个连接对象拥有自己的上报队列和处理线程
-2. 上报线程的生命周期与连接对象绑定
-3. 使用ConnectionHandler.enqueue_tts_report方法进行上报
-
-具体实现请参考core/connection.py中的相关代码。
+1. enqueue_asr_report/enqueue_tts_report 在report线程池中编码音频，交给全局上报流水线
+2. 上报流水线（core/utils/report_pipeline.py）批量请求manager-api，接口不可用时落盘补报
+3. 设备Opus音频默认解码为WAV上报，audio_format为ogg时直接封装为Ogg
 """
 
 import time
+import base64
 
 import opuslib_next
 
-from config.manage_api_client import report as manage_report
+from config.logger import setup_logging
+from core.utils.scheduler import scheduler
+from core.utils.ogg_opus import opus_packets_to_ogg
+from core.utils.report_pipeline import report_pipeline
 
 TAG = __name__
+logger = setup_logging()
+
 
+def build_report(conn, type, text, report_time):
+    """生成上报记录，连接相关字段在入队时确定"""
+    return {
+        "macAddress": conn.device_id,
+        "sessionId": conn.session_id,
+        "chatType": type,
+        "content": text,
+        "reportTime": report_time,
+        "audioBase64": None,
+        "audioFormat": None,
+    }
 
-def report(conn, type, text, opus_data, report_time):
-    """执行聊天记录上报操作
+
+def encode_report_audio(opus_data, audio_format):
+    """编码上报音频，返回 (音频字节, 格式)
+
+    Args:
+        opus_data: opus音频数据列表，或已解码的PCM字节
+        audio_format: wav 或 ogg
+    """
+    if not opus_data:
+        return None, None
+    if isinstance(opus_data, (bytes, bytearray)):
+        # VAD已经解码为PCM，加上WAV头即可
+        return pcm_to_wav(opus_data), "wav"
+    if audio_format == "wav":
+        return opus_to_wav(opus_data), "wav"
+    return opus_packets_to_ogg(opus_data), "ogg"
+
+
+def _encode_and_submit(record, opus_data):
+    """在report线程池中编码音频并放入上报流水线"""
+    try:
+        audio, audio_format = encode_report_audio(opus_data, report_pipeline.audio_format)
+        if audio:
+            record["audioBase64"] = base64.b64encode(audio).decode("utf-8")
+            record["audioFormat"] = audio_format
+    except Exception as e:
+        # 音频编码失败时仍然上报文本
+        logger.bind(tag=TAG).error(f"聊天记录音频编码失败: {e}")
+    report_pipeline.put(record)
+
+
+def submit_report(conn, type, text, opus_data, report_time):
+    """提交一条聊天记录上报
 
     Args:
         conn: 连接对象
         type: 上报类型，1为用户，2为智能体
         text: 合成文本
-        opus_data: opus音频数据
+        opus_data: opus音频数据列表，或已解码的PCM字节；None表示不上报音频
         report_time: 上报时间
     """
-    try:
-        if opus_data:
-            audio_data = opus_to_wav(conn, opus_data)
-        else:
-            audio_data = None
-        # 执行上报
-        manage_report(
-            mac_address=conn.device_id,
-            session_id=conn.session_id,
-            chat_type=type,
-            content=text,
-            audio=audio_data,
-            report_time=report_time,
-        )
-    except Exception as e:
-        conn.logger.bind(tag=TAG).error(f"聊天记录上报失败: {e}")
+    if not text:
+        return
+    record = build_report(conn, type, text, report_time)
+    scheduler.submit("report", _encode_and_submit, record, opus_data)
 
 
-def opus_to_wav(conn, opus_data):
+def opus_to_wav(opus_data):
     """将Opus数据转换为WAV格式的字节流
 
     Args:
-        output_dir: 输出目录（保留参数以保持接口兼容）
         opus_data: opus音频数据
 
     Returns:
@@ -68,13 +101,13 @@ def opus_to_wav(conn, opus_data):
         except opuslib_next.OpusError as e:
             error_count += 1
             # 将错误日志级别降低到DEBUG，避免大量ERROR日志
-            conn.logger.bind(tag=TAG).debug(f"Opus解码错误: {e}")
+            logger.bind(tag=TAG).debug(f"Opus解码错误: {e}")
             # 跳过损坏的数据包，继续处理下一个
 
     # 如果有错误数据包，记录汇总信息
     if error_count > 0:
         success_rate = ((total_packets - error_count) / total_packets) * 100
-        conn.logger.bind(tag=TAG).warning(
+        logger.bind(tag=TAG).warning(
             f"音频数据包处理完成: 总计{total_packets}个，成功{total_packets - error_count}个，"
             f"损坏{error_count}个，成功率{success_rate:.1f}%"
         )
@@ -82,8 +115,19 @@ def opus_to_wav(conn, opus_data):
     if not pcm_data:
         raise ValueError("没有有效的PCM数据")
 
+    return pcm_to_wav(b"".join(pcm_data))
+
+
+def pcm_to_wav(pcm_data_bytes):
+    """为16kHz单声道PCM数据加上WAV文件头
+
+    Args:
+        pcm_data_bytes: PCM音频数据
+
+    Returns:
+        bytes: WAV格式的音频数据
+    """
     # 创建WAV文件头
-    pcm_data_bytes = b"".join(pcm_data)
     num_samples = len(pcm_data_bytes) // 2  # 16-bit samples
 
     # WAV文件头
@@ -119,14 +163,14 @@ def enqueue_tts_report(conn, text, opus_data):
         opus_data: opus音频数据
     """
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
+        # 音频编码和上报都在后台进行，这里只提交
         if conn.chat_history_conf == 2:
-            conn.report_queue.put((2, text, opus_data, int(time.time())))
+            submit_report(conn, 2, text, opus_data, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"TTS数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
             )
         else:
-            conn.report_queue.put((2, text, None, int(time.time())))
+            submit_report(conn, 2, text, None, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"TTS数据已加入上报队列: {conn.device_id}, 不上报音频"
             )
@@ -144,17 +188,17 @@ def enqueue_asr_report(conn, text, opus_data):
     Args:
         conn: 连接对象
         text: 合成文本
-        opus_data: opus音频数据
+        opus_data: opus音频数据列表，或VAD已解码的PCM字节
     """
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
+        # 音频编码和上报都在后台进行，这里只提交
         if conn.chat_history_conf == 2:
-            conn.report_queue.put((1, text, opus_data, int(time.time())))
+            submit_report(conn, 1, text, opus_data, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"ASR数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
             )
         else:
-            conn.report_queue.put((1, text, None, int(time.time())))
+            submit_report(conn, 1, text, None, int(time.time()))
             conn.logger.bind(tag=TAG).debug(
                 f"ASR数据已加入上报队列: {conn.device_id}, 不上报音频"
             )
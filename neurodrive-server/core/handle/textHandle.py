@@ -35,11 +35,7 @@ async def handleTextMessage(conn, message):
             #清空音频缓冲流
             conn.asr_audio.clear()
             #清空ASR音频队列
-            while not conn.asr_audio_queue.empty():
-                try:
-                    conn.asr_audio_queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
+            conn.asr_audio_queue.clear()
             #重置VAD状态
             conn.reset_vad_states()
 
@@ -145,7 +141,7 @@ async def handleTextMessage(conn, message):
                         microphone = None
                 # 读取旧缓存并更新
                 cache_key = f"device_info:{device_id}"
-                current = cache_manager.get(CacheType.DEVICE_INFO, cache_key) or {}
+                current = await cache_manager.aget(CacheType.DEVICE_INFO, cache_key) or {}
                 if volume is not None:
                     current["volume"] = volume
                 if microphone is not None:
@@ -125,6 +125,12 @@ class SimpleHttpServer:
             site = web.TCPSite(runner, host, port)
             await site.start()
 
+            # 后台预渲染OGG提示音，不阻塞服务启动
+            try:
+                await self.ogg_download_handler.prerender()
+            except Exception as e:
+                self.logger.bind(tag=TAG).warning(f"OGG提示音预渲染启动失败: {e}")
+
             # 保持服务运行
             while True:
                 await asyncio.sleep(3600)  # 每隔 1 小时检查一次
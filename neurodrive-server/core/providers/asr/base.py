@@ -9,40 +9,57 @@ import opuslib_next
 import json
 import io
 import time
-import concurrent.futures
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from typing import Optional, Tuple, List, Dict, Any
 from core.handle.receiveAudioHandle import startToChat, forward_audio_to_group
+from core.handle.intentHandler import check_exact_match
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length, is_chinese_english_only
+from core.utils.scheduler import scheduler
+from core.utils.audio_buffer import PACKET_BYTES
 from core.handle.receiveAudioHandle import handleAudioMessage
 
 TAG = __name__
 logger = setup_logging()
 
 
+class PartialASRState:
+    """本地ASR边说边识别的中间状态（每个连接一份，一句话结束后重置）"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        # 正在识别/已识别的语音包数
+        self.pending_packets = 0
+        self.decoded_packets = 0
+        # 最后一个有声音的语音包位置
+        self.voice_end = 0
+        self.text = ""
+        # 连续相同的中间结果次数
+        self.stable_count = 0
+        # 稳定的中间结果命中了规则指令，提前结束这句话
+        self.early_stop = False
+
+
 class ASRProviderBase(ABC):
+    # 边说边识别的间隔（语音包数），0表示只在说完后识别，由支持批量推理的本地ASR设置
+    partial_interval_packets = 0
+
     def __init__(self):
         pass
 
     # 打开音频通道
     async def open_audio_channels(self, conn):
-        conn.asr_priority_thread = threading.Thread(
-            target=self.asr_text_priority_thread, args=(conn,), daemon=True
+        conn.asr_priority_task = asyncio.create_task(
+            self.asr_text_priority_task(conn)
         )
-        conn.asr_priority_thread.start()
 
-    # 有序处理ASR音频
-    def asr_text_priority_thread(self, conn):
+    # 有序处理ASR音频，在事件循环中运行，不占用独立线程
+    async def asr_text_priority_task(self, conn):
         while not conn.stop_event.is_set():
             try:
-                message = conn.asr_audio_queue.get(timeout=1)
-                future = asyncio.run_coroutine_threadsafe(
-                    handleAudioMessage(conn, message),
-                    conn.loop,
-                )
-                future.result()
+                message = await conn.asr_audio_queue.async_get(timeout=1)
+                await handleAudioMessage(conn, message)
             except queue.Empty:
                 continue
             except Exception as e:
@@ -64,23 +81,129 @@ class ASRProviderBase(ABC):
         if not have_voice and not conn.client_have_voice:
             #print("reduce asr_audio....", flush=True)
             conn.asr_audio = conn.asr_audio[-10:]
+            conn.audio_ring.start_utterance(10 * PACKET_BYTES)
+            conn.partial_asr = None
             return
 
+        if self._partial_enabled(conn):
+            self._update_partial(conn, have_voice)
+
         if conn.client_voice_stop:
             asr_audio_task = conn.asr_audio.copy()
             conn.asr_audio.clear()
+            # VAD已解码的PCM，按收到的语音包数截取，避免再次解码
+            pcm_data = conn.audio_ring.take_utterance(len(asr_audio_task) * PACKET_BYTES)
             conn.reset_vad_states()
+            final_text = await self._take_partial_result(conn)
 
             print("audio tasks length: ", len(asr_audio_task), flush=True)
 
             if len(asr_audio_task) >= 5:
-                await self.handle_voice_stop(conn, asr_audio_task)
+                await self.handle_voice_stop(
+                    conn, asr_audio_task, pcm_data, final_text=final_text
+                )
             else:
                 self.stop_ws_connection()
 
+    def _partial_enabled(self, conn) -> bool:
+        return (
+            self.partial_interval_packets > 0
+            and getattr(self, "engine", None) is not None
+            and conn.audio_format != "pcm"
+            and not getattr(conn, "current_group_id", None)
+        )
+
+    def _update_partial(self, conn, have_voice):
+        """说话过程中按间隔识别已收到的音频，静音开始时立即识别完整语句"""
+        state = conn.partial_asr
+        if state is None:
+            state = conn.partial_asr = PartialASRState()
+        if not conn.client_have_voice:
+            return
+
+        packets = len(conn.asr_audio)
+        if packets < state.pending_packets:
+            # 音频被清空过，已是新的一句话
+            state = conn.partial_asr = PartialASRState()
+        if have_voice:
+            state.voice_end = packets
+        if state.task is not None and not state.task.done():
+            return
+
+        due = packets - state.decoded_packets >= self.partial_interval_packets
+        # 进入静音尾段后，最后一次识别覆盖全部有声音频，说完时即可直接使用
+        tail = not have_voice and state.decoded_packets < state.voice_end
+        if not (due or tail):
+            return
+
+        view = conn.audio_ring.utterance_view()
+        snapshot = bytes(view[max(0, len(view) - packets * PACKET_BYTES) :])
+        state.pending_packets = packets
+        state.task = asyncio.create_task(self._run_partial(conn, state, snapshot, packets))
+
+    async def _run_partial(self, conn, state, pcm_data: bytes, packets: int):
+        from core.providers.asr.batch_engine import pcm_to_samples
+
+        try:
+            text = await scheduler.run(
+                "asr", self.engine.transcribe, pcm_to_samples(pcm_data)
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"中间识别失败: {e}")
+            return
+        if conn.partial_asr is not state:
+            return  # 这句话已经结束
+
+        state.stable_count = state.stable_count + 1 if text and text == state.text else 0
+        state.text = text
+        state.decoded_packets = packets
+        logger.bind(tag=TAG).debug(f"中间识别结果: {text}")
+
+        # 连续两次相同的结果命中规则指令时，不再等待静音，提前结束这句话
+        if state.stable_count >= 1 and not state.early_stop and not conn.client_voice_stop:
+            _, filtered_text = remove_punctuation_and_length(text)
+            if filtered_text and await check_exact_match(conn, filtered_text):
+                logger.bind(tag=TAG).info(f"中间结果命中指令，提前结束: {text}")
+                state.early_stop = True
+                state.voice_end = min(state.voice_end, packets)
+                conn.client_voice_stop = True
+
+    async def _take_partial_result(self, conn) -> Optional[str]:
+        """一句话结束时取出覆盖全部有声音频的中间结果，没有则返回None"""
+        state, conn.partial_asr = conn.partial_asr, None
+        if state is None or state.voice_end <= 0:
+            return None
+
+        task = state.task
+        if task is not None and not task.done():
+            if state.pending_packets < state.voice_end:
+                task.cancel()
+                return None
+            # 静音尾段的识别已在进行，等待它完成即可
+            try:
+                conn.partial_asr = state
+                await asyncio.wait_for(asyncio.shield(task), timeout=5)
+            except Exception:
+                return None
+            finally:
+                conn.partial_asr = None
+        if state.decoded_packets >= state.voice_end:
+            return state.text
+        return None
+
     # 处理语音停止
-    async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
-        """并行处理ASR和声纹识别"""
+    async def handle_voice_stop(
+        self,
+        conn,
+        asr_audio_task: List[bytes],
+        pcm_data: Optional[bytes] = None,
+        final_text: Optional[str] = None,
+    ):
+        """并行处理ASR和声纹识别
+
+        pcm_data为VAD已解码好的整句PCM，提供时直接使用，不再解码Opus
+        final_text为边说边识别得到的完整结果，提供时跳过ASR
+        """
         try:
             if not hasattr(conn, 'abort_asr_start'):
                 conn.abort_asr_start = -1
@@ -102,12 +225,18 @@ class ASRProviderBase(ABC):
             total_start_time = time.monotonic()
             
             # 准备音频数据
-            if conn.audio_format == "pcm":
-                pcm_data = asr_audio_task
+            if pcm_data and conn.audio_format != "pcm":
+                combined_pcm_data = pcm_data
+                asr_input, asr_format = [pcm_data], "pcm"
+                report_audio = pcm_data
             else:
-                pcm_data = self.decode_opus(asr_audio_task)
-            
-            combined_pcm_data = b"".join(pcm_data)
+                if conn.audio_format == "pcm":
+                    pcm_frames = asr_audio_task
+                else:
+                    pcm_frames = self.decode_opus(asr_audio_task)
+                combined_pcm_data = b"".join(pcm_frames)
+                asr_input, asr_format = asr_audio_task, conn.audio_format
+                report_audio = asr_audio_task
             
             # 预先准备WAV数据
             wav_data = None
@@ -123,7 +252,7 @@ class ASRProviderBase(ABC):
                     asyncio.set_event_loop(loop)
                     try:
                         result = loop.run_until_complete(
-                            self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
+                            self.speech_to_text(asr_input, conn.session_id, asr_format)
                         )
                         end_time = time.monotonic()
                         logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
@@ -160,20 +289,27 @@ class ASRProviderBase(ABC):
                 print("abort asr 2",  conn.first_asr_audio_time, conn.abort_asr_start)
                 return
 
-            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as thread_executor:
-                asr_future = thread_executor.submit(run_asr)
-                
-                if conn.voiceprint_provider and wav_data:
-                    voiceprint_future = thread_executor.submit(run_voiceprint)
-                    
-                    # 等待两个线程都完成
-                    asr_result = asr_future.result(timeout=15)
-                    voiceprint_result = voiceprint_future.result(timeout=15)
-                    
-                    results = {"asr": asr_result, "voiceprint": voiceprint_result}
-                else:
-                    asr_result = asr_future.result(timeout=15)
-                    results = {"asr": asr_result, "voiceprint": None}
+            # 提交到共享的asr线程池，在事件循环中等待，不阻塞其他连接
+            if final_text is not None:
+                logger.bind(tag=TAG).info(f"使用中间识别结果: {final_text}")
+                asr_future = asyncio.get_running_loop().create_future()
+                asr_future.set_result((final_text, None))
+            else:
+                asr_future = asyncio.wrap_future(scheduler.submit("asr", run_asr))
+
+            if conn.voiceprint_provider and wav_data:
+                voiceprint_future = asyncio.wrap_future(
+                    scheduler.submit("asr", run_voiceprint)
+                )
+
+                # 等待两个任务都完成
+                asr_result = await asyncio.wait_for(asr_future, timeout=15)
+                voiceprint_result = await asyncio.wait_for(voiceprint_future, timeout=15)
+
+                results = {"asr": asr_result, "voiceprint": voiceprint_result}
+            else:
+                asr_result = await asyncio.wait_for(asr_future, timeout=15)
+                results = {"asr": asr_result, "voiceprint": None}
 
             # 处理结果
             raw_text, file_path = results.get("asr", ("", None))
@@ -206,7 +342,7 @@ class ASRProviderBase(ABC):
                 
                 # 使用自定义模块进行上报
                 await startToChat(conn, enhanced_text)
-                enqueue_asr_report(conn, enhanced_text, asr_audio_task)
+                enqueue_asr_report(conn, enhanced_text, report_audio)
             else:
                 if raw_text:
                     logger.bind(tag=TAG).info(f"过滤噪音或无效文本: {raw_text}")
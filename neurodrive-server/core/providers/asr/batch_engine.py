@@ -0,0 +1,203 @@
+"""
+本地ASR批量推理引擎
+
+多个连接同时说完话时，把各自的整句音频合并成一个批次做一次推理：
+1. 调度线程收集请求，凑满批次或达到最大等待时间后提交；推理繁忙时不提交，新请求继续积累为更大的批次
+2. 音频以float32数组在内存中传递，不落临时文件
+3. 可选多进程：每个工作进程各自加载一份模型，批次在进程间轮流执行
+"""
+
+import time
+import queue
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 工作进程中加载的模型
+_worker_module = None
+_worker_model = None
+
+
+def _init_worker(module_name: str, model_config: Dict[str, Any]) -> None:
+    """工作进程初始化：按模块名加载模型"""
+    global _worker_module, _worker_model
+    _worker_module = importlib.import_module(module_name)
+    _worker_model = _worker_module.load_model(model_config)
+
+
+def _run_in_worker(batch: List[np.ndarray]) -> List[str]:
+    return _worker_module.transcribe_batch(_worker_model, batch)
+
+
+def pcm_to_samples(pcm_data: bytes) -> np.ndarray:
+    """16位PCM转换为[-1, 1]范围的float32采样"""
+    return np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768
+
+
+class LocalASRBatchEngine:
+    """本地ASR批量推理引擎（线程安全，供asr线程池中的任务调用）"""
+
+    def __init__(
+        self,
+        module_name: str,
+        model_config: Dict[str, Any],
+        model: Any = None,
+        max_batch_size: int = 8,
+        max_wait_ms: int = 20,
+        num_workers: int = 0,
+        timeout: float = 15,
+    ):
+        """
+        Args:
+            module_name: 提供load_model(config)和transcribe_batch(model, batch)的模块
+            model_config: 传给load_model的配置（多进程模式下在工作进程中使用）
+            model: 已加载的模型，单进程模式下使用
+            max_batch_size: 单个批次最多包含的音频数
+            max_wait_ms: 凑批次的最长等待时间（毫秒）
+            num_workers: 工作进程数，0表示在当前进程中推理
+            timeout: 等待识别结果的超时时间（秒）
+        """
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, int(max_wait_ms)) / 1000
+        self.timeout = timeout
+        self._requests: "queue.Queue" = queue.Queue()
+        self._stats = {"requests": 0, "batches": 0, "errors": 0, "infer_time": 0.0}
+        self._stats_lock = threading.Lock()
+
+        module = importlib.import_module(module_name)
+        self.num_workers = max(0, int(num_workers))
+        if self.num_workers > 0:
+            # 使用spawn避免fork时复制当前进程中的线程和模型状态
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(module_name, model_config),
+            )
+            self._run_batch: Callable = _run_in_worker
+        else:
+            if model is None:
+                model = module.load_model(model_config)
+            # 模型不支持并发调用，单进程模式下批次串行执行
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="asr-batch"
+            )
+            self._run_batch = lambda batch: module.transcribe_batch(model, batch)
+
+        # 空闲推理槽位，与可同时执行的批次数一致，没有空闲槽位时调度线程不取请求
+        self._slots = threading.Semaphore(max(1, self.num_workers))
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name="asr-batch-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+        logger.bind(tag=TAG).info(
+            f"本地ASR批量推理已启动: {module_name}，批次上限 {self.max_batch_size}，"
+            f"等待 {int(self.max_wait * 1000)}ms，工作进程 {self.num_workers}"
+        )
+
+    def transcribe(self, samples: np.ndarray) -> str:
+        """识别一段16kHz单声道float32音频（阻塞直到得到结果）"""
+        future: Future = Future()
+        self._requests.put((samples, future))
+        return future.result(timeout=self.timeout)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            self._slots.acquire()
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._requests.get(timeout=remaining))
+                    else:
+                        batch.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            samples = [item[0] for item in batch]
+            futures = [item[1] for item in batch]
+            start_time = time.monotonic()
+            try:
+                result = self._executor.submit(self._run_batch, samples)
+            except Exception as e:
+                self._slots.release()
+                self._fail(futures, e)
+                continue
+            result.add_done_callback(
+                lambda f, futures=futures, start_time=start_time: self._complete(
+                    f, futures, start_time
+                )
+            )
+
+    def _complete(self, result: Future, futures: List[Future], start_time: float) -> None:
+        self._slots.release()
+        try:
+            texts = result.result()
+            if len(texts) != len(futures):
+                raise ValueError(f"识别结果数量不匹配: {len(texts)} != {len(futures)}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"本地ASR批量推理失败: {e}")
+            self._fail(futures, e)
+            return
+
+        with self._stats_lock:
+            self._stats["requests"] += len(futures)
+            self._stats["batches"] += 1
+            self._stats["infer_time"] += time.monotonic() - start_time
+        for future, text in zip(futures, texts):
+            if not future.done():
+                future.set_result(text)
+
+    def _fail(self, futures: List[Future], error: Exception) -> None:
+        with self._stats_lock:
+            self._stats["errors"] += 1
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回批量推理统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["avg_batch_size"] = round(stats["requests"] / batches, 2) if batches else 0
+        stats["avg_infer_time"] = round(stats["infer_time"] / batches, 3) if batches else 0
+        # 每条音频分摊的推理耗时，批量推理生效时应随 avg_batch_size 增大而下降
+        stats["avg_infer_time_per_request"] = (
+            round(stats["infer_time"] / stats["requests"], 3) if stats["requests"] else 0
+        )
+        stats["infer_time"] = round(stats["infer_time"], 3)
+        stats["queued"] = self._requests.qsize()
+        return stats
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_batch_engine(
+    module_name: str, config: Dict[str, Any], model_config: Dict[str, Any], model=None
+) -> LocalASRBatchEngine:
+    """根据ASR配置中的批量参数创建推理引擎"""
+    batch_max_size = config.get("batch_max_size", 8)
+    batch_max_delay_ms = config.get("batch_max_delay_ms", 20)
+    num_workers = config.get("num_workers", 0)
+    return LocalASRBatchEngine(
+        module_name,
+        model_config,
+        model=model,
+        max_batch_size=int(batch_max_size) if batch_max_size else 8,
+        max_wait_ms=int(batch_max_delay_ms) if batch_max_delay_ms else 20,
+        num_workers=int(num_workers) if num_workers else 0,
+    )
@@ -6,6 +6,7 @@ import psutil
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.batch_engine import create_batch_engine, pcm_to_samples
 from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
 import shutil
@@ -35,6 +36,34 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
+def load_model(model_config: dict):
+    """加载FunASR模型（批量推理引擎在当前进程或工作进程中调用）"""
+    with CaptureOutput():
+        return AutoModel(
+            model=model_config["model_dir"],
+            vad_kwargs={"max_single_segment_time": 30000},
+            disable_update=True,
+            hub="hf",
+            # device="cuda:0",  # 启用GPU加速
+        )
+
+
+def transcribe_batch(model, batch: list) -> List[str]:
+    """一次generate识别一个批次的音频
+
+    FunASR的batch_size默认为1，不指定时仍会逐条推理，这里按批次实际大小传入
+    """
+    results = model.generate(
+        input=batch,
+        cache={},
+        language="auto",
+        use_itn=True,
+        batch_size=len(batch),
+        batch_size_s=60,
+    )
+    return [rich_transcription_postprocess(result["text"]) for result in results]
+
+
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         super().__init__()
@@ -68,14 +97,17 @@ class ASRProvider(ASRProviderBase):
         # 添加超时机制的占位符
         logger.bind(tag=TAG).info("开始加载FunASR模型，这可能需要一些时间...")
         try:
-            with CaptureOutput():
-                self.model = AutoModel(
-                    model=self.model_dir,
-                    vad_kwargs={"max_single_segment_time": 30000},
-                    disable_update=True,
-                    hub="hf",
-                    # device="cuda:0",  # 启用GPU加速
-                )
+            model_config = {"model_dir": self.model_dir}
+            num_workers = config.get("num_workers", 0)
+            # 多进程模式下模型只在工作进程中加载
+            self.model = None if num_workers and int(num_workers) > 0 else load_model(model_config)
+            # 所有连接共享的批量推理引擎
+            self.engine = create_batch_engine(__name__, config, model_config, self.model)
+            # 说话过程中每隔多久识别一次已收到的音频，0表示只在说完后识别
+            partial_interval_ms = config.get("partial_interval_ms", 600)
+            self.partial_interval_packets = (
+                int(partial_interval_ms) // 60 if partial_interval_ms else 0
+            )
             logger.bind(tag=TAG).info("FunASR模型初始化完成")
         except Exception as e:
             logger.bind(tag=TAG).error(f"FunASR模型初始化失败: {e}")
@@ -112,14 +144,7 @@ class ASRProvider(ASRProviderBase):
 
                 # 语音识别
                 start_time = time.time()
-                result = self.model.generate(
-                    input=combined_pcm_data,
-                    cache={},
-                    language="auto",
-                    use_itn=True,
-                    batch_size_s=60,
-                )
-                text = rich_transcription_postprocess(result[0]["text"])
+                text = self.engine.transcribe(pcm_to_samples(combined_pcm_data))
                 logger.bind(tag=TAG).debug(
                     f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
                 )
@@ -7,6 +7,7 @@ from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.batch_engine import create_batch_engine, pcm_to_samples
 
 import numpy as np
 import sherpa_onnx
@@ -34,6 +35,32 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
+def load_model(model_config: dict):
+    """加载Sherpa-ONNX识别器（批量推理引擎在当前进程或工作进程中调用）"""
+    with CaptureOutput():
+        return sherpa_onnx.OfflineRecognizer.from_sense_voice(
+            model=model_config["model_path"],
+            tokens=model_config["tokens_path"],
+            num_threads=model_config.get("num_threads", 2),
+            sample_rate=16000,
+            feature_dim=80,
+            decoding_method="greedy_search",
+            debug=False,
+            use_itn=True,
+        )
+
+
+def transcribe_batch(model, batch: list) -> List[str]:
+    """一次decode_streams识别一个批次的音频"""
+    streams = []
+    for samples in batch:
+        s = model.create_stream()
+        s.accept_waveform(16000, samples)
+        streams.append(s)
+    model.decode_streams(streams)
+    return [s.result.text for s in streams]
+
+
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         super().__init__()
@@ -72,17 +99,21 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"模型文件处理失败: {str(e)}")
             raise
 
-        with CaptureOutput():
-            self.model = sherpa_onnx.OfflineRecognizer.from_sense_voice(
-                model=self.model_path,
-                tokens=self.tokens_path,
-                num_threads=2,
-                sample_rate=16000,
-                feature_dim=80,
-                decoding_method="greedy_search",
-                debug=False,
-                use_itn=True,
-            )
+        model_config = {
+            "model_path": self.model_path,
+            "tokens_path": self.tokens_path,
+            "num_threads": 2,
+        }
+        num_workers = config.get("num_workers", 0)
+        # 多进程模式下模型只在工作进程中加载
+        self.model = None if num_workers and int(num_workers) > 0 else load_model(model_config)
+        # 所有连接共享的批量推理引擎
+        self.engine = create_batch_engine(__name__, config, model_config, self.model)
+        # 说话过程中每隔多久识别一次已收到的音频，0表示只在说完后识别
+        partial_interval_ms = config.get("partial_interval_ms", 600)
+        self.partial_interval_packets = (
+            int(partial_interval_ms) // 60 if partial_interval_ms else 0
+        )
 
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
@@ -114,24 +145,18 @@ class ASRProvider(ASRProviderBase):
         """语音转文本主处理逻辑"""
         file_path = None
         try:
-            # 保存音频文件
-            start_time = time.time()
             if audio_format == "pcm":
                 pcm_data = opus_data
             else:
                 pcm_data = self.decode_opus(opus_data)
-            file_path = self.save_audio_to_file(pcm_data, session_id)
-            logger.bind(tag=TAG).debug(
-                f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
-            )
+
+            # 只有需要保留音频时才写文件，识别直接使用内存中的PCM
+            if not self.delete_audio_file:
+                file_path = self.save_audio_to_file(pcm_data, session_id)
 
             # 语音识别
             start_time = time.time()
-            s = self.model.create_stream()
-            samples, sample_rate = self.read_wave(file_path)
-            s.accept_waveform(sample_rate, samples)
-            self.model.decode_stream(s)
-            text = s.result.text
+            text = self.engine.transcribe(pcm_to_samples(b"".join(pcm_data)))
             logger.bind(tag=TAG).debug(
                 f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
             )
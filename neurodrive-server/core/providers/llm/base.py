@@ -1,5 +1,8 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.scheduler import scheduler
 
 TAG = __name__
 logger = setup_logging()
@@ -38,3 +41,70 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    async def response_async(self, session_id, dialogue, **kwargs):
+        """异步流式响应，默认在chat线程池中迭代同步生成器
+
+        支持原生异步客户端的提供者应重写此方法，不再占用线程
+        """
+        async for token in self._iterate_in_thread(
+            lambda: self.response(session_id, dialogue, **kwargs)
+        ):
+            yield token
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        """异步的function calling流式响应，默认在chat线程池中迭代同步生成器"""
+        async for item in self._iterate_in_thread(
+            lambda: self.response_with_functions(session_id, dialogue, functions=functions)
+        ):
+            yield item
+
+    def release_session(self, session_id):
+        """连接关闭时释放该会话在提供者中保存的状态
+
+        实例可能通过实例池被多个连接共享，按session_id保存状态的提供者需要重写此方法
+        """
+        pass
+
+    @staticmethod
+    async def _iterate_in_thread(generator_factory):
+        """在线程池中迭代同步生成器，结果通过队列交给事件循环；调用方停止迭代时生成器随之结束"""
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stopped = threading.Event()
+        end = object()
+
+        class _Error:
+            def __init__(self, error):
+                self.error = error
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                # 事件循环已关闭
+                stopped.set()
+
+        def produce():
+            generator = generator_factory()
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    put(item)
+            except Exception as e:
+                put(_Error(e))
+            finally:
+                generator.close()
+                put(end)
+
+        scheduler.submit("chat", produce)
+        try:
+            while True:
+                item = await items.get()
+                if item is end:
+                    return
+                if isinstance(item, _Error):
+                    raise item.error
+                yield item
+        finally:
+            stopped.set()
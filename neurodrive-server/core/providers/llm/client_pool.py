@@ -0,0 +1,66 @@
+"""
+LLM异步客户端池
+
+同一事件循环内，相同 (base_url, api_key, timeout) 的LLM提供者共享一个AsyncOpenAI客户端，
+底层httpx连接池复用TCP/TLS连接；安装了h2时启用HTTP/2，多个流式请求复用同一条连接
+"""
+
+import asyncio
+import weakref
+import importlib.util
+from typing import Any, Dict, Tuple
+
+import httpx
+import openai
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 是否可以启用HTTP/2（httpx需要额外安装h2）
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# 每个客户端的连接池大小
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 50
+KEEPALIVE_EXPIRY = 60
+
+# 客户端只能在创建它的事件循环中使用，按事件循环分别保存，循环销毁后自动释放
+_clients: "weakref.WeakKeyDictionary[Any, Dict[Tuple, openai.AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+
+
+def get_async_openai_client(api_key, base_url, timeout) -> openai.AsyncOpenAI:
+    """获取当前事件循环中共享的AsyncOpenAI客户端"""
+    loop_clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (base_url, api_key, timeout)
+    client = loop_clients.get(key)
+    if client is not None:
+        return client
+
+    http_client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(timeout),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+    client = openai.AsyncOpenAI(
+        api_key=api_key, base_url=base_url, http_client=http_client
+    )
+    loop_clients[key] = client
+    logger.bind(tag=TAG).info(
+        f"创建共享LLM客户端: {base_url}，HTTP/2: {HTTP2_AVAILABLE}"
+    )
+    return client
+
+
+async def close_all() -> None:
+    """关闭当前事件循环中的所有共享客户端"""
+    loop_clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        try:
+            await client.close()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"关闭LLM客户端失败: {e}")
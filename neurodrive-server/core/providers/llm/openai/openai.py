@@ -4,6 +4,7 @@ from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
 from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.client_pool import get_async_openai_client
 
 TAG = __name__
 logger = setup_logging()
@@ -55,13 +56,7 @@ class LLMProvider(LLMProviderBase):
     def response(self, session_id, dialogue, **kwargs):
         try:
             # print("debug.....===> ", self.client, self.model_name,  self.api_key)
-            extra_body = None
-            if self.enable_search:
-                extra_body = {"enable_search": True}
-                if isinstance(self.search_options, dict):
-                    extra_body["search_options"] = self.search_options
-                elif self.forced_search is True:
-                    extra_body["search_options"] = {"forced_search": True}
+            extra_body = self._build_extra_body()
             responses = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
@@ -103,13 +98,7 @@ class LLMProvider(LLMProviderBase):
 
     def response_with_functions(self, session_id, dialogue, functions=None):
         try:
-            extra_body = None
-            if self.enable_search:
-                extra_body = {"enable_search": True}
-                if isinstance(self.search_options, dict):
-                    extra_body["search_options"] = self.search_options
-                elif self.forced_search is True:
-                    extra_body["search_options"] = {"forced_search": True}
+            extra_body = self._build_extra_body()
             stream = self.client.chat.completions.create(
                 model=self.model_name, messages=dialogue, stream=True, tools=functions
                 , extra_body=extra_body
@@ -133,3 +122,93 @@ class LLMProvider(LLMProviderBase):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
             yield f"【OpenAI服务响应异常: {e}】", None
+
+    def _build_extra_body(self):
+        if not self.enable_search:
+            return None
+        extra_body = {"enable_search": True}
+        if isinstance(self.search_options, dict):
+            extra_body["search_options"] = self.search_options
+        elif self.forced_search is True:
+            extra_body["search_options"] = {"forced_search": True}
+        return extra_body
+
+    async def response_async(self, session_id, dialogue, **kwargs):
+        """使用共享的异步客户端流式生成回复，停止迭代时关闭HTTP流"""
+        stream = None
+        try:
+            client = get_async_openai_client(self.api_key, self.base_url, self.timeout)
+            stream = await client.chat.completions.create(
+                model=self.model_name,
+                messages=dialogue,
+                stream=True,
+                max_tokens=kwargs.get("max_tokens", self.max_tokens),
+                temperature=kwargs.get("temperature", self.temperature),
+                top_p=kwargs.get("top_p", self.top_p),
+                frequency_penalty=kwargs.get(
+                    "frequency_penalty", self.frequency_penalty
+                ),
+                extra_body=self._build_extra_body(),
+            )
+
+            is_active = True
+            async for chunk in stream:
+                try:
+                    delta = (
+                        chunk.choices[0].delta
+                        if getattr(chunk, "choices", None)
+                        else None
+                    )
+                    content = delta.content if hasattr(delta, "content") else ""
+                except IndexError:
+                    content = ""
+                if content:
+                    # 处理标签跨多个chunk的情况
+                    if "<think>" in content:
+                        is_active = False
+                        content = content.split("<think>")[0]
+                    if "</think>" in content:
+                        is_active = True
+                        content = content.split("</think>")[-1]
+                    if is_active:
+                        yield content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in async response generation: {e}")
+        finally:
+            if stream is not None:
+                await stream.close()
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        stream = None
+        try:
+            client = get_async_openai_client(self.api_key, self.base_url, self.timeout)
+            stream = await client.chat.completions.create(
+                model=self.model_name,
+                messages=dialogue,
+                stream=True,
+                tools=functions,
+                extra_body=self._build_extra_body(),
+            )
+
+            async for chunk in stream:
+                # 检查是否存在有效的choice且content不为空
+                if getattr(chunk, "choices", None):
+                    yield chunk.choices[0].delta.content, chunk.choices[
+                        0
+                    ].delta.tool_calls
+                # 存在 CompletionUsage 消息时，生成 Token 消耗 log
+                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
+                    usage_info = getattr(chunk, "usage", None)
+                    logger.bind(tag=TAG).info(
+                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+                    )
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in async function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+        finally:
+            if stream is not None:
+                await stream.close()
@@ -0,0 +1,281 @@
+"""
+嵌入向量服务
+
+1. 按文本内容哈希缓存嵌入结果（全局LRU缓存，可选持久化到磁盘）
+2. 合并多个会话并发发起的嵌入请求，批量调用一次嵌入模型
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from config.logger import setup_logging
+from core.utils.cache.manager import cache_manager, CacheType
+
+TAG = __name__
+logger = setup_logging()
+
+# 持久化文件默认保留的向量条数，与内存中EMBEDDING缓存的容量一致
+DEFAULT_MAX_PERSIST_ENTRIES = 10000
+
+
+class EmbeddingService:
+    """带缓存和请求合并的嵌入服务（线程安全，供memory线程池中的任务调用）"""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        model_name: str,
+        max_batch_size: int = 16,
+        max_wait_ms: int = 10,
+        persist_path: Optional[str] = None,
+        timeout: float = 30,
+        max_persist_entries: int = DEFAULT_MAX_PERSIST_ENTRIES,
+    ):
+        """
+        Args:
+            embed_batch: 批量嵌入函数，输入文本列表，返回等长的向量列表
+            model_name: 嵌入模型名称，不同模型的缓存互不共享
+            max_batch_size: 单次请求最多合并的文本数
+            max_wait_ms: 合并请求的最长等待时间（毫秒）
+            persist_path: 持久化文件路径，为空则只缓存在内存中
+            timeout: 等待嵌入结果的超时时间（秒）
+            max_persist_entries: 持久化文件保留的最近向量条数，超过两倍时压缩文件
+        """
+        self._embed_batch = embed_batch
+        self.model_name = model_name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, int(max_wait_ms)) / 1000
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        # 处理完一批或交出处理权时通知等待中的调用方
+        self._cond = threading.Condition(self._lock)
+        self._pending: List[str] = []
+        self._inflight: Dict[str, Future] = {}
+        self._leader_running = False
+        self._batch_full = threading.Event()
+
+        self._stats = {"hits": 0, "misses": 0, "requests": 0, "texts": 0}
+
+        self._persist_path = persist_path
+        self._persist_lock = threading.Lock()
+        self.max_persist_entries = max(1, int(max_persist_entries))
+        self._persist_lines = 0
+        if persist_path:
+            self._load_persisted()
+
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, text: str) -> Optional[List[float]]:
+        return cache_manager.get(
+            CacheType.EMBEDDING, self._cache_key(text), namespace=self.model_name
+        )
+
+    def _cache_set(self, text: str, vector: List[float]) -> None:
+        key = self._cache_key(text)
+        cache_manager.set(CacheType.EMBEDDING, key, vector, namespace=self.model_name)
+        self._persist(key, vector)
+
+    def embed(self, text: str) -> List[float]:
+        """获取单条文本的嵌入向量"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """获取多条文本的嵌入向量，命中缓存的直接返回，其余合并请求"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            vector = self._cache_get(text)
+            if vector is not None:
+                results[i] = vector
+            else:
+                missing.setdefault(text, []).append(i)
+
+        with self._lock:
+            self._stats["hits"] += len(texts) - sum(len(v) for v in missing.values())
+            self._stats["misses"] += sum(len(v) for v in missing.values())
+
+        if missing:
+            futures = self._enqueue(list(missing))
+            self._wait_for(list(futures.values()))
+            for text, future in futures.items():
+                # 超时未完成时抛出TimeoutError
+                vector = future.result(timeout=0)
+                for i in missing[text]:
+                    results[i] = vector
+        return results
+
+    def _enqueue(self, texts: List[str]) -> Dict[str, Future]:
+        """一次性加入待处理队列，相同文本复用进行中的请求"""
+        futures = {}
+        with self._lock:
+            for text in texts:
+                future = self._inflight.get(text)
+                if future is None:
+                    future = Future()
+                    self._inflight[text] = future
+                    self._pending.append(text)
+                futures[text] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._batch_full.set()
+        return futures
+
+    def _wait_for(self, futures: List[Future]) -> None:
+        """等待自己的请求完成
+
+        没有其他线程在处理队列时由当前线程处理一批，处理完立即交出处理权，
+        自己的结果未完成时再重新竞争，因此调用方不会被长期占用去处理其他会话的请求
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if all(future.done() for future in futures):
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if self._leader_running or not self._pending:
+                    self._cond.wait(remaining)
+                    continue
+                self._leader_running = True
+            try:
+                self._run_batch()
+            finally:
+                with self._cond:
+                    self._leader_running = False
+                    self._cond.notify_all()
+
+    def _run_batch(self) -> None:
+        """等待合并后处理一批请求"""
+        with self._lock:
+            need_wait = len(self._pending) < self.max_batch_size
+        if need_wait and self.max_wait > 0:
+            self._batch_full.wait(self.max_wait)
+
+        with self._lock:
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: len(batch)]
+            if len(self._pending) < self.max_batch_size:
+                self._batch_full.clear()
+        if batch:
+            self._process_batch(batch)
+
+    def _process_batch(self, batch: List[str]) -> None:
+        try:
+            vectors = self._embed_batch(batch)
+            if len(vectors) != len(batch):
+                raise ValueError(f"嵌入结果数量不匹配: {len(vectors)} != {len(batch)}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"批量嵌入失败: {e}")
+            with self._lock:
+                futures = [self._inflight.pop(text, None) for text in batch]
+            for future in futures:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["texts"] += len(batch)
+        for text, vector in zip(batch, vectors):
+            vector = list(vector)
+            self._cache_set(text, vector)
+            with self._lock:
+                future = self._inflight.pop(text, None)
+            if future is not None and not future.done():
+                future.set_result(vector)
+
+    def _load_persisted(self) -> None:
+        """从磁盘加载已持久化的嵌入向量"""
+        if not os.path.exists(self._persist_path):
+            return
+        loaded = 0
+        try:
+            with open(self._persist_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._persist_lines += 1
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        continue
+                    if item.get("m") != self.model_name:
+                        continue
+                    cache_manager.set(
+                        CacheType.EMBEDDING, item["k"], item["v"], namespace=self.model_name
+                    )
+                    loaded += 1
+            logger.bind(tag=TAG).info(f"加载嵌入缓存 {loaded} 条: {self._persist_path}")
+            if self._persist_lines > self.max_persist_entries:
+                with self._persist_lock:
+                    self._compact_persisted()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"加载嵌入缓存失败: {e}")
+
+    def _persist(self, key: str, vector: List[float]) -> None:
+        if not self._persist_path:
+            return
+        try:
+            with self._persist_lock:
+                directory = os.path.dirname(self._persist_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self._persist_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"m": self.model_name, "k": key, "v": vector}) + "\n")
+                self._persist_lines += 1
+                if self._persist_lines > 2 * self.max_persist_entries:
+                    self._compact_persisted()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"持久化嵌入缓存失败: {e}")
+
+    def _compact_persisted(self) -> None:
+        """压缩持久化文件：去重并只保留最近写入的 max_persist_entries 条（需持有_persist_lock）"""
+        latest: Dict[tuple, str] = {}
+        with open(self._persist_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    entry = (item["m"], item["k"])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                # 重新插入，保证字典顺序为最后写入的顺序
+                latest.pop(entry, None)
+                latest[entry] = line if line.endswith("\n") else line + "\n"
+        lines = list(latest.values())[-self.max_persist_entries :]
+        tmp_path = self._persist_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self._persist_path)
+        self._persist_lines = len(lines)
+        logger.bind(tag=TAG).info(f"压缩嵌入缓存文件，保留 {len(lines)} 条: {self._persist_path}")
+
+    def stats(self) -> Dict[str, int]:
+        """返回缓存命中与请求合并统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = (
+            round(stats["texts"] / stats["requests"], 2) if stats["requests"] else 0
+        )
+        return stats
+
+
+class CachedEmbedder:
+    """包装mem0的嵌入模型，使mem0内部的embed调用也经过缓存和请求合并
+
+    当前配置的嵌入模型为OpenAI兼容接口，结果与memory_action无关，因此缓存不区分memory_action
+    """
+
+    def __init__(self, embedder, service: EmbeddingService):
+        self._embedder = embedder
+        self._service = service
+
+    def embed(self, text, memory_action=None):
+        return self._service.embed(text)
+
+    def __getattr__(self, name):
+        return getattr(self._embedder, name)
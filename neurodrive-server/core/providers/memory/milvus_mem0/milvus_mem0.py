@@ -327,6 +327,8 @@ except ImportError:
 # 导入 Mem0MilvusIntegration 和 MemoryManager 类
 from .milvus_provider import Mem0MilvusIntegration, MemoryManager
 
+from core.utils.scheduler import scheduler
+
 try:
     from core.utils.util import check_model_key
 except ImportError:
@@ -522,6 +524,9 @@ class MemoryProvider(MemoryProviderBase):
         self.cache_ttl = config.get("cache_ttl", 300)  # 5分钟
         self.enable_fuzzy_matching = config.get("enable_fuzzy_matching", True)
         self.similarity_threshold = config.get("similarity_threshold", 0.7)
+
+        # 各阶段耗时统计：阶段名 -> [次数, 总耗时ms, 最大耗时ms]
+        self.stage_latency = defaultdict(lambda: [0, 0.0, 0.0])
         
         # 调试信息：打印配置内容
         # logger.info(f"[{TAG}] 配置调试信息:")
@@ -560,7 +565,10 @@ class MemoryProvider(MemoryProviderBase):
                 milvus_token=self.milvus_token,
                 openai_api_key=self.openai_api_key,
                 openai_api_base=self.openai_api_base,
-                embedding_model=self.embedding_model
+                embedding_model=self.embedding_model,
+                embedding_cache_path=config.get("embedding_cache_path", None),
+                embedding_batch_size=int(config.get("embedding_batch_size", 16)),
+                embedding_batch_wait_ms=int(config.get("embedding_batch_wait_ms", 10)),
             )
             
             # 初始化高级记忆管理器
@@ -620,13 +628,17 @@ class MemoryProvider(MemoryProviderBase):
             logger.info(f"[{TAG}] 处理后的内容长度: {len(processed_content)}")
             logger.info(f"[{TAG}] 开始保存到Milvus，用户ID: {self.role_id}")
             
-            # 使用高级记忆管理器保存分类记忆
-            result = self.memory_manager.add_categorized_memory(
+            # 使用高级记忆管理器保存分类记忆，向量化和写入Milvus在memory线程池中执行
+            start = time.monotonic()
+            result = await scheduler.run(
+                "memory",
+                self.memory_manager.add_categorized_memory,
                 content=processed_content,
                 user_id=self.role_id,
                 category="conversation",
                 importance=5  # 默认重要性
             )
+            self._record_stage("save", (time.monotonic() - start) * 1000)
             
             # 清空缓存，因为有新的记忆添加
             if self.query_cache:
@@ -655,18 +667,23 @@ class MemoryProvider(MemoryProviderBase):
             return ""
         
         start_time = time.time()
+        role_id = self.role_id
         
         try:
             # 1. 检查缓存
             if self.query_cache:
-                cached_result = self.query_cache.get(query, self.role_id)
+                cached_result = self.query_cache.get(query, role_id)
                 if cached_result is not None:
                     query_time = time.time() - start_time
+                    self._record_stage("cache_hit", query_time * 1000)
                     logger.info(f"[{TAG}] 缓存命中，查询耗时: {query_time:.3f}s")
                     return cached_result
             
             # 2. 快速本地匹配（如果有预加载的索引）
+            stage_start = time.monotonic()
             local_results = await self._quick_local_search(query)
+            local_ms = (time.monotonic() - stage_start) * 1000
+            self._record_stage("local", local_ms)
             
             # 3. 生成查询变体（模糊匹配）
             query_variants = [query]
@@ -674,24 +691,18 @@ class MemoryProvider(MemoryProviderBase):
                 query_variants = self.fuzzy_matcher.get_similar_queries(query)
                 logger.debug(f"[{TAG}] 生成查询变体: {query_variants}")
             
-            # 4. 并行查询多个变体
+            # 4. 多个变体合并为一次批量检索
             all_results = list(local_results)  # 包含本地快速匹配结果
-            search_tasks = []
             
             # 限制向量搜索的查询数量以控制延迟
             max_vector_queries = 2 if local_results else 3
             
-            for variant in query_variants[:max_vector_queries]:
-                task = self._search_single_query(variant)
-                search_tasks.append(task)
-            
-            # 等待所有查询完成
-            if search_tasks:
-                results_list = await asyncio.gather(*search_tasks, return_exceptions=True)
-                
+            timings = {"embed_ms": 0.0, "search_ms": 0.0}
+            variants = query_variants[:max_vector_queries]
+            if variants:
+                results_list, timings = await self._search_queries(variants, role_id)
                 for results in results_list:
-                    if isinstance(results, list):
-                        all_results.extend(results)
+                    all_results.extend(results)
             
             # 5. 去重和排序
             unique_results = self._deduplicate_results(all_results)
@@ -701,10 +712,15 @@ class MemoryProvider(MemoryProviderBase):
             
             # 7. 缓存结果
             if self.query_cache and formatted_result:
-                self.query_cache.set(query, self.role_id, formatted_result)
+                self.query_cache.set(query, role_id, formatted_result)
             
             query_time = time.time() - start_time
-            logger.info(f"[{TAG}] 查询完成，找到 {len(unique_results)} 条记忆，耗时: {query_time:.3f}s")
+            self._record_stage("query", query_time * 1000)
+            logger.info(
+                f"[{TAG}] 查询完成，找到 {len(unique_results)} 条记忆，耗时: {query_time:.3f}s "
+                f"(本地匹配 {local_ms:.1f}ms, 向量化 {timings['embed_ms']:.1f}ms, "
+                f"检索 {timings['search_ms']:.1f}ms)"
+            )
             
             return formatted_result
             
@@ -760,7 +776,9 @@ class MemoryProvider(MemoryProviderBase):
     async def _search_single_query(self, query: str) -> List[Dict[str, Any]]:
         """执行单个查询"""
         try:
-            results = self.integration.search_memories(
+            results = await scheduler.run(
+                "memory",
+                self.integration.search_memories,
                 query=query,
                 user_id=self.role_id,
                 limit=5
@@ -769,6 +787,32 @@ class MemoryProvider(MemoryProviderBase):
         except Exception as e:
             logger.warning(f"[{TAG}] 单个查询失败 '{query}': {e}")
             return []
+
+    async def _search_queries(
+        self, queries: List[str], role_id: str
+    ) -> Tuple[List[List[Dict[str, Any]]], Dict[str, float]]:
+        """在memory线程池中批量检索多个查询变体，不阻塞事件循环"""
+        try:
+            results_list, timings = await scheduler.run(
+                "memory",
+                self.integration.search_memories_batch,
+                queries,
+                role_id,
+                5
+            )
+        except Exception as e:
+            logger.warning(f"[{TAG}] 批量查询失败 {queries}: {e}")
+            return [], {"embed_ms": 0.0, "search_ms": 0.0}
+        self._record_stage("embed", timings.get("embed_ms", 0.0))
+        self._record_stage("search", timings.get("search_ms", 0.0))
+        return results_list, timings
+
+    def _record_stage(self, stage: str, elapsed_ms: float):
+        """记录某个阶段的耗时"""
+        entry = self.stage_latency[stage]
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2] = max(entry[2], elapsed_ms)
     
     def _deduplicate_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """去重查询结果"""
@@ -832,6 +876,16 @@ class MemoryProvider(MemoryProviderBase):
                 "important_memories_count": len(self.memory_index.get('important_memories', [])),
                 "keywords_count": len(self.memory_index.get('keywords', {}))
             })
+        if self.integration.embedding_service is not None:
+            stats["embedding"] = self.integration.embedding_service.stats()
+        stats["stage_latency_ms"] = {
+            stage: {
+                "count": count,
+                "avg": round(total / count, 2) if count else 0.0,
+                "max": round(peak, 2),
+            }
+            for stage, (count, total, peak) in list(self.stage_latency.items())
+        }
         return stats
 
     async def _process_conversation_for_memory(self, msgs) -> str:
@@ -953,7 +1007,9 @@ class MemoryProvider(MemoryProviderBase):
             # 如果有可用的LLM，使用LLM进行总结
             if hasattr(self, 'llm') and self.llm is not None:
                 try:
-                    summary = self.llm.response_no_stream(
+                    summary = await scheduler.run(
+                        "memory",
+                        self.llm.response_no_stream,
                         summary_prompt,
                         conversation_text,
                         max_tokens=300,
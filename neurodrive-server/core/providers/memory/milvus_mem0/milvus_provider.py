@@ -3,10 +3,14 @@
 """
 
 import os
+import time
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from .embedding_service import EmbeddingService, CachedEmbedder
+
 # 延迟导入，避免在模块加载时就尝试网络连接
 Memory = None
 connections = None
@@ -41,7 +45,10 @@ class Mem0MilvusIntegration:
                  milvus_token: Optional[str] = None,
                  openai_api_key: Optional[str] = None,
                  openai_api_base: Optional[str] = None,
-                 embedding_model: str = "text-embedding-ada-002"):
+                 embedding_model: str = "text-embedding-ada-002",
+                 embedding_cache_path: Optional[str] = None,
+                 embedding_batch_size: int = 16,
+                 embedding_batch_wait_ms: int = 10):
         """
         初始化Mem0+Milvus集成
         
@@ -56,6 +63,9 @@ class Mem0MilvusIntegration:
             openai_api_key: API密钥（OpenAI或阿里云百炼）
             openai_api_base: API基础URL（用于阿里云百炼等兼容服务）
             embedding_model: 嵌入模型名称
+            embedding_cache_path: 嵌入缓存持久化文件（可选）
+            embedding_batch_size: 合并嵌入请求的最大批量
+            embedding_batch_wait_ms: 合并嵌入请求的最长等待时间（毫秒）
         """
         self.milvus_uri = milvus_uri
         self.collection_name = collection_name
@@ -64,6 +74,10 @@ class Mem0MilvusIntegration:
         self.embedding_model = embedding_model
         self.openai_api_key = openai_api_key
         self.openai_api_base = openai_api_base
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_batch_wait_ms = embedding_batch_wait_ms
+        self.embedding_service = None
         
         # 设置API配置
         if openai_api_key:
@@ -79,12 +93,17 @@ class Mem0MilvusIntegration:
         
         # 延迟初始化标志
         self._initialized = False
+        self._init_lock = threading.Lock()
         self.memory = None
         self.config = None
     
     def _ensure_initialized(self):
-        """确保已初始化，如果没有则进行初始化"""
-        if not self._initialized:
+        """确保已初始化，如果没有则进行初始化（可能在多个工作线程中同时调用）"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
             try:
                 # 导入依赖
                 _import_dependencies()
@@ -94,6 +113,18 @@ class Mem0MilvusIntegration:
                 
                 # 初始化Memory实例
                 self.memory = Memory.from_config(self.config)
+
+                # mem0内部的嵌入调用统一经过缓存和请求合并
+                self.embedding_service = EmbeddingService(
+                    embed_batch=self._embed_texts,
+                    model_name=self.embedding_model,
+                    max_batch_size=self.embedding_batch_size,
+                    max_wait_ms=self.embedding_batch_wait_ms,
+                    persist_path=self.embedding_cache_path,
+                )
+                self.memory.embedding_model = CachedEmbedder(
+                    self.memory.embedding_model, self.embedding_service
+                )
                 
                 # 确保集合已加载到内存中
                 self._ensure_collection_loaded()
@@ -321,7 +352,115 @@ class Mem0MilvusIntegration:
         except Exception as e:
             self.logger.error(f"搜索记忆失败: {str(e)}")
             return []
-    
+
+    def search_memories_batch(self,
+                              queries: List[str],
+                              user_id: str,
+                              limit: int = 5) -> Tuple[List[List[Dict[str, Any]]], Dict[str, float]]:
+        """
+        批量搜索记忆
+
+        多个查询一次完成向量化，并合并为一次多向量Milvus检索
+
+        Args:
+            queries: 搜索查询列表
+            user_id: 用户ID
+            limit: 每个查询返回结果数量限制
+
+        Returns:
+            (与queries一一对应的记忆列表, 各阶段耗时毫秒)
+        """
+        self._ensure_initialized()
+        timings = {"embed_ms": 0.0, "search_ms": 0.0}
+        if not queries:
+            return [], timings
+
+        vector_store = getattr(self.memory, "vector_store", None)
+        client = getattr(vector_store, "client", None)
+        if client is None or not hasattr(vector_store, "_parse_output"):
+            # 当前mem0版本不支持直接访问向量库，逐个查询
+            start = time.monotonic()
+            results = [self.search_memories(query, user_id, limit) for query in queries]
+            timings["search_ms"] = (time.monotonic() - start) * 1000
+            return results, timings
+
+        try:
+            start = time.monotonic()
+            vectors = self.embedding_service.embed_many(queries)
+            timings["embed_ms"] = (time.monotonic() - start) * 1000
+
+            start = time.monotonic()
+            filters = {"user_id": user_id}
+            if hasattr(vector_store, "_create_filter"):
+                query_filter = vector_store._create_filter(filters)
+            else:
+                query_filter = f'(metadata["user_id"] == "{user_id}")'
+            hits_list = client.search(
+                collection_name=vector_store.collection_name,
+                data=vectors,
+                limit=limit,
+                filter=query_filter,
+                output_fields=["*"],
+            )
+            results = [
+                [self._to_memory_item(hit) for hit in vector_store._parse_output(hits)]
+                for hits in hits_list
+            ]
+            timings["search_ms"] = (time.monotonic() - start) * 1000
+
+            self.logger.info(
+                f"为用户 {user_id} 批量搜索 {len(queries)} 个查询，"
+                f"共 {sum(len(r) for r in results)} 条相关记忆"
+            )
+            return results, timings
+
+        except Exception as e:
+            self.logger.error(f"批量搜索记忆失败: {str(e)}")
+            return [[] for _ in queries], timings
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """一次请求批量向量化多条文本，嵌入模型不支持批量时逐条处理"""
+        embedder = self.memory.embedding_model
+        if isinstance(embedder, CachedEmbedder):
+            embedder = embedder._embedder
+        openai_client = getattr(embedder, "client", None)
+        embedder_config = getattr(embedder, "config", None)
+        if openai_client is not None and hasattr(openai_client, "embeddings"):
+            try:
+                kwargs = {"input": [t.replace("\n", " ") for t in texts],
+                          "model": embedder_config.model}
+                dims = getattr(embedder_config, "embedding_dims", None)
+                if dims:
+                    kwargs["dimensions"] = dims
+                response = openai_client.embeddings.create(**kwargs)
+                return [item.embedding for item in response.data]
+            except Exception as e:
+                self.logger.warning(f"批量向量化失败，改为逐条处理: {str(e)}")
+        return [embedder.embed(text, "search") for text in texts]
+
+    @staticmethod
+    def _to_memory_item(hit) -> Dict[str, Any]:
+        """将Milvus检索结果转换为与Memory.search一致的记忆格式"""
+        payload = hit.payload or {}
+        promoted_keys = ["user_id", "agent_id", "run_id", "actor_id", "role"]
+        core_keys = {"data", "hash", "created_at", "updated_at", "id", *promoted_keys}
+
+        item = {
+            "id": hit.id,
+            "memory": payload.get("data", ""),
+            "hash": payload.get("hash"),
+            "created_at": payload.get("created_at"),
+            "updated_at": payload.get("updated_at"),
+            "score": hit.score,
+        }
+        for key in promoted_keys:
+            if key in payload:
+                item[key] = payload[key]
+        metadata = {k: v for k, v in payload.items() if k not in core_keys}
+        if metadata:
+            item["metadata"] = metadata
+        return item
+
     def get_all_memories(self, user_id: str) -> Dict[str, Any]:
         """
         获取用户的所有记忆
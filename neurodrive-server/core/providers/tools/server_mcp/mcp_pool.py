@@ -0,0 +1,261 @@
+"""服务端MCP进程池
+
+所有连接共享同一组MCP服务：
+1. 按需启动：第一次需要工具列表或调用工具时才启动对应服务
+2. 会话复用：同一个MCP会话支持多个并发请求，所有连接共用
+3. 工具列表缓存：tools/list结果在进程内共享，服务被回收后仍保留
+4. 健康检查与空闲回收：定期ping运行中的服务，长时间空闲的服务自动关闭
+"""
+
+import asyncio
+import os
+import json
+import time
+from typing import Dict, Any, List, Optional
+from config.config_loader import get_project_dir
+from config.logger import setup_logging
+from .mcp_client import ServerMCPClient
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_IDLE_TIMEOUT = 600  # 空闲多少秒后关闭服务
+DEFAULT_HEALTH_CHECK_INTERVAL = 60  # 健康检查间隔（秒）
+HEALTH_CHECK_TIMEOUT = 10
+
+
+class PooledMCPServer:
+    """进程池中的单个MCP服务"""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.client: Optional[ServerMCPClient] = None
+        self.tools: Optional[List[Dict[str, Any]]] = None
+        self.tool_names = set()
+        self.lock = asyncio.Lock()
+        self.active_calls = 0
+        self.last_used = time.monotonic()
+        self.start_count = 0
+
+    def is_running(self) -> bool:
+        return self.client is not None and self.client.is_connected()
+
+    async def ensure_started(self) -> ServerMCPClient:
+        """确保服务已启动，并发调用只会启动一次"""
+        if self.is_running():
+            return self.client
+        async with self.lock:
+            if self.is_running():
+                return self.client
+            await self._stop_locked()
+            logger.bind(tag=TAG).info(f"启动服务端MCP服务: {self.name}")
+            client = ServerMCPClient(self.config)
+            await client.initialize()
+            if not client.is_connected():
+                await client.cleanup()
+                raise RuntimeError(f"MCP服务 {self.name} 启动失败")
+            self.client = client
+            self.start_count += 1
+            self.tools = client.get_available_tools()
+            self.tool_names = {tool["function"]["name"] for tool in self.tools}
+            return client
+
+    async def stop(self) -> None:
+        async with self.lock:
+            await self._stop_locked()
+
+    async def _stop_locked(self) -> None:
+        client, self.client = self.client, None
+        if client is not None:
+            try:
+                await asyncio.wait_for(client.cleanup(), timeout=20)
+            except (asyncio.TimeoutError, Exception) as e:
+                logger.bind(tag=TAG).error(f"关闭服务端MCP服务 {self.name} 时出错: {e}")
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        client = await self.ensure_started()
+        self.active_calls += 1
+        self.last_used = time.monotonic()
+        try:
+            return await client.call_tool(tool_name, arguments)
+        finally:
+            self.active_calls -= 1
+            self.last_used = time.monotonic()
+
+
+class ServerMCPPool:
+    """进程级共享的服务端MCP服务池"""
+
+    def __init__(self):
+        self.config_path = get_project_dir() + "data/.mcp_server_settings.json"
+        self.idle_timeout = DEFAULT_IDLE_TIMEOUT
+        self.health_check_interval = DEFAULT_HEALTH_CHECK_INTERVAL
+        self.servers: Dict[str, PooledMCPServer] = {}
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据配置设置空闲回收和健康检查参数"""
+        pool_config = (config or {}).get("mcp_pool") or {}
+        try:
+            self.idle_timeout = int(pool_config.get("idle_timeout", self.idle_timeout))
+            self.health_check_interval = int(
+                pool_config.get("health_check_interval", self.health_check_interval)
+            )
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(f"mcp_pool配置无效: {pool_config}")
+
+    def load_config(self) -> Dict[str, Any]:
+        """加载MCP服务配置"""
+        if not os.path.exists(self.config_path):
+            logger.bind(tag=TAG).warning(
+                f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
+            )
+            return {}
+
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            return config.get("mcpServers", {})
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"Error loading MCP config from {self.config_path}: {e}"
+            )
+            return {}
+
+    async def _ensure_loaded(self) -> None:
+        """首次使用时加载配置并获取工具列表"""
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._loaded:
+                return
+            for name, srv_config in self.load_config().items():
+                if not srv_config.get("command") and not srv_config.get("url"):
+                    logger.bind(tag=TAG).warning(
+                        f"Skipping server {name}: neither command nor url specified"
+                    )
+                    continue
+                self.servers[name] = PooledMCPServer(name, srv_config)
+
+            # 并行启动各服务以获取工具列表，之后由空闲回收关闭
+            results = await asyncio.gather(
+                *(server.ensure_started() for server in self.servers.values()),
+                return_exceptions=True,
+            )
+            for server, result in zip(list(self.servers.values()), results):
+                if isinstance(result, Exception):
+                    logger.bind(tag=TAG).error(
+                        f"Failed to initialize MCP server {server.name}: {result}"
+                    )
+            self._loaded = True
+            self._start_maintenance()
+
+    def _start_maintenance(self) -> None:
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(
+                self._maintenance_loop(), name="ServerMCPPoolMaintenance"
+            )
+
+    async def _maintenance_loop(self) -> None:
+        """定期做健康检查并回收空闲服务"""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for server in list(self.servers.values()):
+                try:
+                    await self._check_server(server)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"检查MCP服务 {server.name} 时出错: {e}")
+
+    async def _check_server(self, server: PooledMCPServer) -> None:
+        if server.client is None or server.active_calls > 0:
+            return
+
+        idle = time.monotonic() - server.last_used
+        if self.idle_timeout > 0 and idle >= self.idle_timeout:
+            logger.bind(tag=TAG).info(f"MCP服务 {server.name} 空闲 {int(idle)}s，关闭进程")
+            await server.stop()
+            return
+
+        healthy = server.is_running()
+        session = server.client.session if healthy else None
+        if session is not None and hasattr(session, "send_ping"):
+            try:
+                await asyncio.wait_for(session.send_ping(), timeout=HEALTH_CHECK_TIMEOUT)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"MCP服务 {server.name} 健康检查失败: {e}")
+                healthy = False
+        if not healthy:
+            # 下次调用时重新启动
+            await server.stop()
+
+    async def get_tools(self) -> List[Dict[str, Any]]:
+        """获取所有服务的工具定义（使用缓存的tools/list结果）"""
+        await self._ensure_loaded()
+        tools = []
+        for server in self.servers.values():
+            if server.tools:
+                tools.extend(server.tools)
+        return tools
+
+    def find_server(self, tool_name: str) -> Optional[PooledMCPServer]:
+        for server in self.servers.values():
+            if tool_name in server.tool_names:
+                return server
+        return None
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """调用工具，失败时重启对应服务后重试"""
+        await self._ensure_loaded()
+        server = self.find_server(tool_name)
+        if server is None:
+            raise ValueError(f"工具 {tool_name} 在任意MCP服务中未找到")
+
+        max_retries = 3  # 最大重试次数
+        retry_interval = 2  # 重试间隔(秒)
+        for attempt in range(max_retries):
+            try:
+                return await server.call_tool(tool_name, arguments)
+            except Exception as e:
+                # 最后一次尝试失败时直接抛出异常
+                if attempt == max_retries - 1:
+                    raise
+
+                logger.bind(tag=TAG).warning(
+                    f"执行工具 {tool_name} 失败 (尝试 {attempt+1}/{max_retries}): {e}"
+                )
+                # 关闭旧的连接，下次调用时重新启动
+                if server.active_calls == 0:
+                    await server.stop()
+                await asyncio.sleep(retry_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各服务的运行状态"""
+        now = time.monotonic()
+        return {
+            name: {
+                "running": server.is_running(),
+                "tools": len(server.tool_names),
+                "active_calls": server.active_calls,
+                "idle_seconds": int(now - server.last_used),
+                "start_count": server.start_count,
+            }
+            for name, server in self.servers.items()
+        }
+
+    async def shutdown(self) -> None:
+        """关闭所有MCP服务"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        for server in list(self.servers.values()):
+            await server.stop()
+            logger.bind(tag=TAG).info(f"服务端MCP服务已关闭: {server.name}")
+
+
+# 创建全局MCP服务池实例
+mcp_pool = ServerMCPPool()
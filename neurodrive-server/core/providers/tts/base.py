@@ -1,19 +1,25 @@
 import os
 import re
+import time
 import queue
 import uuid
 import asyncio
 import threading
+from functools import partial
+from contextlib import contextmanager
 from core.utils import p3
 from datetime import datetime
-from core.utils import textUtils
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
-from core.utils.util import audio_to_data, audio_bytes_to_data
+from core.utils.util import audio_to_data, audio_bytes_to_data, create_opus_encoder
 from core.utils.tts import MarkdownCleaner
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
+from core.utils.scheduler import scheduler, SessionQueue
+from core.utils.tts_audio_cache import tts_audio_cache
+from core.utils.tts_pipeline import tts_pipeline_stats
+from core.utils.sentence_segmenter import SentenceSegmenter
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -26,49 +32,66 @@ import traceback
 TAG = __name__
 logger = setup_logging()
 
+# 播放当前句子时默认最多预先合成的句子数
+DEFAULT_TTS_PREFETCH = 2
+
+
+class _SpeechJob:
+    """一段待播放的音频：分句在事件循环中完成，合成放到tts线程池中执行"""
+
+    __slots__ = (
+        "sentence_type",
+        "text",
+        "work",
+        "keep_empty",
+        "generation",
+        "future",
+        "slots",
+        "first_token_at",
+    )
+
+    def __init__(self, sentence_type, text, work=None, keep_empty=False):
+        self.sentence_type = sentence_type
+        self.text = text
+        # 合成函数，None表示没有音频（如LAST）
+        self.work = work
+        # 合成结果为空时是否仍然下发
+        self.keep_empty = keep_empty or work is None
+        self.generation = 0
+        self.future = None
+        self.slots = None
+        # 本轮第一段合成时记录首个token到达时间，用于统计首帧耗时
+        self.first_token_at = None
+
 
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
+        # 生效配置，TTS合成结果缓存据此区分音色、语速、参考音频等参数
+        self.config = config
         self.interface_type = InterfaceType.NON_STREAM
         self.conn = None
         self.tts_timeout = 10
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
-        self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        self.tts_text_queue = SessionQueue()
+        self.tts_audio_queue = SessionQueue()
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
-        self.tts_text_buff = []
-        self.punctuations = (
-            "。",
-            "？",
-            "?",
-            "！",
-            "!",
-            "；",
-            ";",
-            "：",
-        )
-        self.first_sentence_punctuations = (
-            "，",
-            "～",
-            "~",
-            "、",
-            ",",
-            "。",
-            "？",
-            "?",
-            "！",
-            "!",
-            "；",
-            ";",
-            "：",
-        )
+        self.segmenter = SentenceSegmenter()
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
+
+        # 轮次代号，打断时递增，旧代号的合成结果不再播放
+        self.generation = 0
+        self.tts_prefetch = DEFAULT_TTS_PREFETCH
+        self._prefetch_slots = None
+        self._turn_started_at = None
+        self._first_token_at = None
+        self._first_frame_pending = False
+        # 并发合成时各线程借用独立的Opus编码器
+        self._opus_encoders = []
+        self._opus_lock = threading.Lock()
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -85,9 +108,14 @@ class TTSProviderBase(ABC):
                 try:
                     audio_bytes = asyncio.run(self.text_to_speak(text, None))
                     if audio_bytes:
-                        audio_datas, _ = audio_bytes_to_data(
-                            audio_bytes, file_type=self.audio_file_type, is_opus=True
-                        )
+                        with self._borrow_opus_encoder() as encoder:
+                            audio_datas, _ = audio_bytes_to_data(
+                                audio_bytes,
+                                file_type=self.audio_file_type,
+                                is_opus=True,
+                                encoder=encoder,
+                                sample_rate=int(getattr(self, "sample_rate", None) or 16000),
+                            )
                         return audio_datas
                     else:
                         max_repeat_time -= 1
@@ -134,6 +162,22 @@ class TTSProviderBase(ABC):
                 logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
                 return None
 
+    def _text_to_audio_datas(self, text):
+        """合成一段文本并转换为待发送的音频帧，固定短句优先使用缓存"""
+        audio_format = "opus" if self.delete_audio_file else self.conn.audio_format
+        audio_datas = tts_audio_cache.get(self, text, audio_format)
+        if audio_datas is not None:
+            return audio_datas
+
+        if self.delete_audio_file:
+            audio_datas = self.to_tts(text)
+        else:
+            tts_file = self.to_tts(text)
+            audio_datas = self._process_audio_file(tts_file) if tts_file else None
+        if audio_datas:
+            tts_audio_cache.put(self, text, audio_format, audio_datas)
+        return audio_datas
+
     @abstractmethod
     async def text_to_speak(self, text, output_file):
         pass
@@ -144,7 +188,21 @@ class TTSProviderBase(ABC):
 
     def audio_to_opus_data(self, audio_file_path):
         """音频文件转换为Opus编码"""
-        return audio_to_data(audio_file_path, is_opus=True)
+        with self._borrow_opus_encoder() as encoder:
+            return audio_to_data(audio_file_path, is_opus=True, encoder=encoder)
+
+    @contextmanager
+    def _borrow_opus_encoder(self):
+        """借用一个Opus编码器，用完归还；预取时多个句子会同时编码，不能共用同一个"""
+        with self._opus_lock:
+            encoder = self._opus_encoders.pop() if self._opus_encoders else None
+        if encoder is None:
+            encoder = create_opus_encoder()
+        try:
+            yield encoder
+        finally:
+            with self._opus_lock:
+                self._opus_encoders.append(encoder)
 
     def tts_one_sentence(
         self,
@@ -177,17 +235,140 @@ class TTSProviderBase(ABC):
     async def open_audio_channels(self, conn):
         self.conn = conn
         self.tts_timeout = conn.config.get("tts_timeout", 10)
-        # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
-        )
-        self.tts_priority_thread.start()
+        try:
+            self.tts_prefetch = max(
+                1, int(conn.config.get("tts_prefetch", DEFAULT_TTS_PREFETCH))
+            )
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(
+                f"tts_prefetch配置无效: {conn.config.get('tts_prefetch')}"
+            )
+        try:
+            self.segmenter.configure(conn.config)
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(
+                f"tts_segment配置无效: {conn.config.get('tts_segment')}"
+            )
+        if type(self).tts_text_priority_thread is TTSProviderBase.tts_text_priority_thread:
+            # 默认的非流式处理：事件循环中按序分句，合成放到共享tts线程池并预取后续句子
+            self.tts_priority_task = asyncio.create_task(self._tts_text_priority_task())
+        else:
+            # 子类重写了文本处理线程（流式实现），保持独立线程
+            self.tts_priority_thread = threading.Thread(
+                target=self.tts_text_priority_thread, daemon=True
+            )
+            self.tts_priority_thread.start()
 
-        # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
+        # 音频播放 消化任务
+        self.audio_play_priority_task = asyncio.create_task(
+            self._audio_play_priority_task()
         )
-        self.audio_play_priority_thread.start()
+
+    def begin_turn(self):
+        """记录本轮开始时间，用于统计首段音频耗时"""
+        self._turn_started_at = time.monotonic()
+        self._first_token_at = None
+        self._first_frame_pending = True
+        tts_pipeline_stats.count("turns")
+
+    def mark_first_token(self):
+        """记录本轮LLM首个token的到达时间，用于统计首个token到首帧合成完成的耗时"""
+        if self._first_frame_pending and self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+
+    def interrupt(self):
+        """打断当前轮次（在事件循环中调用）
+
+        只递增轮次代号：尚未开始的合成直接跳过，已完成的合成在播放前丢弃，不需要逐个取消
+        """
+        self.generation += 1
+        self._turn_started_at = None
+        self._first_frame_pending = False
+        tts_pipeline_stats.count("interrupts")
+        slots, self._prefetch_slots = self._prefetch_slots, None
+        if slots is not None:
+            # 唤醒可能正在等待预取名额的文本任务，它会发现代号已过期
+            slots.release()
+
+    def _get_prefetch_slots(self):
+        if self._prefetch_slots is None:
+            self._prefetch_slots = asyncio.Semaphore(self.tts_prefetch)
+        return self._prefetch_slots
+
+    async def _tts_text_priority_task(self):
+        while not self.conn.stop_event.is_set():
+            try:
+                message = await self.tts_text_queue.async_get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                generation = self.generation
+                for job in self._plan_text_message(message):
+                    if generation != self.generation:
+                        break
+                    await self._submit_speech_job(job, generation)
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+                )
+
+    async def _submit_speech_job(self, job, generation):
+        """提交合成并按顺序放入播放队列，已提交未播放的句子数受 tts_prefetch 限制"""
+        job.generation = generation
+        if job.work is not None:
+            slots = self._get_prefetch_slots()
+            await slots.acquire()
+            if generation != self.generation:
+                # 等待名额期间被打断
+                return
+            job.slots = slots
+            if self._first_frame_pending and self._first_token_at is not None:
+                job.first_token_at = self._first_token_at
+                self._first_frame_pending = False
+            job.future = asyncio.wrap_future(
+                scheduler.submit("tts", self._run_speech_job, job)
+            )
+        self.tts_audio_queue.put((job.sentence_type, job, job.text))
+
+    def _run_speech_job(self, job):
+        """在tts线程池中执行合成，开始前所在轮次已被打断则直接跳过"""
+        if job.generation != self.generation:
+            tts_pipeline_stats.count("skipped")
+            return None
+        begin = time.monotonic()
+        audio_datas = job.work()
+        done = time.monotonic()
+        tts_pipeline_stats.synthesis.add(done - begin)
+        tts_pipeline_stats.count("synthesized")
+        if audio_datas and job.first_token_at is not None:
+            tts_pipeline_stats.first_token_to_frame.add(done - job.first_token_at)
+        return audio_datas
+
+    async def _wait_speech_job(self, job):
+        """等待合成结果，返回None表示不需要播放"""
+        try:
+            if job.generation != self.generation:
+                tts_pipeline_stats.count("discarded")
+                return None
+            if job.future is None:
+                return []
+            try:
+                audio_datas = await job.future
+            except Exception as e:
+                tts_pipeline_stats.count("errors")
+                logger.bind(tag=TAG).error(f"语音合成失败: {job.text} {e}")
+                return None
+            if job.generation != self.generation:
+                tts_pipeline_stats.count("discarded")
+                return None
+            if not audio_datas and not job.keep_empty:
+                return None
+            return audio_datas
+        finally:
+            # 结果已经可以播放（或被丢弃），让出预取名额
+            if job.slots is not None:
+                job.slots.release()
+                job.slots = None
 
     # 这里默认是非流式的处理方式
     # 流式处理方式请在子类中重写
@@ -195,51 +376,7 @@ class TTSProviderBase(ABC):
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
-                if message.sentence_type == SentenceType.FIRST:
-                    self.conn.client_abort = False
-                if self.conn.client_abort:
-                    print("abort client speaking....")
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
-                if message.sentence_type == SentenceType.FIRST:
-                    # 初始化参数
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
-                    self.tts_audio_first_sentence = True
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        if self.delete_audio_file:
-                            audio_datas = self.to_tts(segment_text)
-                            if audio_datas:
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                        else:
-                            tts_file = self.to_tts(segment_text)
-                            if tts_file:
-                                audio_datas = self._process_audio_file(tts_file)
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text()
-                    tts_file = message.content_file
-                    if tts_file and os.path.exists(tts_file):
-                        audio_datas = self._process_audio_file(tts_file)
-                        self.tts_audio_queue.put(
-                            (message.sentence_type, audio_datas, message.content_detail)
-                        )
-
-                if message.sentence_type == SentenceType.LAST:
-                    self._process_remaining_text()
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail)
-                    )
-
+                self._process_text_message(message)
             except queue.Empty:
                 continue
             except Exception as e:
@@ -248,29 +385,83 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
-    def _audio_play_priority_thread(self):
+    def _process_text_message(self, message):
+        """处理一条TTS文本消息（阻塞，逐句合成后放入播放队列）"""
+        for job in self._plan_text_message(message):
+            self._emit_speech_job(job)
+
+    def _emit_speech_job(self, job):
+        audio_datas = job.work() if job.work is not None else []
+        if audio_datas or job.keep_empty:
+            self.tts_audio_queue.put((job.sentence_type, audio_datas, job.text))
+
+    def _plan_text_message(self, message):
+        """处理一条TTS文本消息的分句，返回按播放顺序排列的待合成句子（不执行合成）"""
+        if message.sentence_type == SentenceType.FIRST:
+            self.conn.client_abort = False
+        if self.conn.client_abort:
+            print("abort client speaking....")
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+            return []
+        jobs = []
+        if message.sentence_type == SentenceType.FIRST:
+            # 初始化参数
+            self.tts_stop_request = False
+            self.segmenter.reset()
+            self.tts_audio_first_sentence = True
+        elif ContentType.TEXT == message.content_type:
+            for segment_text in self.segmenter.feed(message.content_detail or ""):
+                jobs.append(
+                    _SpeechJob(
+                        message.sentence_type,
+                        segment_text,
+                        partial(self._text_to_audio_datas, segment_text),
+                    )
+                )
+        elif ContentType.FILE == message.content_type:
+            jobs.extend(self._plan_remaining_text())
+            tts_file = message.content_file
+            if tts_file and os.path.exists(tts_file):
+                jobs.append(
+                    _SpeechJob(
+                        message.sentence_type,
+                        message.content_detail,
+                        partial(self._process_audio_file, tts_file),
+                        keep_empty=True,
+                    )
+                )
+
+        if message.sentence_type == SentenceType.LAST:
+            jobs.extend(self._plan_remaining_text())
+            jobs.append(_SpeechJob(message.sentence_type, message.content_detail))
+        return jobs
+
+    async def _audio_play_priority_task(self):
         while not self.conn.stop_event.is_set():
             text = None
             try:
                 try:
-                    sentence_type, audio_datas, text = self.tts_audio_queue.get(
+                    sentence_type, audio_datas, text = await self.tts_audio_queue.async_get(
                         timeout=1
                     )
                 except queue.Empty:
-                    if self.conn.stop_event.is_set():
-                        break
                     continue
-                future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text),
-                    self.conn.loop,
-                )
-                future.result()
+                if isinstance(audio_datas, _SpeechJob):
+                    audio_datas = await self._wait_speech_job(audio_datas)
+                    if audio_datas is None:
+                        continue
+                if audio_datas and self._turn_started_at is not None:
+                    tts_pipeline_stats.first_audio.add(
+                        time.monotonic() - self._turn_started_at
+                    )
+                    self._turn_started_at = None
+                await sendAudioMessage(self.conn, sentence_type, audio_datas, text)
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
                 enqueue_tts_report(self.conn, text, audio_datas)
             except Exception as e:
                 logger.bind(tag=TAG).error(
-                    f"audio_play_priority priority_thread: {text} {e}"
+                    f"audio_play_priority priority_task: {text} {e}"
                 )
 
     async def start_session(self, session_id):
@@ -284,45 +475,6 @@ class TTSProviderBase(ABC):
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
-
     def _process_audio_file(self, tts_file):
         """处理音频文件并转换为指定格式
 
@@ -362,23 +514,20 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                if self.delete_audio_file:
-                    audio_datas = self.to_tts(segment_text)
-                    if audio_datas:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, audio_datas, segment_text)
-                        )
-                else:
-                    tts_file = self.to_tts(segment_text)
-                    audio_datas = self._process_audio_file(tts_file)
-                    self.tts_audio_queue.put(
-                        (SentenceType.MIDDLE, audio_datas, segment_text)
-                    )
-                self.processed_chars += len(full_text)
-                return True
-        return False
+        jobs = self._plan_remaining_text()
+        for job in jobs:
+            self._emit_speech_job(job)
+        return bool(jobs)
+
+    def _plan_remaining_text(self):
+        """剩余未分句的文本作为最后一句"""
+        segment_text = self.segmenter.flush()
+        if segment_text:
+            return [
+                _SpeechJob(
+                    SentenceType.MIDDLE,
+                    segment_text,
+                    partial(self._text_to_audio_datas, segment_text),
+                )
+            ]
+        return []
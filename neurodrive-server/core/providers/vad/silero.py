@@ -1,13 +1,32 @@
 import time
+import asyncio
+import threading
 import numpy as np
 import torch
 import opuslib_next
 from config.logger import setup_logging
 from core.providers.vad.base import VADProviderBase
+from core.utils.scheduler import scheduler
 
 TAG = __name__
 logger = setup_logging()
 
+SAMPLE_RATE = 16000
+# 每次送入模型的采样点数（32ms）
+CHUNK_SAMPLES = 512
+CHUNK_BYTES = CHUNK_SAMPLES * 2
+# 16k采样率下模型拼接的上文长度
+CONTEXT_SAMPLES = 64
+
+
+class SileroSession:
+    """每个连接独立的VAD状态：Opus解码器与模型循环状态"""
+
+    def __init__(self):
+        self.decoder = opuslib_next.Decoder(SAMPLE_RATE, 1)
+        self.state = torch.zeros(2, 1, 128)
+        self.context = torch.zeros(1, CONTEXT_SAMPLES)
+
 
 class VADProvider(VADProviderBase):
     def __init__(self, config):
@@ -19,8 +38,6 @@ class VADProvider(VADProviderBase):
             force_reload=False,
         )
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
         threshold_low = config.get("threshold_low", "0.2")
@@ -39,54 +56,194 @@ class VADProvider(VADProviderBase):
         self.vad_threshold = 0.4
         self.vad_threshold_low = 0.15
 
-    def is_vad(self, conn, opus_packet):
+        # 批量推理：收集所有连接的待检测帧，每个批次只做一次前向计算
+        batch_max_size = config.get("batch_max_size", 32)
+        batch_max_delay_ms = config.get("batch_max_delay_ms", 5)
+        self.batch_max_size = int(batch_max_size) if batch_max_size else 32
+        self.batch_max_delay = (
+            int(batch_max_delay_ms) if batch_max_delay_ms else 5
+        ) / 1000
+
+        # 模型的循环状态保存在模型内部，需要逐连接换入换出才能批量推理
+        self._supports_batch = all(
+            hasattr(self.model, attr)
+            for attr in ("_state", "_context", "_last_sr", "_last_batch_size")
+        )
+        if not self._supports_batch:
+            logger.bind(tag=TAG).warning("当前SileroVAD模型不支持状态切换，将逐帧推理")
+
+        self._model_lock = threading.Lock()
+        self._pending = None
+        self._batch_task = None
+        self._batch_loop = None
+
+    def _get_session(self, conn):
+        session = getattr(conn, "vad_session", None)
+        if session is None:
+            session = SileroSession()
+            conn.vad_session = session
+        return session
+
+    def _decode_chunks(self, conn, session, opus_packet):
+        """解码Opus包并取出缓冲区中所有完整的512采样点帧"""
+        pcm_frame = session.decoder.decode(opus_packet, 960)
+        conn.audio_ring.write(pcm_frame)  # 将新数据加入缓冲区
+
+        chunks = []
+        while True:
+            # 提取512个采样点（1024字节）的视图，不复制缓冲区
+            chunk = conn.audio_ring.read(CHUNK_BYTES)
+            if chunk is None:
+                break
+
+            # 转换为模型需要的格式
+            audio_int16 = np.frombuffer(chunk, dtype=np.int16)
+            chunks.append(audio_int16.astype(np.float32) / 32768.0)
+        return chunks
+
+    def _infer_batch(self, chunks, sessions):
+        """对一个批次做一次前向计算，返回每帧的语音概率（在vad线程池中执行）"""
+        with self._model_lock, torch.no_grad():
+            if not self._supports_batch:
+                return [
+                    self.model(torch.from_numpy(chunk), SAMPLE_RATE).item()
+                    for chunk in chunks
+                ]
+
+            # 换入各连接的循环状态
+            self.model._state = torch.cat([s.state for s in sessions], dim=1)
+            self.model._context = torch.cat([s.context for s in sessions], dim=0)
+            self.model._last_sr = SAMPLE_RATE
+            self.model._last_batch_size = len(sessions)
+
+            probs = self.model(torch.from_numpy(np.stack(chunks)), SAMPLE_RATE)
+
+            # 换出更新后的循环状态
+            new_state = self.model._state
+            new_context = self.model._context
+            for i, session in enumerate(sessions):
+                session.state = new_state[:, i : i + 1].clone()
+                session.context = new_context[i : i + 1].clone()
+            return probs.reshape(-1).tolist()
+
+    def _ensure_batch_worker(self):
+        loop = asyncio.get_running_loop()
+        if (
+            self._batch_task is None
+            or self._batch_task.done()
+            or self._batch_loop is not loop
+        ):
+            self._pending = asyncio.Queue()
+            self._batch_loop = loop
+            self._batch_task = loop.create_task(self._batch_worker())
+        return self._pending
+
+    async def _batch_worker(self):
+        """批量推理任务：凑满批次或达到最大等待时间后统一推理"""
+        loop = asyncio.get_running_loop()
+        pending = self._pending
+        while True:
+            batch = [await pending.get()]
+            deadline = loop.time() + self.batch_max_delay
+            while len(batch) < self.batch_max_size:
+                try:
+                    batch.append(pending.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(pending.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # 同一连接的帧必须按顺序推理，重复的留到下一批
+            sessions, chunks, futures, deferred = [], [], [], []
+            for session, chunk, future in batch:
+                if future.cancelled():
+                    continue
+                if any(session is s for s in sessions):
+                    deferred.append((session, chunk, future))
+                    continue
+                sessions.append(session)
+                chunks.append(chunk)
+                futures.append(future)
+            for item in deferred:
+                pending.put_nowait(item)
+            if not sessions:
+                continue
+
+            try:
+                probs = await scheduler.run("vad", self._infer_batch, chunks, sessions)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"VAD批量推理失败: {e}")
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, prob in zip(futures, probs):
+                if not future.done():
+                    future.set_result(prob)
+
+    def _update_voice_state(self, conn, speech_prob):
+        """根据语音概率更新连接的VAD状态，返回当前是否有声音"""
+        # 双阈值判断
+        if speech_prob >= self.vad_threshold:
+            is_voice = True
+        elif speech_prob <= self.vad_threshold_low:
+            is_voice = False
+        else:
+            is_voice = conn.last_is_voice
+
+        # 声音没低于最低值则延续前一个状态，判断为有声音
+        conn.last_is_voice = is_voice
+
+        # 更新滑动窗口
+        conn.client_voice_window.append(is_voice)
+        client_have_voice = (conn.client_voice_window.count(True) >= self.frame_window_threshold)
+
+        # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
+        if conn.client_have_voice and not client_have_voice:
+            stop_duration = time.time() * 1000 - conn.last_activity_time
+            if stop_duration >= self.silence_threshold_ms:
+                conn.client_voice_stop = True
+        if client_have_voice:
+            conn.client_have_voice = True
+            conn.last_activity_time = time.time() * 1000
+        return client_have_voice
+
+    async def detect(self, conn, opus_packet):
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
+            session = self._get_session(conn)
+            chunks = self._decode_chunks(conn, session, opus_packet)
+            if not chunks:
+                return False
 
-            # 处理缓冲区中的完整帧（每次处理512采样点）
+            pending = self._ensure_batch_worker()
+            loop = asyncio.get_running_loop()
             client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                # 提取前512个采样点（1024字节）
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
-                # 转换为模型需要的张量格式
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_tensor = torch.from_numpy(audio_float32)
-
-                # 检测语音活动
-                with torch.no_grad():
-                    speech_prob = self.model(audio_tensor, 16000).item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (conn.client_voice_window.count(True) >= self.frame_window_threshold)
-
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.last_activity_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                    # print("debug silero: ",  conn.client_have_voice, client_have_voice, stop_duration, self.silence_threshold_ms, conn.client_voice_stop, flush=True)
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.last_activity_time = time.time() * 1000
+            for chunk in chunks:
+                future = loop.create_future()
+                pending.put_nowait((session, chunk, future))
+                speech_prob = await future
+                client_have_voice = self._update_voice_state(conn, speech_prob)
+            return client_have_voice
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
 
+    def is_vad(self, conn, opus_packet):
+        try:
+            session = self._get_session(conn)
+            client_have_voice = False
+            for chunk in self._decode_chunks(conn, session, opus_packet):
+                speech_prob = self._infer_batch([chunk], [session])[0]
+                client_have_voice = self._update_voice_state(conn, speech_prob)
             return client_have_voice
         except opuslib_next.OpusError as e:
             logger.bind(tag=TAG).info(f"解码错误: {e}")
         except Exception as e:
-            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
\ No newline at end of file
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
+from core.utils.scheduler import scheduler
 
 TAG = __name__
 logger = setup_logging()
@@ -10,3 +11,10 @@ class VLLMProviderBase(ABC):
     def response(self, question, base64_image):
         """VLLM response generator"""
         pass
+
+    async def response_async(self, question, base64_image):
+        """异步响应，默认在chat线程池中执行同步接口
+
+        支持原生异步客户端的提供者应重写此方法，不再占用线程
+        """
+        return await scheduler.run("chat", self.response, question, base64_image)
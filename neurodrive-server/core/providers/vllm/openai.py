@@ -3,6 +3,7 @@ import json
 from config.logger import setup_logging
 from core.utils.util import check_model_key
 from core.providers.vllm.base import VLLMProviderBase
+from core.providers.llm.client_pool import get_async_openai_client
 
 TAG = __name__
 logger = setup_logging()
@@ -16,6 +17,9 @@ class VLLMProvider(VLLMProviderBase):
             self.base_url = config.get("base_url")
         else:
             self.base_url = config.get("url")
+        # 异步客户端的请求超时（秒）
+        timeout = config.get("timeout", 60)
+        self.timeout = int(timeout) if timeout else 60
 
         param_defaults = {
             "max_tokens": (500, int),
@@ -39,26 +43,44 @@ class VLLMProvider(VLLMProviderBase):
             logger.bind(tag=TAG).error(model_key_msg)
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
 
-    def response(self, question, base64_image):
+    @staticmethod
+    def _build_messages(question, base64_image):
         question = question + "(请使用中文回复)"
-        try:
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": question},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            },
-                        },
-                    ],
-                }
-            ]
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": question},
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
+                    },
+                ],
+            }
+        ]
 
+    def response(self, question, base64_image):
+        try:
             response = self.client.chat.completions.create(
-                model=self.model_name, messages=messages, stream=False
+                model=self.model_name,
+                messages=self._build_messages(question, base64_image),
+                stream=False,
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            raise
+
+    async def response_async(self, question, base64_image):
+        """使用共享的异步客户端请求，不占用线程"""
+        try:
+            client = get_async_openai_client(self.api_key, self.base_url, self.timeout)
+            response = await client.chat.completions.create(
+                model=self.model_name,
+                messages=self._build_messages(question, base64_image),
+                stream=False,
             )
 
             return response.choices[0].message.content
@@ -0,0 +1,130 @@
+"""
+会话级PCM音频缓冲区
+
+每个连接一个固定容量的缓冲区，Opus包只在VAD处解码一次并写入，
+VAD按帧读取、ASR/声纹/上报按语句读取，都通过memoryview访问，
+热路径上不再反复切片复制bytearray。
+
+位置均使用从连接开始累计的绝对字节偏移：
+1. read_pos: VAD已读取到的位置
+2. utterance_start: 当前语句（含前置缓冲）的起始位置
+3. write_pos: 已写入的位置
+"""
+
+from typing import Optional
+
+# 16kHz 单声道 16bit
+BYTES_PER_SECOND = 16000 * 2
+# 设备每个Opus包60ms
+PACKET_BYTES = 960 * 2
+# 默认缓冲30秒音频
+DEFAULT_CAPACITY = BYTES_PER_SECOND * 30
+
+
+class PcmRingBuffer:
+    """固定容量的PCM缓冲区
+
+    写入位置到达末尾时，把仍需保留的数据（从 read_pos 和 utterance_start
+    中较早者开始）整体前移；保留数据超过容量时丢弃最早的音频。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        # _buf[0] 对应的绝对位置
+        self._base = 0
+        self.read_pos = 0
+        self.write_pos = 0
+        self.utterance_start = 0
+
+    def _offset(self, pos: int) -> int:
+        return pos - self._base
+
+    def write(self, data) -> None:
+        """写入PCM数据"""
+        size = len(data)
+        if size == 0:
+            return
+        if size > self.capacity:
+            # 单次写入超过容量，只保留最后capacity字节
+            skipped = size - self.capacity
+            data = memoryview(data)[skipped:]
+            size = self.capacity
+            self.write_pos += skipped
+            self._drop_before(self.write_pos)
+            self._base = self.write_pos
+        end = self._offset(self.write_pos) + size
+        if end > self.capacity:
+            self._compact(size)
+        start = self._offset(self.write_pos)
+        self._view[start : start + size] = data
+        self.write_pos += size
+
+    def _drop_before(self, pos: int) -> None:
+        self.read_pos = max(self.read_pos, pos)
+        self.utterance_start = max(self.utterance_start, pos)
+
+    def _compact(self, incoming: int) -> None:
+        """前移保留数据，为新写入腾出空间"""
+        keep_from = min(self.read_pos, self.utterance_start)
+        # 保留数据加新数据超出容量，丢弃最早的部分
+        overflow = (self.write_pos - keep_from) + incoming - self.capacity
+        if overflow > 0:
+            keep_from += overflow
+            self._drop_before(keep_from)
+        start = self._offset(keep_from)
+        length = self.write_pos - keep_from
+        if start > 0 and length > 0:
+            self._view[0:length] = self._view[start : start + length]
+        self._base = keep_from
+
+    def readable(self) -> int:
+        """VAD尚未读取的字节数"""
+        return self.write_pos - self.read_pos
+
+    def read(self, size: int) -> Optional[memoryview]:
+        """读取size字节的视图，数据不足返回None
+
+        返回的视图在下一次write之前有效
+        """
+        if self.readable() < size:
+            return None
+        start = self._offset(self.read_pos)
+        self.read_pos += size
+        return self._view[start : start + size]
+
+    def skip_pending(self) -> None:
+        """丢弃VAD未读取的不完整帧"""
+        self.read_pos = self.write_pos
+
+    def start_utterance(self, preroll_bytes: int = 0) -> None:
+        """重新开始一句话，保留最近preroll_bytes字节作为前置缓冲"""
+        self.utterance_start = max(
+            self._base, self.utterance_start, self.write_pos - preroll_bytes
+        )
+
+    def utterance_view(self) -> memoryview:
+        """当前语句的音频视图，在下一次write之前有效"""
+        start = self._offset(self.utterance_start)
+        end = self._offset(self.write_pos)
+        return self._view[start:end]
+
+    def take_utterance(self, max_bytes: Optional[int] = None) -> bytes:
+        """取出当前语句的音频并开始新的语句
+
+        max_bytes用于按实际收到的语音包数截取末尾部分，
+        返回独立的bytes，供在其他线程中运行的ASR、声纹和上报共享使用
+        """
+        view = self.utterance_view()
+        if max_bytes is not None and len(view) > max_bytes:
+            view = view[len(view) - max_bytes :]
+        data = bytes(view)
+        self.utterance_start = self.write_pos
+        return data
+
+    def clear(self) -> None:
+        """清空缓冲区"""
+        self._base = self.write_pos
+        self.read_pos = self.write_pos
+        self.utterance_start = self.write_pos
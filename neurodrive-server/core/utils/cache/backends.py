@@ -0,0 +1,349 @@
+"""
+共享缓存后端
+
+多副本部署时，意图识别、IP定位、天气等缓存在各个进程之间共享，避免每个副本重复调用LLM和外部接口。
+进程内的 cache_manager 作为近端缓存，后端作为第二层：
+1. 读：近端未命中时批量从后端读取（MGET），命中后回填近端
+2. 写：先写近端，再由后台线程批量写入后端（流水线），不阻塞调用方
+3. 容错：后端连接失败后在 retry_seconds 内直接跳过后端，只使用近端缓存
+
+后端使用Redis协议，兼容Redis/KeyDB/Valkey等服务，本地调试时可以直接启动一个 redis-server
+"""
+
+import queue
+import socket
+import threading
+import time
+from urllib.parse import urlparse, unquote
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import ormsgpack
+
+# 后台写入线程单次批量提交的最大命令数
+MAX_WRITE_BATCH = 256
+# 写入队列上限，后端过慢时丢弃新的写入（近端缓存仍然有效）
+MAX_PENDING_WRITES = 10000
+# SCAN 每次返回的条数
+SCAN_COUNT = 500
+
+
+class RespError(Exception):
+    """服务端返回的错误"""
+
+
+class RespClient:
+    """最小化的Redis协议客户端（线程安全，内部维护连接池）"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        timeout: float = 0.1,
+        pool_size: int = 8,
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue" = queue.LifoQueue(maxsize=pool_size)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RespClient":
+        """从 redis://[:password@]host[:port][/db] 创建客户端"""
+        parsed = urlparse(url)
+        db = parsed.path.lstrip("/")
+        return cls(
+            host=parsed.hostname or "127.0.0.1",
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parsed.password) if parsed.password else None,
+            **kwargs,
+        )
+
+    def _connect(self) -> Tuple[socket.socket, Any]:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in self._roundtrip(conn, setup):
+                if isinstance(reply, RespError):
+                    self._close(conn)
+                    raise reply
+        return conn
+
+    @staticmethod
+    def _close(conn) -> None:
+        for closable in reversed(conn):
+            try:
+                closable.close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(commands: Iterable[tuple]) -> bytes:
+        out = bytearray()
+        for args in commands:
+            out += b"*%d\r\n" % len(args)
+            for arg in args:
+                if isinstance(arg, str):
+                    arg = arg.encode("utf-8")
+                elif not isinstance(arg, (bytes, bytearray)):
+                    arg = str(arg).encode("utf-8")
+                out += b"$%d\r\n" % len(arg)
+                out += arg
+                out += b"\r\n"
+        return bytes(out)
+
+    def _read_reply(self, rfile) -> Any:
+        line = rfile.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("连接已断开")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            return RespError(payload.decode("utf-8"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = rfile.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("连接已断开")
+            return data[:-2]
+        if prefix == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self._read_reply(rfile) for _ in range(count)]
+        raise ConnectionError(f"无法解析的响应: {line!r}")
+
+    def _roundtrip(self, conn, commands: List[tuple]) -> List[Any]:
+        sock, rfile = conn
+        sock.sendall(self._encode(commands))
+        return [self._read_reply(rfile) for _ in commands]
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """一次往返执行多条命令，返回各命令的结果（错误以RespError对象返回）"""
+        if not commands:
+            return []
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            replies = self._roundtrip(conn, commands)
+        except BaseException:
+            self._close(conn)
+            raise
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            self._close(conn)
+        return replies
+
+    def execute(self, *args) -> Any:
+        """执行单条命令，服务端错误以异常抛出"""
+        reply = self.pipeline([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close(self._pool.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _glob_escape(text: str) -> str:
+    """转义Redis MATCH模式中的特殊字符"""
+    return "".join("\\" + ch if ch in "*?[]\\" else ch for ch in text)
+
+
+class RedisCacheBackend:
+    """基于Redis协议的共享缓存后端"""
+
+    def __init__(
+        self, client: RespClient, key_prefix: str = "neurodrive", retry_seconds: float = 10
+    ):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+        self._writes: "queue.Queue" = queue.Queue(maxsize=MAX_PENDING_WRITES)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "reads": 0,
+            "read_hits": 0,
+            "writes": 0,
+            "dropped_writes": 0,
+            "errors": 0,
+            "unserializable": 0,
+        }
+        self._logger = None
+        self._writer = threading.Thread(
+            target=self._write_loop, name="cache-backend-writer", daemon=True
+        )
+        self._writer.start()
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def _mark_down(self, error: Exception) -> None:
+        was_available = self.available
+        self._down_until = time.monotonic() + self.retry_seconds
+        self._count("errors")
+        if was_available:
+            self.logger.warning(
+                f"共享缓存后端不可用，{self.retry_seconds}秒内只使用本地缓存: {error}"
+            )
+
+    def _key(self, cache_name: str, key: str) -> str:
+        return f"{self.key_prefix}:{cache_name}:{key}"
+
+    def get_many(self, cache_name: str, keys: List[str]) -> Dict[str, Any]:
+        """批量读取，后端不可用时返回空结果"""
+        if not keys or not self.available:
+            return {}
+        try:
+            values = self.client.execute(
+                "MGET", *(self._key(cache_name, key) for key in keys)
+            )
+        except (OSError, ConnectionError, RespError) as e:
+            self._mark_down(e)
+            return {}
+
+        found = {}
+        for key, raw in zip(keys, values):
+            if raw is None:
+                continue
+            try:
+                found[key] = ormsgpack.unpackb(raw)
+            except Exception:
+                # 格式不兼容的旧数据视为未命中
+                continue
+        self._count("reads", len(keys))
+        self._count("read_hits", len(found))
+        return found
+
+    def set_many(self, cache_name: str, items: Iterable[Tuple[str, Any, Optional[float]]]):
+        """批量写入 (key, value, ttl)，在后台线程中提交"""
+        for key, value, ttl in items:
+            try:
+                payload = ormsgpack.packb(value)
+            except Exception:
+                self._count("unserializable")
+                continue
+            command = ("SET", self._key(cache_name, key), payload)
+            if ttl is not None:
+                command += ("PX", max(1, int(ttl * 1000)))
+            self._enqueue(command)
+
+    def delete_many(self, cache_name: str, keys: Iterable[str]) -> None:
+        keys = [self._key(cache_name, key) for key in keys]
+        if keys:
+            self._enqueue(("DEL", *keys))
+
+    def delete_prefix(self, cache_name: str, prefix: str = "") -> None:
+        """删除指定前缀的全部key（SCAN + DEL，在后台线程中执行）"""
+        self._enqueue(("_SCAN_DEL", _glob_escape(self._key(cache_name, prefix)) + "*"))
+
+    def delete_matching(self, cache_name: str, substring: str) -> None:
+        """删除key中包含substring的全部条目"""
+        pattern = _glob_escape(self._key(cache_name, "")) + "*" + _glob_escape(substring) + "*"
+        self._enqueue(("_SCAN_DEL", pattern))
+
+    def _enqueue(self, command: tuple) -> None:
+        if not self.available:
+            return
+        try:
+            self._writes.put_nowait(command)
+        except queue.Full:
+            self._count("dropped_writes")
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < MAX_WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            if not self.available:
+                self._count("dropped_writes", len(batch))
+                continue
+            try:
+                # 按提交顺序执行，批量删除之前的写入先提交
+                pending = []
+                for command in batch:
+                    if command[0] == "_SCAN_DEL":
+                        self.client.pipeline(pending)
+                        pending = []
+                        self._scan_delete(command[1])
+                    else:
+                        pending.append(command)
+                self.client.pipeline(pending)
+                self._count("writes", len(batch))
+            except (OSError, ConnectionError, RespError) as e:
+                self._mark_down(e)
+                self._count("dropped_writes", len(batch))
+
+    def _scan_delete(self, pattern: str) -> None:
+        cursor = b"0"
+        while True:
+            cursor, keys = self.client.execute(
+                "SCAN", cursor, "MATCH", pattern, "COUNT", SCAN_COUNT
+            )
+            if keys:
+                self.client.execute("DEL", *keys)
+            if cursor in (b"0", "0"):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["available"] = self.available
+        stats["pending_writes"] = self._writes.qsize()
+        return stats
+
+
+def create_backend(config: Optional[Dict[str, Any]]):
+    """根据 cache_backend 配置创建共享缓存后端，未启用时返回None"""
+    backend_config = (config or {}).get("cache_backend") or {}
+    if backend_config.get("type", "none") != "redis":
+        return None
+    client = RespClient.from_url(
+        backend_config.get("url", "redis://127.0.0.1:6379/0"),
+        timeout=float(backend_config.get("timeout", 0.1)),
+        pool_size=int(backend_config.get("pool_size", 8)),
+    )
+    return RedisCacheBackend(
+        client,
+        key_prefix=backend_config.get("key_prefix", "neurodrive"),
+        retry_seconds=float(backend_config.get("retry_seconds", 10)),
+    )
@@ -21,6 +21,30 @@ class CacheType(Enum):
     WAKEUP_WORDS = "wakeup_words"
     # 新增：设备信息缓存（音量、麦克风等）
     DEVICE_INFO = "device_info"
+    # 记忆检索的文本嵌入向量
+    EMBEDDING = "embedding"
+    # TTS合成后的音频帧
+    TTS_AUDIO = "tts_audio"
+    # 设备差异化配置（按设备和全局配置版本缓存）
+    DEVICE_CONFIG = "device_config"
+
+
+# 配置共享缓存后端后，多个服务副本之间共享的缓存类型
+# TTS音频和文本向量体积大、本地即可命中，不放入共享后端
+SHARED_CACHE_TYPES = frozenset(
+    {
+        CacheType.LOCATION,
+        CacheType.WEATHER,
+        CacheType.LUNAR,
+        CacheType.INTENT,
+        CacheType.IP_INFO,
+        CacheType.CONFIG,
+        CacheType.DEVICE_PROMPT,
+        CacheType.WAKEUP_WORDS,
+        CacheType.DEVICE_INFO,
+        CacheType.DEVICE_CONFIG,
+    }
+)
 
 
 @dataclass
@@ -64,5 +88,14 @@ class CacheConfig:
             CacheType.DEVICE_INFO: cls(
                 strategy=CacheStrategy.TTL, ttl=None, max_size=2000  # 手动失效
             ),
+            CacheType.EMBEDDING: cls(
+                strategy=CacheStrategy.LRU, ttl=None, max_size=10000  # 内容不变则向量不变
+            ),
+            CacheType.TTS_AUDIO: cls(
+                strategy=CacheStrategy.LRU, ttl=None, max_size=2000  # 只缓存短句
+            ),
+            CacheType.DEVICE_CONFIG: cls(
+                strategy=CacheStrategy.LRU, ttl=None, max_size=5000  # 新鲜度由调用方判断
+            ),
         }
         return configs.get(cache_type, cls())
@@ -1,13 +1,75 @@
 """
 全局缓存管理器
+
+每个缓存空间（缓存类型+命名空间）按key的哈希分成若干分片，每个分片有独立的锁，
+并发访问不同key时互不阻塞：
+1. 过期：分片内用最小堆记录过期时间，每次写入只弹出已到期的条目，无需全量扫描
+2. 淘汰：LRU/TTL_LRU淘汰最久未访问的条目，TTL淘汰最早到期的条目，FIXED_SIZE淘汰最早写入的条目；
+   容量上限平均分给各分片，分布不均时总条目数会略低于max_size
+3. 前缀失效：分片内维护有序的key列表，按前缀二分查找
+4. 统计：命中、未命中、写入、淘汰、过期等计数按分片记录，按缓存类型汇总
+5. 共享后端：配置 cache_backend 后，SHARED_CACHE_TYPES 中的类型同时写入共享后端，
+   本地缓存作为近端缓存，未命中时再查询后端（见 backends.py）
 """
 
+import math
 import time
+import heapq
+import bisect
+import itertools
 import threading
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List
 from collections import OrderedDict
 from .strategies import CacheStrategy, CacheEntry
-from .config import CacheConfig, CacheType
+from .config import CacheConfig, CacheType, SHARED_CACHE_TYPES
+
+# 每个缓存空间的最大分片数
+DEFAULT_SHARDS = 16
+# 每个分片至少容纳的条目数，容量小的缓存相应减少分片，避免淘汰顺序失真
+MIN_ENTRIES_PER_SHARD = 64
+# 过期堆中失效记录过多时重建
+HEAP_COMPACT_RATIO = 2
+
+_COUNTERS = ("hits", "shared_hits", "misses", "sets", "evictions", "expirations")
+
+
+class _Shard:
+    """缓存分片，所有字段都只在持有lock时访问"""
+
+    __slots__ = ("lock", "data", "heap", "keys") + _COUNTERS
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # 顺序即淘汰顺序：LRU为访问顺序，其他策略为写入顺序
+        self.data: "OrderedDict[Any, CacheEntry]" = OrderedDict()
+        # (过期时间, 序号, key)，条目被覆盖或删除后记录保留到弹出时再校验
+        self.heap: List[tuple] = []
+        # 有序的字符串key，用于前缀失效
+        self.keys: List[str] = []
+        for name in _COUNTERS:
+            setattr(self, name, 0)
+
+
+class _CacheSpace:
+    """一个缓存空间（缓存类型+命名空间）"""
+
+    def __init__(self, name: str, cache_type: CacheType, config: CacheConfig):
+        self.name = name
+        self.cache_type = cache_type
+        self.config = config
+        if config.max_size:
+            shard_count = max(
+                1, min(DEFAULT_SHARDS, config.max_size // MIN_ENTRIES_PER_SHARD)
+            )
+            self.shard_max_size = math.ceil(config.max_size / shard_count)
+        else:
+            shard_count = DEFAULT_SHARDS
+            self.shard_max_size = None
+        self.shards = [_Shard() for _ in range(shard_count)]
+        self.lru = config.strategy in (CacheStrategy.LRU, CacheStrategy.TTL_LRU)
+
+    def shard_for(self, key) -> _Shard:
+        return self.shards[hash(key) % len(self.shards)]
 
 
 class GlobalCacheManager:
@@ -15,12 +77,13 @@ class GlobalCacheManager:
 
     def __init__(self):
         self._logger = None
-        self._caches: Dict[str, Dict[str, CacheEntry]] = {}
-        self._configs: Dict[str, CacheConfig] = {}
-        self._locks: Dict[str, threading.RLock] = {}
+        self._spaces: Dict[str, _CacheSpace] = {}
         self._global_lock = threading.RLock()
-        self._last_cleanup = time.time()
-        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "cleanups": 0}
+        self._seq = itertools.count()
+        # 共享缓存后端，未配置时只使用本地缓存
+        self._backend = None
+        self._shared_types = frozenset()
+        self._near_ttl: Optional[float] = None
 
     @property
     def logger(self):
@@ -37,20 +100,162 @@ class GlobalCacheManager:
             return f"{cache_type.value}:{namespace}"
         return cache_type.value
 
-    def _get_or_create_cache(
-        self, cache_name: str, config: CacheConfig
-    ) -> Dict[str, CacheEntry]:
+    def configure_backend(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据 cache_backend 配置启用共享缓存后端"""
+        if self._backend is not None:
+            return
+        from .backends import create_backend
+
+        backend = create_backend(config)
+        if backend is None:
+            return
+        backend_config = config["cache_backend"]
+        names = backend_config.get("shared_types") or [t.value for t in SHARED_CACHE_TYPES]
+        self._shared_types = frozenset(
+            CacheType(name) for name in names if name in CacheType._value2member_map_
+        )
+        near_ttl = backend_config.get("near_cache_seconds", 30)
+        self._near_ttl = float(near_ttl) if near_ttl else None
+        self._backend = backend
+        self.logger.info(
+            f"已启用共享缓存后端，共享类型: {sorted(t.value for t in self._shared_types)}"
+        )
+
+    def _shared(self, space: _CacheSpace) -> bool:
+        """该缓存空间是否使用共享后端"""
+        return self._backend is not None and space.cache_type in self._shared_types
+
+    def _local_ttl(self, space: _CacheSpace, ttl: Optional[float]) -> Optional[float]:
+        """共享类型的本地副本最多保留near_ttl，以便及时看到其他副本的更新"""
+        if self._near_ttl is None or not self._shared(space):
+            return ttl
+        return self._near_ttl if ttl is None else min(ttl, self._near_ttl)
+
+    def _get_space(self, cache_type: CacheType, namespace: str = "") -> _CacheSpace:
         """获取或创建缓存空间"""
+        cache_name = self._get_cache_name(cache_type, namespace)
+        space = self._spaces.get(cache_name)
+        if space is not None:
+            return space
         with self._global_lock:
-            if cache_name not in self._caches:
-                self._caches[cache_name] = (
-                    OrderedDict()
-                    if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]
-                    else {}
+            space = self._spaces.get(cache_name)
+            if space is None:
+                space = _CacheSpace(
+                    cache_name, cache_type, CacheConfig.for_type(cache_type)
                 )
-                self._configs[cache_name] = config
-                self._locks[cache_name] = threading.RLock()
-            return self._caches[cache_name]
+                self._spaces[cache_name] = space
+            return space
+
+    # ---- 分片内部操作，调用方需持有分片锁 ----
+
+    @staticmethod
+    def _remove(shard: _Shard, key) -> Optional[CacheEntry]:
+        entry = shard.data.pop(key, None)
+        if entry is not None and isinstance(key, str):
+            index = bisect.bisect_left(shard.keys, key)
+            if index < len(shard.keys) and shard.keys[index] == key:
+                del shard.keys[index]
+        return entry
+
+    def _expire(self, shard: _Shard, now: float) -> None:
+        """弹出已到期的条目"""
+        heap = shard.heap
+        while heap and heap[0][0] < now:
+            _, _, key = heapq.heappop(heap)
+            entry = shard.data.get(key)
+            # 条目可能已被覆盖为更晚的过期时间
+            if entry is not None and entry.is_expired(now):
+                self._remove(shard, key)
+                shard.expirations += 1
+        if len(heap) > HEAP_COMPACT_RATIO * len(shard.data) + MIN_ENTRIES_PER_SHARD:
+            shard.heap = [
+                (entry.expire_at, next(self._seq), key)
+                for key, entry in shard.data.items()
+                if entry.ttl is not None
+            ]
+            heapq.heapify(shard.heap)
+
+    def _evict_one(self, space: _CacheSpace, shard: _Shard) -> None:
+        """按策略淘汰一个条目"""
+        victim = None
+        if space.config.strategy == CacheStrategy.TTL:
+            # 最早到期的条目，没有设置过期时间的条目按写入顺序淘汰
+            while shard.heap:
+                _, _, key = shard.heap[0]
+                entry = shard.data.get(key)
+                if entry is not None and entry.expire_at == shard.heap[0][0]:
+                    victim = key
+                    break
+                heapq.heappop(shard.heap)
+        if victim is None:
+            victim = next(iter(shard.data))
+        self._remove(shard, victim)
+        shard.evictions += 1
+
+    # ---- 公共接口 ----
+
+    def _set_local(
+        self, space: _CacheSpace, key: str, value: Any, ttl: Optional[float]
+    ) -> None:
+        shard = space.shard_for(key)
+        now = time.time()
+        entry = CacheEntry(value=value, timestamp=now, ttl=ttl)
+
+        with shard.lock:
+            self._expire(shard, now)
+            if key in shard.data:
+                # 覆盖写入视为最新写入
+                shard.data[key] = entry
+                shard.data.move_to_end(key)
+            else:
+                shard.data[key] = entry
+                if isinstance(key, str):
+                    bisect.insort(shard.keys, key)
+            if ttl is not None:
+                heapq.heappush(shard.heap, (entry.expire_at, next(self._seq), key))
+            shard.sets += 1
+
+            if space.shard_max_size and len(shard.data) > space.shard_max_size:
+                self._evict_one(space, shard)
+
+    def _get_local(self, space: _CacheSpace, key: str) -> tuple:
+        """读取本地缓存，返回 (是否命中, 值)，未命中不计数"""
+        shard = space.shard_for(key)
+        with shard.lock:
+            entry = shard.data.get(key)
+            if entry is None:
+                return False, None
+
+            # 检查过期
+            if entry.is_expired():
+                self._remove(shard, key)
+                shard.expirations += 1
+                return False, None
+
+            # 更新访问信息
+            entry.touch()
+            if space.lru:
+                shard.data.move_to_end(key)
+
+            shard.hits += 1
+            return True, entry.value
+
+    def _count(self, space: _CacheSpace, key: str, name: str) -> None:
+        shard = space.shard_for(key)
+        with shard.lock:
+            setattr(shard, name, getattr(shard, name) + 1)
+
+    def _get_many_shared(self, space: _CacheSpace, keys: List[str]) -> Dict[str, Any]:
+        """从共享后端批量读取本地未命中的key并回填本地"""
+        found = self._backend.get_many(space.name, keys) if self._shared(space) else {}
+        local_ttl = self._local_ttl(space, space.config.ttl)
+        for key in keys:
+            if key in found:
+                self._set_local(space, key, found[key], local_ttl)
+                self._count(space, key, "shared_hits")
+            else:
+                self._count(space, key, "misses")
+        return found
 
     def set(
         self,
@@ -61,155 +266,213 @@ class GlobalCacheManager:
         namespace: str = "",
     ) -> None:
         """设置缓存值"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-        config = self._configs.get(cache_name) or CacheConfig.for_type(cache_type)
-        cache = self._get_or_create_cache(cache_name, config)
+        self.set_many(cache_type, {key: value}, ttl, namespace)
 
+    def set_many(
+        self,
+        cache_type: CacheType,
+        items: Dict[str, Any],
+        ttl: Optional[float] = None,
+        namespace: str = "",
+    ) -> None:
+        """批量设置缓存值，共享类型合并为一次后端写入"""
+        space = self._get_space(cache_type, namespace)
         # 使用配置的TTL或传入的TTL
-        effective_ttl = ttl if ttl is not None else config.ttl
-
-        with self._locks[cache_name]:
-            # 创建缓存条目
-            entry = CacheEntry(value=value, timestamp=time.time(), ttl=effective_ttl)
-
-            # 处理不同策略
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                # LRU策略：如果已存在则移动到末尾
-                if key in cache:
-                    del cache[key]
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 移除最旧的条目
-                    oldest_key = next(iter(cache))
-                    del cache[oldest_key]
-                    self._stats["evictions"] += 1
-
-            else:
-                cache[key] = entry
-
-                # 检查大小限制
-                if config.max_size and len(cache) > config.max_size:
-                    # 简单策略：随机移除一个条目
-                    victim_key = next(iter(cache))
-                    del cache[victim_key]
-                    self._stats["evictions"] += 1
-
-        # 定期清理过期条目
-        self._maybe_cleanup(cache_name)
+        effective_ttl = ttl if ttl is not None else space.config.ttl
+        local_ttl = self._local_ttl(space, effective_ttl)
+        for key, value in items.items():
+            self._set_local(space, key, value, local_ttl)
+        if self._shared(space):
+            self._backend.set_many(
+                space.name,
+                [(key, value, effective_ttl) for key, value in items.items()],
+            )
 
     def get(
         self, cache_type: CacheType, key: str, namespace: str = ""
     ) -> Optional[Any]:
         """获取缓存值"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            self._stats["misses"] += 1
-            return None
-
-        cache = self._caches[cache_name]
-        config = self._configs[cache_name]
-
-        with self._locks[cache_name]:
-            if key not in cache:
-                self._stats["misses"] += 1
-                return None
-
-            entry = cache[key]
-
-            # 检查过期
-            if entry.is_expired():
-                del cache[key]
-                self._stats["misses"] += 1
-                return None
-
-            # 更新访问信息
-            entry.touch()
-
-            # LRU策略：移动到末尾
-            if config.strategy in [CacheStrategy.LRU, CacheStrategy.TTL_LRU]:
-                del cache[key]
-                cache[key] = entry
-
-            self._stats["hits"] += 1
-            return entry.value
+        space = self._get_space(cache_type, namespace)
+        hit, value = self._get_local(space, key)
+        if hit:
+            return value
+        return self._get_many_shared(space, [key]).get(key)
+
+    def get_many(
+        self, cache_type: CacheType, keys: List[str], namespace: str = ""
+    ) -> Dict[str, Any]:
+        """批量获取缓存值，返回命中的 {key: 值}，本地未命中的key一次性查询共享后端"""
+        space = self._get_space(cache_type, namespace)
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            hit, value = self._get_local(space, key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            found.update(self._get_many_shared(space, missing))
+        return found
 
     def delete(self, cache_type: CacheType, key: str, namespace: str = "") -> bool:
         """删除缓存条目"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
             return False
 
-        cache = self._caches[cache_name]
+        if self._shared(space):
+            self._backend.delete_many(space.name, [key])
+        shard = space.shard_for(key)
+        with shard.lock:
+            return self._remove(shard, key) is not None
 
-        with self._locks[cache_name]:
-            if key in cache:
-                del cache[key]
-                return True
-            return False
-
-    def clear(self, cache_type: CacheType, namespace: str = "") -> None:
-        """清空指定缓存"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
-            return
+    def clear(self, cache_type: CacheType, namespace: str = "") -> int:
+        """清空指定缓存，返回删除的条目数"""
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
+            return 0
 
-        with self._locks[cache_name]:
-            self._caches[cache_name].clear()
+        if self._shared(space):
+            self._backend.delete_prefix(space.name)
+        deleted_count = 0
+        for shard in space.shards:
+            with shard.lock:
+                deleted_count += len(shard.data)
+                shard.data.clear()
+                shard.heap.clear()
+                shard.keys.clear()
+        return deleted_count
 
-    def invalidate_pattern(
-        self, cache_type: CacheType, pattern: str, namespace: str = ""
+    def invalidate_prefix(
+        self, cache_type: CacheType, prefix: str, namespace: str = ""
     ) -> int:
-        """按模式失效缓存条目"""
-        cache_name = self._get_cache_name(cache_type, namespace)
-
-        if cache_name not in self._caches:
+        """失效以prefix开头的缓存条目"""
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
             return 0
 
-        cache = self._caches[cache_name]
+        if self._shared(space):
+            self._backend.delete_prefix(space.name, prefix)
         deleted_count = 0
-
-        with self._locks[cache_name]:
-            keys_to_delete = [key for key in cache.keys() if pattern in key]
-            for key in keys_to_delete:
-                del cache[key]
-                deleted_count += 1
-
+        for shard in space.shards:
+            with shard.lock:
+                start = bisect.bisect_left(shard.keys, prefix)
+                end = start
+                while end < len(shard.keys) and shard.keys[end].startswith(prefix):
+                    end += 1
+                for key in shard.keys[start:end]:
+                    shard.data.pop(key, None)
+                del shard.keys[start:end]
+                deleted_count += end - start
+
+        if deleted_count:
+            self.logger.debug(
+                f"失效缓存 {space.cache_type.value} 前缀 {prefix}: 删除 {deleted_count} 个条目"
+            )
         return deleted_count
 
-    def _cleanup_expired(self, cache_name: str) -> int:
-        """清理过期条目"""
-        if cache_name not in self._caches:
+    def invalidate_pattern(
+        self, cache_type: CacheType, pattern: str, namespace: str = ""
+    ) -> int:
+        """按子串失效缓存条目（需要遍历，按前缀失效请使用invalidate_prefix）"""
+        space = self._spaces.get(self._get_cache_name(cache_type, namespace))
+        if space is None:
             return 0
 
-        cache = self._caches[cache_name]
+        if self._shared(space):
+            self._backend.delete_matching(space.name, pattern)
         deleted_count = 0
-
-        with self._locks[cache_name]:
-            expired_keys = [key for key, entry in cache.items() if entry.is_expired()]
-            for key in expired_keys:
-                del cache[key]
-                deleted_count += 1
-
+        for shard in space.shards:
+            with shard.lock:
+                keys_to_delete = [key for key in shard.data if pattern in key]
+                for key in keys_to_delete:
+                    self._remove(shard, key)
+                deleted_count += len(keys_to_delete)
         return deleted_count
 
-    def _maybe_cleanup(self, cache_name: str):
-        """定期清理检查"""
-        config = self._configs.get(cache_name)
-        if not config:
-            return
+    async def aget(
+        self, cache_type: CacheType, key: str, namespace: str = ""
+    ) -> Optional[Any]:
+        """协程版get，本地未命中需要查询共享后端时在io线程池中进行"""
+        space = self._get_space(cache_type, namespace)
+        hit, value = self._get_local(space, key)
+        if hit:
+            return value
+        if not self._shared(space):
+            self._count(space, key, "misses")
+            return None
+        from core.utils.scheduler import scheduler
+
+        found = await scheduler.run("io", self._get_many_shared, space, [key])
+        return found.get(key)
+
+    async def aget_many(
+        self, cache_type: CacheType, keys: List[str], namespace: str = ""
+    ) -> Dict[str, Any]:
+        """协程版get_many，本地未命中的key在io线程池中一次性查询共享后端"""
+        space = self._get_space(cache_type, namespace)
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            hit, value = self._get_local(space, key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+        if not self._shared(space):
+            for key in missing:
+                self._count(space, key, "misses")
+            return found
+        from core.utils.scheduler import scheduler
+
+        found.update(await scheduler.run("io", self._get_many_shared, space, missing))
+        return found
+
+    async def aset(
+        self,
+        cache_type: CacheType,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        namespace: str = "",
+    ) -> None:
+        """协程版set，共享后端在后台线程写入，不会阻塞"""
+        self.set(cache_type, key, value, ttl, namespace)
+
+    async def adelete(
+        self, cache_type: CacheType, key: str, namespace: str = ""
+    ) -> bool:
+        """协程版delete"""
+        return self.delete(cache_type, key, namespace)
 
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按缓存类型汇总命中、未命中、条目数等统计（同一类型的命名空间合并计算）"""
         now = time.time()
-        if now - self._last_cleanup > config.cleanup_interval:
-            self._last_cleanup = now
-            deleted = self._cleanup_expired(cache_name)
-            if deleted > 0:
-                self._stats["cleanups"] += 1
-                self.logger.debug(f"清理缓存 {cache_name}: 删除 {deleted} 个过期条目")
+        result: Dict[str, Dict[str, Any]] = {}
+        for space in list(self._spaces.values()):
+            stats = result.setdefault(
+                space.cache_type.value,
+                dict.fromkeys(_COUNTERS + ("size", "namespaces"), 0),
+            )
+            stats["namespaces"] += 1
+            for shard in space.shards:
+                with shard.lock:
+                    self._expire(shard, now)
+                    stats["size"] += len(shard.data)
+                    for name in _COUNTERS:
+                        stats[name] += getattr(shard, name)
+        for stats in result.values():
+            hits = stats["hits"] + stats["shared_hits"]
+            lookups = hits + stats["misses"]
+            stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0
+        return result
+
+    def backend_stats(self) -> Optional[Dict[str, Any]]:
+        """共享后端统计，未启用时返回None"""
+        return self._backend.stats() if self._backend is not None else None
 
 
 # 创建全局缓存管理器实例
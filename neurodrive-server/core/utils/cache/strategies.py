@@ -31,11 +31,18 @@ class CacheEntry:
         if self.last_access is None:
             self.last_access = self.timestamp
 
-    def is_expired(self) -> bool:
+    @property
+    def expire_at(self) -> Optional[float]:
+        """过期时间点，永不过期时为None"""
+        if self.ttl is None:
+            return None
+        return self.timestamp + self.ttl
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """检查是否过期"""
         if self.ttl is None:
             return False
-        return time.time() - self.timestamp > self.ttl
+        return (now if now is not None else time.time()) - self.timestamp > self.ttl
 
     def touch(self):
         """更新访问时间和计数"""
@@ -0,0 +1,169 @@
+"""
+设备差异化配置缓存
+
+车机频繁断线重连（隧道、点火熄火）时，每次连接都要向智控台请求一次差异化配置。
+这里按 (设备ID, 客户端ID, 全局配置版本) 缓存请求结果：
+1. 新鲜期内直接返回缓存
+2. 超过新鲜期但未超过最长过期时间：先返回旧配置，同时在后台刷新
+3. 超过最长过期时间或未命中：同步请求，同一设备的并发请求只发一次
+全局配置更新后版本号变化，旧版本的缓存自然失效；也可通过系统控制接口手动失效
+"""
+
+import copy
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+
+from config.logger import setup_logging
+from config.config_loader import config_store, get_private_config_from_api
+from config.manage_api_client import DeviceNotFoundException, DeviceBindException
+from core.utils.cache.manager import cache_manager, CacheType
+from core.utils.scheduler import scheduler
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_FRESH_SECONDS = 60
+DEFAULT_MAX_STALE_SECONDS = 3600
+# 等待其他线程发起的同一请求的最长时间（秒）
+FETCH_WAIT_TIMEOUT = 30
+
+
+class DeviceConfigCache:
+    """设备差异化配置缓存（线程安全）"""
+
+    def __init__(self):
+        self.enabled = True
+        self.fresh_seconds = DEFAULT_FRESH_SECONDS
+        self.max_stale_seconds = DEFAULT_MAX_STALE_SECONDS
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "invalidations": 0,
+        }
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据配置设置缓存开关和新鲜期"""
+        cache_config = (config or {}).get("device_config_cache") or {}
+        try:
+            self.enabled = str(cache_config.get("enabled", self.enabled)).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
+            self.fresh_seconds = float(
+                cache_config.get("fresh_seconds", self.fresh_seconds)
+            )
+            self.max_stale_seconds = max(
+                self.fresh_seconds,
+                float(cache_config.get("max_stale_seconds", self.max_stale_seconds)),
+            )
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(f"device_config_cache配置无效: {cache_config}")
+
+    @staticmethod
+    def _cache_key(config, device_id: str, client_id: str) -> str:
+        version = getattr(config, "version", None) or config_store.version
+        return f"{device_id}|{client_id}|v{version}"
+
+    def get(self, config, device_id: str, client_id: str) -> Optional[Dict[str, Any]]:
+        """获取设备的差异化配置（阻塞，返回副本，调用方可以随意修改）
+
+        设备未绑定等接口异常会直接抛出，且不会缓存
+        """
+        if not self.enabled or not device_id:
+            return get_private_config_from_api(config, device_id, client_id)
+
+        key = self._cache_key(config, device_id, client_id)
+        entry = cache_manager.get(CacheType.DEVICE_CONFIG, key)
+        if entry is not None:
+            fetched_at, private_config = entry
+            age = time.time() - fetched_at
+            if age < self.fresh_seconds:
+                self._count("hits")
+                return copy.deepcopy(private_config)
+            if age < self.max_stale_seconds:
+                self._count("stale_hits")
+                self._refresh_in_background(config, device_id, client_id, key)
+                return copy.deepcopy(private_config)
+
+        self._count("misses")
+        return copy.deepcopy(self._fetch(config, device_id, client_id, key))
+
+    async def get_async(self, config, device_id: str, client_id: str):
+        """在io线程池中获取配置，不阻塞事件循环"""
+        return await scheduler.run("io", self.get, config, device_id, client_id)
+
+    def _fetch(self, config, device_id: str, client_id: str, key: str):
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result(timeout=FETCH_WAIT_TIMEOUT)
+
+        try:
+            private_config = get_private_config_from_api(config, device_id, client_id)
+            if private_config is not None:
+                cache_manager.set(
+                    CacheType.DEVICE_CONFIG, key, (time.time(), private_config)
+                )
+            future.set_result(private_config)
+            return private_config
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, config, device_id: str, client_id: str, key: str):
+        with self._lock:
+            if key in self._inflight:
+                return
+        scheduler.submit("io", self._refresh, config, device_id, client_id, key)
+
+    def _refresh(self, config, device_id: str, client_id: str, key: str) -> None:
+        try:
+            self._fetch(config, device_id, client_id, key)
+            self._count("refreshes")
+        except (DeviceNotFoundException, DeviceBindException):
+            # 设备已解绑，下次连接需要重新走绑定流程
+            cache_manager.delete(CacheType.DEVICE_CONFIG, key)
+            self._count("refreshes")
+        except Exception as e:
+            self._count("refresh_errors")
+            logger.bind(tag=TAG).warning(f"后台刷新设备 {device_id} 配置失败: {e}")
+
+    def invalidate(self, device_id: Optional[str] = None) -> int:
+        """失效指定设备（不指定则全部设备）的缓存配置，返回失效条数"""
+        self._count("invalidations")
+        if not device_id:
+            return cache_manager.clear(CacheType.DEVICE_CONFIG)
+        return cache_manager.invalidate_prefix(CacheType.DEVICE_CONFIG, f"{device_id}|")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["hits"] + stats["stale_hits"]) / lookups, 3) if lookups else 0
+        )
+        return stats
+
+
+# 全局设备配置缓存实例
+device_config_cache = DeviceConfigCache()
@@ -0,0 +1,164 @@
+"""
+群聊音频广播
+
+发送者的一段Opus音频只按60ms节奏推进一次，每一帧同时分发给所有成员：
+1. 每个成员有独立的发送队列和发送任务，成员之间互不等待
+2. 队列满时丢帧，连续丢帧过多或发送超时则摘除该成员，不拖慢整个群组
+3. 统计发送、丢帧和摘除次数
+"""
+
+import time
+import asyncio
+from typing import Any, Dict, List
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+FRAME_DURATION = 60  # 帧时长（毫秒），匹配 Opus 编码
+PRE_BUFFER_FRAMES = 3  # 开头直接发送的帧数
+MAX_QUEUE_FRAMES = 50  # 每个成员最多积压的帧数（约3秒）
+MAX_CONSECUTIVE_DROPS = 25  # 连续丢帧超过该值则摘除成员
+SEND_TIMEOUT = 5  # 单帧发送超时（秒）
+DRAIN_TIMEOUT = 5  # 广播结束后等待各成员发送完毕的时间（秒）
+
+_END = object()
+
+
+class _MemberSink:
+    """单个成员的发送队列"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUE_FRAMES)
+        self.detached = False
+        self.detach_reason = ""
+        self.delivered = 0
+        self.dropped = 0
+        self.consecutive_drops = 0
+        self.task = None
+
+    def offer(self, frame) -> bool:
+        """放入一帧，队列满时丢弃并返回False"""
+        try:
+            self.queue.put_nowait(frame)
+            self.consecutive_drops = 0
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.consecutive_drops += 1
+            return False
+
+    def detach(self, reason: str) -> None:
+        if self.detached:
+            return
+        self.detached = True
+        self.detach_reason = reason
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+    async def run(self) -> None:
+        """按顺序发送队列中的帧"""
+        while True:
+            frame = await self.queue.get()
+            if frame is _END:
+                return
+            if self.conn.client_abort:
+                self.detach("client abort")
+                return
+            try:
+                await asyncio.wait_for(self.conn.websocket.send(frame), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.detach("send timeout")
+                return
+            except Exception as e:
+                self.detach(f"send error: {e}")
+                return
+            # 重置没有声音的状态
+            self.conn.last_activity_time = time.time() * 1000
+            self.delivered += 1
+
+
+class GroupBroadcaster:
+    """群聊音频广播器"""
+
+    def __init__(self):
+        self._stats = {
+            "broadcasts": 0,
+            "frames": 0,
+            "delivered": 0,
+            "dropped": 0,
+            "detached": 0,
+        }
+
+    async def broadcast(self, conns: List[Any], audios: List[bytes]) -> Dict[str, Any]:
+        """把一段音频同时发送给多个连接，返回各成员的发送结果"""
+        if not conns or not audios:
+            return {}
+
+        sinks = [_MemberSink(conn) for conn in conns]
+        for sink in sinks:
+            sink.task = asyncio.create_task(sink.run())
+
+        start_time = time.perf_counter()
+        for i, frame in enumerate(audios):
+            # 预缓冲帧直接发送，其余按播放进度节流
+            if i >= PRE_BUFFER_FRAMES:
+                play_position = (i - PRE_BUFFER_FRAMES) * FRAME_DURATION
+                delay = start_time + play_position / 1000 - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            active = [sink for sink in sinks if not sink.detached]
+            if not active:
+                break
+            for sink in active:
+                if sink.task.done():
+                    continue
+                if not sink.offer(frame) and sink.consecutive_drops > MAX_CONSECUTIVE_DROPS:
+                    sink.detach("backpressure")
+
+        for sink in sinks:
+            if not sink.detached:
+                # 结束标记必须放入，队列满时等待发送任务腾出空间
+                try:
+                    await asyncio.wait_for(sink.queue.put(_END), DRAIN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    sink.detach("drain timeout")
+
+        pending = [sink.task for sink in sinks if not sink.task.done()]
+        if pending:
+            _, not_done = await asyncio.wait(pending, timeout=DRAIN_TIMEOUT)
+            for sink in sinks:
+                if sink.task in not_done:
+                    sink.detach("drain timeout")
+
+        return self._record(sinks, len(audios))
+
+    def _record(self, sinks: List[_MemberSink], frame_count: int) -> Dict[str, Any]:
+        results = {}
+        self._stats["broadcasts"] += 1
+        self._stats["frames"] += frame_count
+        for sink in sinks:
+            self._stats["delivered"] += sink.delivered
+            self._stats["dropped"] += sink.dropped
+            if sink.detached:
+                self._stats["detached"] += 1
+                logger.bind(tag=TAG).warning(
+                    f"群聊成员 {getattr(sink.conn, 'device_id', None)} 已摘除: {sink.detach_reason}"
+                )
+            results[getattr(sink.conn, "device_id", None)] = {
+                "delivered": sink.delivered,
+                "dropped": sink.dropped,
+                "detached": sink.detach_reason if sink.detached else None,
+            }
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        """返回广播统计"""
+        return dict(self._stats)
+
+
+# 全局群聊广播器实例
+group_broadcaster = GroupBroadcaster()
@@ -0,0 +1,214 @@
+"""
+指令关键词匹配
+
+关键词、辅助判断词和模糊匹配片段一次性编译进Aho-Corasick自动机，
+每条文本只扫描一遍即可得到全部命中词及其首次出现位置：
+1. 精确匹配：命中的关键词直接映射到指令
+2. 模糊匹配：关键词与文本的最长公共子串达到阈值才算命中，
+   因此只有包含关键词某个“阈值长度”子串的文本才需要做精确的相似度校验
+"""
+
+import difflib
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Sequence, Set
+
+_REPLACEMENTS = {
+    '打開': '打开', '开启': '打开', '开开': '打开',
+    '關': '关', '關閉': '关闭', '关上': '关闭', '關上': '关闭', '关关': '关闭',
+    '車': '车', '燈': '灯', '後備箱': '后备箱', '車窗': '车窗', '車門': '车门',
+    '音量': '音量', '聲音': '声音',
+    '門': '门', '窗戶': '窗户',
+    '雙閃': '双闪', '應急燈': '应急灯', '緊急燈': '紧急灯',
+    '霧燈': '雾灯', '示寬燈': '示宽灯', '位置燈': '位置灯',
+    '駐車燈': '停车灯', '後': '后', '前排': '前', '後排': '后',
+    '主駕': '主驾', '副駕': '副驾'
+}
+
+NEGATIVES = ('不', '不要', '别', '别开', '取消', '先不', '先不要', '先别', '暂时不要', '暂时别')
+
+
+def normalize_text(t: str) -> str:
+    if not isinstance(t, str):
+        return ''
+    t = t.strip()
+    for k, v in _REPLACEMENTS.items():
+        t = t.replace(k, v)
+    return t
+
+
+def _negated_at(text: str, idx: int, length: int) -> bool:
+    window = text[max(0, idx - 4): idx + length]
+    return any(n in window for n in NEGATIVES)
+
+
+def is_negated_hit(text: str, hits: Dict[str, int], keyword: str) -> bool:
+    """与is_negated相同，关键词位置取自扫描结果"""
+    idx = hits.get(keyword)
+    if idx is None:
+        return False
+    return _negated_at(text, idx, len(keyword))
+
+
+def is_negated(text: str, keyword: str) -> bool:
+    idx = text.find(keyword)
+    if idx == -1:
+        return False
+    return _negated_at(text, idx, len(keyword))
+
+
+def fuzzy_contains(text: str, keyword: str, threshold: float = 0.85) -> bool:
+    return _fuzzy_match(
+        normalize_text(text.lower()), normalize_text(keyword.lower()), threshold
+    )
+
+
+def _fuzzy_match(t: str, k: str, threshold: float) -> bool:
+    """t、k均已归一化"""
+    if k in t:
+        return not is_negated(t, k)
+    sm = difflib.SequenceMatcher(None, t, k)
+    match = sm.find_longest_match(0, len(t), 0, len(k))
+    if match.size == 0:
+        return False
+    score = match.size / len(k) if len(k) > 0 else 0.0
+    if score < threshold:
+        return False
+    start = match.a
+    end = start + match.size
+    window = t[max(0, start - 4): end]
+    return not any(n in window for n in NEGATIVES)
+
+
+class AhoCorasick:
+    """多模式串匹配自动机"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for pattern in set(patterns):
+            if pattern:
+                self._insert(pattern)
+        self._build()
+
+    def _insert(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(pattern)
+
+    def _build(self) -> None:
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def scan(self, text: str) -> Dict[str, int]:
+        """扫描文本，返回 {命中的模式串: 首次出现的起始位置}"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Dict[str, int] = {}
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pattern in out[state]:
+                if pattern not in found:
+                    found[pattern] = i - len(pattern) + 1
+        return found
+
+
+class KeywordMatcher:
+    """按指令顺序编译的关键词匹配器，结果与逐个关键词扫描一致"""
+
+    def __init__(
+        self,
+        commands: Mapping[str, Sequence[str]],
+        extra_words: Iterable[str] = (),
+        threshold: float = 0.85,
+    ):
+        """
+        Args:
+            commands: 有序的 {指令: 关键词列表}，靠前的指令优先
+            extra_words: 规则判断中需要检测的其他词，一并编译进自动机
+            threshold: 模糊匹配阈值（最长公共子串长度 / 关键词长度）
+        """
+        self.commands = list(commands)
+        self.threshold = threshold
+        # 精确匹配：归一化关键词 -> 指令序号
+        self._exact: Dict[str, Set[int]] = {}
+        # 模糊匹配：关键词片段 -> 模糊关键词序号
+        self._fuzzy_keywords: List[tuple] = []
+        self._fragments: Dict[str, Set[int]] = {}
+        self._always_exact: Set[int] = set()
+        self._always_fuzzy: Set[int] = set()
+
+        for rank, keywords in enumerate(commands.values()):
+            for kw in keywords:
+                nkw = normalize_text(kw)
+                if nkw:
+                    self._exact.setdefault(nkw, set()).add(rank)
+                else:
+                    self._always_exact.add(rank)
+                self._add_fuzzy(rank, normalize_text(kw.lower()))
+
+        patterns = set(self._exact) | set(self._fragments) | set(extra_words)
+        self._automaton = AhoCorasick(patterns)
+
+    def _add_fuzzy(self, rank: int, k: str) -> None:
+        index = len(self._fuzzy_keywords)
+        self._fuzzy_keywords.append((rank, k))
+        if not k:
+            self._always_fuzzy.add(index)
+            return
+        # 命中要求最长公共子串至少为min_len，即文本必然包含k的某个min_len长子串
+        n = len(k)
+        min_len = next((m for m in range(1, n + 1) if m / n >= self.threshold), None)
+        fragments = {k}
+        if min_len is not None:
+            fragments.update(k[i: i + min_len] for i in range(n - min_len + 1))
+        for fragment in fragments:
+            self._fragments.setdefault(fragment, set()).add(index)
+
+    def scan(self, text_norm: str) -> Dict[str, int]:
+        """扫描归一化后的文本，返回命中词及首次出现位置"""
+        return self._automaton.scan(text_norm)
+
+    def exact_commands(self, text_norm: str, hits: Dict[str, int]) -> List[str]:
+        """按指令顺序返回有关键词出现且未被否定的指令"""
+        ranks = set(self._always_exact)
+        for word, idx in hits.items():
+            cmd_ranks = self._exact.get(word)
+            if cmd_ranks and not _negated_at(text_norm, idx, len(word)):
+                ranks |= cmd_ranks
+        return [self.commands[r] for r in sorted(ranks)]
+
+    def fuzzy_commands(self, text_norm: str, hits: Dict[str, int]) -> List[str]:
+        """按指令顺序返回模糊匹配命中的指令"""
+        t = normalize_text(text_norm.lower())
+        if t != text_norm:
+            hits = self._automaton.scan(t)
+        candidates = set(self._always_fuzzy)
+        for word in hits:
+            indexes = self._fragments.get(word)
+            if indexes:
+                candidates |= indexes
+        ranks = set()
+        for index in candidates:
+            rank, k = self._fuzzy_keywords[index]
+            if rank not in ranks and _fuzzy_match(t, k, self.threshold):
+                ranks.add(rank)
+        return [self.commands[r] for r in sorted(ranks)]
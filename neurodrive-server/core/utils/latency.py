@@ -0,0 +1,39 @@
+"""
+耗时统计
+
+保留最近N次耗时样本，用于在系统控制接口中输出p50/p95，避免各模块各自维护deque和分位数计算
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+# 默认保留的最近样本数
+DEFAULT_WINDOW = 200
+
+
+class LatencyWindow:
+    """最近N次耗时的滑动窗口（线程安全）"""
+
+    def __init__(self, size: int = DEFAULT_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """返回样本数和p50/p95（毫秒），没有样本时返回None"""
+        with self._lock:
+            ordered = sorted(self._samples)
+            count = self.count
+        if not ordered:
+            return None
+        return {
+            "count": count,
+            "p50": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        }
@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from config.logger import setup_logging
 from core.utils import tts, llm, intent, memory, vad, asr
+from core.utils.provider_pool import provider_pool
 
 TAG = __name__
 logger = setup_logging()
@@ -19,6 +20,8 @@ def initialize_modules(
     """
     初始化所有模块组件
 
+    返回的llm实例来自共享实例池，不再使用时需要调用provider_pool.release归还
+
     Args:
         config: 配置字典
 
@@ -36,15 +39,7 @@ def initialize_modules(
     # 初始化LLM模块
     if init_llm:
         select_llm_module = config["selected_module"]["LLM"]
-        llm_type = (
-            select_llm_module
-            if "type" not in config["LLM"][select_llm_module]
-            else config["LLM"][select_llm_module]["type"]
-        )
-        modules["llm"] = llm.create_instance(
-            llm_type,
-            config["LLM"][select_llm_module],
-        )
+        modules["llm"] = initialize_llm(select_llm_module, config["LLM"][select_llm_module])
         logger.bind(tag=TAG).info(f"初始化组件: llm成功 {select_llm_module}")
 
     # 初始化Intent模块
@@ -99,6 +94,14 @@ def initialize_modules(
     return modules
 
 
+def initialize_llm(llm_name, llm_config):
+    """从实例池获取LLM，相同配置的连接共享同一实例"""
+    llm_type = llm_config.get("type", llm_name)
+    return provider_pool.acquire(
+        "LLM", llm_config, lambda: llm.create_instance(llm_type, llm_config)
+    )
+
+
 def initialize_tts(config):
     select_tts_module = config["selected_module"]["TTS"]
     tts_type = (
@@ -0,0 +1,114 @@
+"""
+Ogg Opus封装
+
+设备上行和TTS下发的音频本身就是Opus包，上报聊天记录时直接按 RFC 7845 封装为Ogg文件，
+不需要先解码为PCM再生成WAV（体积约为WAV的1/10，也省去了解码开销）
+"""
+
+import struct
+from typing import Iterable, List
+
+# Ogg使用的CRC32（多项式0x04C11DB7，不反转，初值0），与zlib.crc32不同
+_CRC_TABLE = []
+for _i in range(256):
+    _crc = _i << 24
+    for _ in range(8):
+        _crc = ((_crc << 1) ^ 0x04C11DB7) if _crc & 0x80000000 else (_crc << 1)
+    _CRC_TABLE.append(_crc & 0xFFFFFFFF)
+
+# 每页最多255个分段
+MAX_SEGMENTS = 255
+# 每页数据量达到该值后开始新的一页
+PAGE_TARGET_BYTES = 4096
+# TOC配置号对应的帧时长（单位：1/48000秒）
+_FRAME_SAMPLES = (
+    [480, 960, 1920, 2880] * 3  # SILK: 10/20/40/60ms
+    + [480, 960] * 2  # Hybrid: 10/20ms
+    + [120, 240, 480, 960] * 4  # CELT: 2.5/5/10/20ms
+)
+
+
+def _ogg_crc(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """根据TOC字节计算Opus包包含的采样数（按48kHz计）"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    frame_samples = _FRAME_SAMPLES[toc >> 3]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame_samples * frames
+
+
+class _OggWriter:
+    def __init__(self, serial: int):
+        self.serial = serial
+        self.sequence = 0
+        self.pages: List[bytes] = []
+
+    def write_page(self, packets: List[bytes], granule: int, flags: int = 0) -> None:
+        lacing = bytearray()
+        for packet in packets:
+            lacing += b"\xff" * (len(packet) // 255)
+            lacing.append(len(packet) % 255)
+        header = struct.pack(
+            "<4sBBqIIIB",
+            b"OggS",
+            0,
+            flags,
+            granule,
+            self.serial,
+            self.sequence,
+            0,
+            len(lacing),
+        )
+        page = bytearray(header + bytes(lacing) + b"".join(packets))
+        struct.pack_into("<I", page, 22, _ogg_crc(page))
+        self.pages.append(bytes(page))
+        self.sequence += 1
+
+
+def opus_packets_to_ogg(
+    packets: Iterable[bytes], sample_rate: int = 16000, channels: int = 1, serial: int = 1
+) -> bytes:
+    """将Opus包序列封装为Ogg Opus文件"""
+    writer = _OggWriter(serial)
+    opus_head = struct.pack(
+        "<8sBBHIhB", b"OpusHead", 1, channels, 0, sample_rate, 0, 0
+    )
+    writer.write_page([opus_head], 0, flags=0x02)
+    vendor = b"neurodrive"
+    opus_tags = b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)
+    writer.write_page([opus_tags], 0)
+
+    granule = 0
+    page_packets: List[bytes] = []
+    page_segments = 0
+    page_bytes = 0
+    for packet in packets:
+        if not packet:
+            continue
+        segments = len(packet) // 255 + 1
+        if page_packets and (
+            page_segments + segments > MAX_SEGMENTS or page_bytes >= PAGE_TARGET_BYTES
+        ):
+            writer.write_page(page_packets, granule)
+            page_packets, page_segments, page_bytes = [], 0, 0
+        page_packets.append(bytes(packet))
+        page_segments += segments
+        page_bytes += len(packet)
+        granule += opus_packet_samples(packet)
+    # 最后一页带结束标记（没有音频时也需要一个空的结束页）
+    writer.write_page(page_packets, granule, flags=0x04)
+    return b"".join(writer.pages)
@@ -0,0 +1,153 @@
+"""
+OGG提示音预渲染缓存
+
+按 (音色, 文本) 的内容哈希把TTS合成并转码后的OGG文件保存在缓存目录中：
+1. 请求时命中缓存直接返回磁盘文件，不再在HTTP请求中同步合成和转码
+2. 同一 (音色, 文本) 的并发请求只渲染一次
+3. 启动时及出现新音色时，在后台预渲染全部提示语
+"""
+
+import os
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Union
+
+import ffmpeg
+from config.logger import setup_logging
+from core.utils.tts_audio_cache import get_voice_key
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_CACHE_DIR = "./tmp_voice_files/cache"
+# 同时进行的渲染任务数
+DEFAULT_RENDER_CONCURRENCY = 4
+
+
+class OggRenderCache:
+    """内容寻址的OGG渲染缓存"""
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        concurrency: int = DEFAULT_RENDER_CONCURRENCY,
+    ):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.concurrency = concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._prerendered_voices = set()
+
+    def cache_path(self, voice_key: str, text: str) -> str:
+        digest = hashlib.sha256(f"{voice_key}\n{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.ogg")
+
+    def get_cached(self, tts, text: str) -> Optional[str]:
+        path = self.cache_path(get_voice_key(tts), text)
+        return path if os.path.exists(path) else None
+
+    async def get(self, tts, text: str) -> str:
+        """获取文本对应的OGG文件路径，未缓存时渲染"""
+        path = self.cache_path(get_voice_key(tts), text)
+        if os.path.exists(path):
+            return path
+
+        # 相同内容的并发请求共享同一个渲染任务
+        future = self._inflight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._render(tts, text, path))
+            self._inflight[path] = future
+            future.add_done_callback(lambda _: self._inflight.pop(path, None))
+        return await asyncio.shield(future)
+
+    async def _render(self, tts, text: str, path: str) -> str:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            tmp_file = tts.generate_filename()
+            try:
+                max_repeat_time = 5
+                while not os.path.exists(tmp_file) and max_repeat_time > 0:
+                    try:
+                        await tts.text_to_speak(text, tmp_file)
+                    except Exception as e:
+                        logger.bind(tag=TAG).warning(f"语音生成失败: {text}，错误: {e}")
+                        if os.path.exists(tmp_file):
+                            os.remove(tmp_file)
+                        max_repeat_time -= 1
+                if max_repeat_time <= 0:
+                    raise ValueError(f"语音生成失败: {text}")
+
+                await self._transcode(tmp_file, path)
+                logger.bind(tag=TAG).info(f"OGG渲染完成: {text[:20]} -> {path}")
+                return path
+            finally:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+
+    async def _transcode(self, input_file: str, output_path: str) -> None:
+        """在子进程中用ffmpeg转码，写入临时文件后原子替换"""
+        partial_path = f"{output_path}.{os.getpid()}.part"
+        args = (
+            ffmpeg.input(input_file)
+            .output(
+                partial_path,
+                format="ogg",
+                acodec="libopus",
+                audio_bitrate="16k",
+                ac=1,
+                ar=16000,
+                frame_duration=60,
+            )
+            .overwrite_output()
+            .compile()
+        )
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            error = stderr.decode("utf-8", errors="ignore")[-500:] if stderr else ""
+            raise ValueError(f"转换失败: {error}")
+        os.replace(partial_path, output_path)
+
+    def ensure_prerendered(
+        self, tts, file_string_map: Dict[str, Union[str, List[str]]]
+    ) -> Optional[asyncio.Task]:
+        """该音色首次出现时，在后台预渲染全部提示语"""
+        voice_key = get_voice_key(tts)
+        if voice_key in self._prerendered_voices:
+            return None
+        self._prerendered_voices.add(voice_key)
+        return asyncio.create_task(self._prerender(tts, voice_key, file_string_map))
+
+    async def _prerender(self, tts, voice_key: str, file_string_map) -> None:
+        texts = []
+        for value in file_string_map.values():
+            if isinstance(value, (list, tuple)):
+                texts.extend(value)
+            else:
+                texts.append(value)
+
+        logger.bind(tag=TAG).info(f"开始预渲染提示语: {voice_key}，共 {len(texts)} 条")
+        results = await asyncio.gather(
+            *(self.get(tts, text) for text in texts), return_exceptions=True
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            # 允许下次请求时重新预渲染
+            self._prerendered_voices.discard(voice_key)
+            logger.bind(tag=TAG).warning(
+                f"预渲染提示语完成: {voice_key}，失败 {len(failed)} 条: {failed[0]}"
+            )
+        else:
+            logger.bind(tag=TAG).info(f"预渲染提示语完成: {voice_key}")
+
+
+# 全局OGG渲染缓存实例
+ogg_render_cache = OggRenderCache()
@@ -36,8 +36,9 @@ class PromptManager:
 
         self.cache_manager = cache_manager
         self.CacheType = CacheType
-
-        self._load_base_template()
+        # 模板在首次构建增强提示词时加载：构造函数运行在事件循环中，
+        # 读取缓存可能需要查询共享后端，放到组件初始化线程中进行
+        self._template_loaded = False
 
     def _load_base_template(self):
         """加载基础提示词模板"""
@@ -170,6 +171,9 @@ class PromptManager:
         self, user_prompt: str, device_id: str, client_ip: str = None
     ) -> str:
         """构建增强的系统提示词"""
+        if not self._template_loaded:
+            self._template_loaded = True
+            self._load_base_template()
         if not self.base_prompt_template:
             return user_prompt
 
@@ -0,0 +1,155 @@
+"""
+提供者实例池
+
+大量设备使用相同的差异化配置时，没有必要为每个连接都创建一份提供者实例（及其HTTP客户端）。
+这里按 (模块, 生效配置的哈希) 共享实例并做引用计数：
+1. 只有不持有会话状态的提供者才能放入池中（目前为LLM和VLLM，LLM的会话数据均以session_id区分，
+   连接关闭时通过 release_session 清理）
+2. 引用归零后实例保留一段空闲时间，车机断线重连时可以直接复用
+"""
+
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_IDLE_SECONDS = 300
+
+
+class _PoolEntry:
+    __slots__ = ("module", "key", "instance", "refs", "idle_since")
+
+    def __init__(self, module: str, key: str, instance: Any):
+        self.module = module
+        self.key = key
+        self.instance = instance
+        self.refs = 0
+        self.idle_since: Optional[float] = None
+
+
+class ProviderPool:
+    """按生效配置共享的提供者实例池（线程安全）"""
+
+    def __init__(self):
+        self.enabled = True
+        self.idle_seconds = DEFAULT_IDLE_SECONDS
+        self._lock = threading.Lock()
+        self._entries: Dict[tuple, _PoolEntry] = {}
+        # id(实例) -> 池条目，用于释放
+        self._by_instance: Dict[int, _PoolEntry] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据配置设置开关和空闲保留时间"""
+        pool_config = (config or {}).get("provider_pool") or {}
+        self.enabled = str(pool_config.get("enabled", self.enabled)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        try:
+            self.idle_seconds = float(
+                pool_config.get("idle_seconds", self.idle_seconds)
+            )
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(f"provider_pool配置无效: {pool_config}")
+
+    @staticmethod
+    def config_key(module_config: Dict[str, Any]) -> str:
+        """生效配置的哈希，键的顺序不影响结果"""
+        raw = json.dumps(module_config, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def acquire(
+        self, module: str, module_config: Dict[str, Any], factory: Callable[[], Any]
+    ) -> Any:
+        """获取共享实例并增加引用，不存在时调用factory创建
+
+        调用方使用完毕后需要调用release归还
+        """
+        if not self.enabled:
+            return factory()
+
+        key = (module, self.config_key(module_config))
+        with self._lock:
+            counters = self._counters.setdefault(
+                module, {"acquires": 0, "reuses": 0, "created": 0, "evicted": 0}
+            )
+            counters["acquires"] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                counters["reuses"] += 1
+                entry.refs += 1
+                entry.idle_since = None
+                return entry.instance
+
+        # 创建实例可能较慢，不在锁内进行；并发创建时以先放入池中的为准
+        instance = factory()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(module, key[1], instance)
+                self._entries[key] = entry
+                self._by_instance[id(instance)] = entry
+                self._counters[module]["created"] += 1
+            else:
+                self._counters[module]["reuses"] += 1
+            entry.refs += 1
+            entry.idle_since = None
+            self._evict_idle_locked()
+            return entry.instance
+
+    def release(self, instance: Any) -> None:
+        """归还实例引用，非池中实例直接忽略"""
+        if instance is None:
+            return
+        with self._lock:
+            entry = self._by_instance.get(id(instance))
+            if entry is None or entry.instance is not instance or entry.refs <= 0:
+                return
+            entry.refs -= 1
+            if entry.refs == 0:
+                entry.idle_since = time.monotonic()
+            self._evict_idle_locked()
+
+    def _evict_idle_locked(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if entry.idle_since is not None
+            and now - entry.idle_since >= self.idle_seconds
+        ]
+        for key in expired:
+            entry = self._entries.pop(key)
+            self._by_instance.pop(id(entry.instance), None)
+            self._counters[entry.module]["evicted"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按模块返回实例数、引用数和复用率"""
+        with self._lock:
+            self._evict_idle_locked()
+            result = {}
+            for module, counters in self._counters.items():
+                entries = [e for e in self._entries.values() if e.module == module]
+                stats = dict(counters)
+                stats["instances"] = len(entries)
+                stats["idle_instances"] = sum(1 for e in entries if e.refs == 0)
+                stats["references"] = sum(e.refs for e in entries)
+                stats["reuse_rate"] = (
+                    round(counters["reuses"] / counters["acquires"], 3)
+                    if counters["acquires"]
+                    else 0
+                )
+                result[module] = stats
+            return result
+
+
+# 全局提供者实例池
+provider_pool = ProviderPool()
@@ -0,0 +1,381 @@
+"""
+聊天记录上报流水线
+
+所有连接共享一个上报流水线，替代原来每条记录单独提交、单独请求manager-api的方式：
+1. 音频在report线程池中编码（默认WAV；manager-api支持后可配置为Opus直接封装的Ogg）后放入内存队列
+2. 后台线程按条数（batch_size）、字节数（max_batch_bytes）或等待时间（flush_interval）凑批，
+   一次请求上报多条；manager-api不支持批量接口时自动退回逐条上报
+3. manager-api超时或不可用时，整批写入磁盘缓冲目录（spool_dir），retry_seconds后按时间顺序补报；
+   内存队列积压超过 max_pending 时也直接落盘，进程退出时未上报的记录同样落盘
+4. 统计：队列深度、积压时长、磁盘缓冲量、上报延迟
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import manage_api_client
+from config.logger import setup_logging
+from core.utils.latency import LatencyWindow
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_BATCH_BYTES = 4 * 1024 * 1024
+DEFAULT_FLUSH_INTERVAL = 2
+DEFAULT_MAX_PENDING = 2000
+DEFAULT_RETRY_SECONDS = 10
+DEFAULT_SPOOL_DIR = "tmp/report_spool"
+DEFAULT_SPOOL_MAX_MB = 512
+SPOOL_SUFFIX = ".json"
+
+# 队列中的一条记录：(入队时间, 估算大小, 上报内容)
+_Item = Tuple[float, int, Dict[str, Any]]
+
+
+class ReportPipeline:
+    """聊天记录批量上报（线程安全）"""
+
+    def __init__(self):
+        self.batch_size = DEFAULT_BATCH_SIZE
+        self.max_batch_bytes = DEFAULT_MAX_BATCH_BYTES
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self.max_pending = DEFAULT_MAX_PENDING
+        self.retry_seconds = DEFAULT_RETRY_SECONDS
+        self.spool_dir = DEFAULT_SPOOL_DIR
+        self.spool_max_bytes = DEFAULT_SPOOL_MAX_MB * 1024 * 1024
+        # 上报音频格式：wav（manager-api按WAV存储和播放）或 ogg（Opus直接封装，需要manager-api支持）
+        self.audio_format = "wav"
+        self._cond = threading.Condition()
+        self._pending: deque = deque()
+        self._pending_bytes = 0
+        # 磁盘缓冲文件：(路径, 文件大小, 最早入队时间)
+        self._spool_files: deque = deque()
+        self._spool_bytes = 0
+        self._down_until = 0.0
+        self._batch_supported = True
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "submitted": 0,
+            "delivered": 0,
+            "batches": 0,
+            "failures": 0,
+            "spooled": 0,
+            "rejected": 0,
+            "dropped": 0,
+        }
+        self._delivery_lag = LatencyWindow()
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据 chat_report 配置设置批量和磁盘缓冲参数，并启动后台上报线程"""
+        report_config = (config or {}).get("chat_report") or {}
+        try:
+            self.batch_size = max(1, int(report_config.get("batch_size", self.batch_size)))
+            self.max_batch_bytes = int(
+                report_config.get("max_batch_bytes", self.max_batch_bytes)
+            )
+            self.flush_interval = float(
+                report_config.get("flush_interval", self.flush_interval)
+            )
+            self.max_pending = max(
+                self.batch_size, int(report_config.get("max_pending", self.max_pending))
+            )
+            self.retry_seconds = float(
+                report_config.get("retry_seconds", self.retry_seconds)
+            )
+            self.spool_max_bytes = int(
+                float(report_config.get("spool_max_mb", DEFAULT_SPOOL_MAX_MB))
+                * 1024
+                * 1024
+            )
+            self.audio_format = str(report_config.get("audio_format", self.audio_format))
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(f"chat_report配置无效: {report_config}")
+        if self._thread is None:
+            self.spool_dir = report_config.get("spool_dir", self.spool_dir)
+            self._load_spool()
+        self._ensure_thread()
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._cond:
+            self._stats[name] += value
+
+    def put(self, record: Dict[str, Any]) -> None:
+        """放入一条已编码的上报记录"""
+        size = len(record.get("audioBase64") or "") + len(record.get("content") or "") * 3 + 256
+        overflow: List[_Item] = []
+        with self._cond:
+            self._stats["submitted"] += 1
+            self._pending.append((time.time(), size, record))
+            self._pending_bytes += size
+            if len(self._pending) >= self.max_pending:
+                # 上报线程跟不上（manager-api变慢），积压的记录直接落盘
+                overflow = list(self._pending)
+                self._pending.clear()
+                self._pending_bytes = 0
+            self._cond.notify()
+        if overflow:
+            logger.bind(tag=TAG).warning(f"聊天记录上报积压{len(overflow)}条，写入磁盘缓冲")
+            self._spool(overflow)
+        self._ensure_thread()
+
+    def close(self) -> None:
+        """进程退出前把内存中未上报的记录写入磁盘缓冲，下次启动后补报"""
+        with self._cond:
+            pending = list(self._pending)
+            self._pending.clear()
+            self._pending_bytes = 0
+        if pending:
+            self._spool(pending)
+
+    def _ensure_thread(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="chat-report", daemon=True
+            )
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self._deliver(batch)
+                else:
+                    self._resend_spooled()
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
+                time.sleep(1)
+
+    def _next_batch(self) -> List[_Item]:
+        """等待凑满一批；磁盘缓冲中有待补报的记录且接口可用时返回空列表"""
+        with self._cond:
+            while True:
+                timeout = self.flush_interval
+                if self._pending:
+                    age = time.time() - self._pending[0][0]
+                    if (
+                        len(self._pending) >= self.batch_size
+                        or self._pending_bytes >= self.max_batch_bytes
+                        or age >= self.flush_interval
+                    ):
+                        break
+                    timeout = self.flush_interval - age
+                if self._spool_files and self.available:
+                    return []
+                if self._spool_files:
+                    timeout = min(timeout, max(0.1, self._down_until - time.monotonic()))
+                self._cond.wait(timeout)
+
+            batch = []
+            batch_bytes = 0
+            while self._pending and len(batch) < self.batch_size:
+                size = self._pending[0][1]
+                if batch and batch_bytes + size > self.max_batch_bytes:
+                    break
+                batch.append(self._pending.popleft())
+                batch_bytes += size
+            self._pending_bytes -= batch_bytes
+            return batch
+
+    def _deliver(self, batch: List[_Item]) -> None:
+        if not manage_api_client.is_api_ready():
+            self._count("dropped", len(batch))
+            return
+        if not self.available:
+            self._spool(batch)
+            return
+        sent = self._send(batch)
+        if sent < len(batch):
+            self._spool(batch[sent:])
+
+    def _send(self, batch: List[_Item]) -> int:
+        """上报一批记录，返回已处理（成功或被拒绝）的条数；遇到可重试的错误时停止"""
+        if self._batch_supported:
+            try:
+                manage_api_client.report_batch([record for _, _, record in batch])
+                self._mark_delivered(batch)
+                return len(batch)
+            except Exception as e:
+                if manage_api_client.is_endpoint_missing(e):
+                    self._batch_supported = False
+                    logger.bind(tag=TAG).info("manager-api不支持批量上报接口，改为逐条上报")
+                elif manage_api_client.is_retryable(e):
+                    self._mark_down(e)
+                    return 0
+                else:
+                    self._count("rejected", len(batch))
+                    logger.bind(tag=TAG).error(f"聊天记录批量上报被拒绝: {e}")
+                    return len(batch)
+
+        for index, item in enumerate(batch):
+            try:
+                manage_api_client.report_record(item[2])
+                self._mark_delivered([item])
+            except Exception as e:
+                if manage_api_client.is_retryable(e):
+                    self._mark_down(e)
+                    return index
+                self._count("rejected")
+                logger.bind(tag=TAG).error(f"聊天记录上报被拒绝: {e}")
+        return len(batch)
+
+    def _mark_delivered(self, batch: List[_Item]) -> None:
+        now = time.time()
+        for enqueued_at, _, _ in batch:
+            self._delivery_lag.add(now - enqueued_at)
+        with self._cond:
+            self._stats["delivered"] += len(batch)
+            self._stats["batches"] += 1
+
+    def _mark_down(self, error: Exception) -> None:
+        was_available = self.available
+        self._down_until = time.monotonic() + self.retry_seconds
+        self._count("failures")
+        if was_available:
+            logger.bind(tag=TAG).warning(
+                f"manager-api上报失败，{self.retry_seconds}秒内写入磁盘缓冲: {error}"
+            )
+
+    def _load_spool(self) -> None:
+        """加载上次进程退出或接口不可用时留下的磁盘缓冲文件"""
+        if not os.path.isdir(self.spool_dir):
+            return
+        files = []
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith(SPOOL_SUFFIX):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                enqueued_at = int(name.split("-", 1)[0]) / 1000
+                files.append((path, os.path.getsize(path), enqueued_at))
+            except (OSError, ValueError):
+                continue
+        with self._cond:
+            self._spool_files.extend(files)
+            self._spool_bytes += sum(size for _, size, _ in files)
+        if files:
+            logger.bind(tag=TAG).info(f"发现{len(files)}个待补报的聊天记录缓冲文件")
+
+    @staticmethod
+    def _spool_payload(items: List[_Item]) -> bytes:
+        return json.dumps(
+            {
+                "enqueued_at": [enqueued_at for enqueued_at, _, _ in items],
+                "records": [record for _, _, record in items],
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+    def _spool(self, items: List[_Item]) -> None:
+        """按批写入磁盘缓冲，超过容量上限时丢弃"""
+        for start in range(0, len(items), self.batch_size):
+            chunk = items[start : start + self.batch_size]
+            payload = self._spool_payload(chunk)
+            with self._cond:
+                full = self._spool_bytes + len(payload) > self.spool_max_bytes
+            if full:
+                self._count("dropped", len(chunk))
+                logger.bind(tag=TAG).error(f"聊天记录磁盘缓冲已满，丢弃{len(chunk)}条记录")
+                continue
+            name = f"{int(chunk[0][0] * 1000)}-{uuid.uuid4().hex[:8]}{SPOOL_SUFFIX}"
+            path = os.path.join(self.spool_dir, name)
+            try:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(payload)
+                os.replace(path + ".tmp", path)
+            except OSError as e:
+                self._count("dropped", len(chunk))
+                logger.bind(tag=TAG).error(f"写入聊天记录磁盘缓冲失败: {e}")
+                continue
+            with self._cond:
+                self._spool_files.append((path, len(payload), chunk[0][0]))
+                self._spool_bytes += len(payload)
+                self._stats["spooled"] += len(chunk)
+
+    def _resend_spooled(self) -> None:
+        """补报最早的一个磁盘缓冲文件"""
+        with self._cond:
+            if not self._spool_files:
+                return
+            path, size, _ = self._spool_files[0]
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(f.read())
+            batch = [
+                (enqueued_at, 0, record)
+                for enqueued_at, record in zip(data["enqueued_at"], data["records"])
+            ]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.bind(tag=TAG).error(f"聊天记录缓冲文件损坏，已丢弃: {path} {e}")
+            batch = []
+        if batch and not manage_api_client.is_api_ready():
+            self._count("dropped", len(batch))
+            sent = len(batch)
+        else:
+            sent = self._send(batch) if batch else 0
+        if batch and sent == 0:
+            return
+        if sent < len(batch):
+            # 只有逐条上报时会部分成功，剩余部分写回原文件，仍排在队首以保持上报顺序
+            self._rewrite_spool_file(path, size, batch[sent:])
+            return
+        with self._cond:
+            self._spool_files.popleft()
+            self._spool_bytes -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _rewrite_spool_file(self, path: str, size: int, items: List[_Item]) -> None:
+        """用未上报的剩余记录覆盖队首的磁盘缓冲文件"""
+        payload = self._spool_payload(items)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(payload)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            # 无法改写时保留原文件，下次补报会重复上报已成功的部分
+            logger.bind(tag=TAG).error(f"改写聊天记录缓冲文件失败: {path} {e}")
+            return
+        with self._cond:
+            self._spool_files[0] = (path, len(payload), items[0][0])
+            self._spool_bytes += len(payload) - size
+
+    def stats(self) -> Dict[str, Any]:
+        """返回队列深度、积压时长（秒）、磁盘缓冲量和上报延迟"""
+        now = time.time()
+        with self._cond:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats["queue_depth"] = len(self._pending)
+            stats["queue_bytes"] = self._pending_bytes
+            stats["queue_lag_seconds"] = (
+                round(now - self._pending[0][0], 3) if self._pending else 0
+            )
+            stats["spool_batches"] = len(self._spool_files)
+            stats["spool_bytes"] = self._spool_bytes
+            stats["spool_lag_seconds"] = (
+                round(now - self._spool_files[0][2], 3) if self._spool_files else 0
+            )
+        stats["api_available"] = self.available
+        stats["batch_api"] = self._batch_supported
+        stats["audio_format"] = self.audio_format
+        stats["delivery_lag_ms"] = self._delivery_lag.summary()
+        return stats
+
+
+# 全局聊天记录上报流水线
+report_pipeline = ReportPipeline()
@@ -0,0 +1,256 @@
+"""
+全局工作线程调度器
+
+所有连接共享一组有界线程池，替代每个连接独立创建的线程池和常驻线程：
+1. chat: LLM对话（同步生成器）
+2. asr: 语音识别、声纹识别
+3. tts: 非流式TTS合成与音频编码
+4. report: 聊天记录上报
+5. io: 记忆保存等其他阻塞IO
+6. vad: VAD批量推理
+7. memory: 记忆向量化与Milvus读写
+
+每个连接内部的有序处理由 SessionQueue + asyncio 任务完成，不再占用独立线程。
+"""
+
+import time
+import queue
+import asyncio
+import threading
+import functools
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
+
+TAG = __name__
+
+# 默认线程池大小，可通过配置 worker_pools 覆盖
+DEFAULT_POOL_SIZES = {
+    "chat": 32,
+    "asr": 8,
+    "tts": 16,
+    "report": 4,
+    "io": 8,
+    "vad": 1,
+    "memory": 8,
+}
+
+
+class MeteredThreadPool(ThreadPoolExecutor):
+    """带饱和度统计的线程池"""
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"pool-{name}")
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._active = 0
+        self._peak_active = 0
+        self._peak_pending = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        enqueue_time = time.monotonic()
+
+        def _run():
+            start_time = time.monotonic()
+            with self._stats_lock:
+                self._active += 1
+                self._peak_active = max(self._peak_active, self._active)
+                self._total_wait += start_time - enqueue_time
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._stats_lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._stats_lock:
+                    self._active -= 1
+                    self._completed += 1
+                    self._total_run += time.monotonic() - start_time
+            return result
+
+        with self._stats_lock:
+            self._submitted += 1
+            pending = self._submitted - self._completed - self._active
+            self._peak_pending = max(self._peak_pending, pending)
+        return super().submit(_run)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回线程池的饱和度统计"""
+        with self._stats_lock:
+            pending = self._submitted - self._completed - self._active
+            completed = self._completed or 1
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "pending": pending,
+                "saturation": round(self._active / self.max_workers, 3),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "peak_active": self._peak_active,
+                "peak_pending": self._peak_pending,
+                "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+                "avg_run_ms": round(self._total_run / completed * 1000, 2),
+            }
+
+
+class WorkerScheduler:
+    """全局工作线程调度器"""
+
+    def __init__(self):
+        self._pools: Dict[str, MeteredThreadPool] = {}
+        self._sizes: Dict[str, int] = dict(DEFAULT_POOL_SIZES)
+        self._lock = threading.Lock()
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据配置设置线程池大小，只对尚未创建的线程池生效"""
+        pool_config = (config or {}).get("worker_pools") or {}
+        with self._lock:
+            for name, size in pool_config.items():
+                try:
+                    size = int(size)
+                except (TypeError, ValueError):
+                    continue
+                if size > 0 and name not in self._pools:
+                    self._sizes[name] = size
+
+    def get_pool(self, name: str) -> MeteredThreadPool:
+        """获取指定名称的共享线程池，不存在则按配置创建"""
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+        with self._lock:
+            if name not in self._pools:
+                size = self._sizes.get(name, DEFAULT_POOL_SIZES["io"])
+                self._pools[name] = MeteredThreadPool(name, size)
+            return self._pools[name]
+
+    def submit(self, name: str, fn: Callable, *args, **kwargs) -> Future:
+        """提交任务到指定线程池"""
+        return self.get_pool(name).submit(fn, *args, **kwargs)
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        """在指定线程池中执行阻塞函数，并在事件循环中等待结果"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.get_pool(name), functools.partial(fn, *args, **kwargs)
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回所有线程池的统计信息"""
+        return {name: pool.stats() for name, pool in list(self._pools.items())}
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=wait)
+            self._pools.clear()
+
+
+class SessionQueue:
+    """会话级队列
+
+    同时支持线程安全的同步读写（兼容 queue.Queue 的 get/put/get_nowait），
+    以及在事件循环中通过 async_get 等待数据，消费端无需独占线程。
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters = deque()
+
+    def put(self, item, block=True, timeout=None) -> None:
+        with self._lock:
+            self._items.append(item)
+            self._not_empty.notify()
+            waiters = list(self._waiters)
+            loop = self._loop
+        if waiters and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake_waiters, waiters)
+
+    def put_nowait(self, item) -> None:
+        self.put(item, block=False)
+
+    @staticmethod
+    def _wake_waiters(waiters) -> None:
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def get(self, block=True, timeout=None):
+        with self._not_empty:
+            if not block:
+                if not self._items:
+                    raise queue.Empty
+            elif timeout is None:
+                while not self._items:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while not self._items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._not_empty.wait(remaining)
+            return self._items.popleft()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    async def async_get(self, timeout: Optional[float] = None):
+        """在事件循环中等待数据，超时抛出 queue.Empty"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self._lock:
+                if self._items:
+                    return self._items.popleft()
+                self._loop = loop
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+            try:
+                if deadline is None:
+                    await waiter
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    try:
+                        await asyncio.wait_for(waiter, remaining)
+                    except asyncio.TimeoutError:
+                        raise queue.Empty
+            finally:
+                with self._lock:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+
+    def task_done(self) -> None:
+        pass
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def clear(self) -> int:
+        """清空队列，返回清除的条目数"""
+        with self._lock:
+            count = len(self._items)
+            self._items.clear()
+            return count
+
+
+# 创建全局调度器实例
+scheduler = WorkerScheduler()
@@ -0,0 +1,106 @@
+"""
+增量分句
+
+LLM按token流式输出，TTS需要尽早拿到第一段可以合成的文本，后续再按整句合成：
+1. 只扫描新到达的文本，未成句的部分保存在待处理缓冲中，整体开销与回复长度成线性关系
+2. 第一段：遇到逗号等子句标点即切分，但至少要有 first_min_chars 个字，避免"嗯，"这类过短的首句；
+   超过 first_max_chars 仍没有标点时强制切分（优先在空白处）
+3. 后续：按句末标点切分；单句超过 max_chars 时在最近的子句标点（逗号、顿号等）处切分，
+   避免长句迟迟不能合成
+"""
+
+from typing import Any, Dict, List, Optional
+
+from core.utils import textUtils
+
+# 句末标点
+SENTENCE_PUNCTUATIONS = frozenset("。？?！!；;：")
+# 子句标点
+CLAUSE_PUNCTUATIONS = frozenset("，～~、,")
+
+DEFAULT_FIRST_MIN_CHARS = 4
+DEFAULT_FIRST_MAX_CHARS = 40
+DEFAULT_MAX_CHARS = 120
+
+
+class SentenceSegmenter:
+    """增量分句器（非线程安全，每个TTS会话一个）"""
+
+    def __init__(
+        self,
+        first_min_chars: int = DEFAULT_FIRST_MIN_CHARS,
+        first_max_chars: int = DEFAULT_FIRST_MAX_CHARS,
+        max_chars: int = DEFAULT_MAX_CHARS,
+    ):
+        self.first_min_chars = first_min_chars
+        self.first_max_chars = first_max_chars
+        self.max_chars = max_chars
+        self.reset()
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据 tts_segment 配置设置首段和单句长度，0表示不限制"""
+        segment_config = (config or {}).get("tts_segment") or {}
+        self.first_min_chars = max(
+            0, int(segment_config.get("first_min_chars", self.first_min_chars))
+        )
+        self.first_max_chars = max(
+            0, int(segment_config.get("first_max_chars", self.first_max_chars))
+        )
+        self.max_chars = max(0, int(segment_config.get("max_chars", self.max_chars)))
+
+    def reset(self) -> None:
+        """开始新的一轮回复"""
+        self._chars: List[str] = []
+        # 最近一个可切分位置（子句标点或空白之后），-1表示没有
+        self._soft_break = -1
+        self.is_first = True
+
+    def feed(self, text: str) -> List[str]:
+        """追加一段新文本，返回本次新切分出的句子（已去除首尾标点和表情）"""
+        segments = []
+        chars = self._chars
+        for ch in text:
+            chars.append(ch)
+            size = len(chars)
+            if self.is_first:
+                if ch in SENTENCE_PUNCTUATIONS or ch in CLAUSE_PUNCTUATIONS:
+                    if size - 1 >= self.first_min_chars:
+                        self._cut(size, segments)
+                        continue
+                elif ch.isspace():
+                    self._soft_break = size
+                if self.first_max_chars and size >= self.first_max_chars:
+                    # 在空白处切分，首段过短时直接在当前位置切分
+                    cut = self._soft_break
+                    if cut - 1 < self.first_min_chars:
+                        cut = size
+                    self._cut(cut, segments)
+            elif ch in SENTENCE_PUNCTUATIONS:
+                self._cut(size, segments)
+            else:
+                if ch in CLAUSE_PUNCTUATIONS or ch.isspace():
+                    self._soft_break = size
+                if self.max_chars and size >= self.max_chars:
+                    self._cut(self._soft_break if self._soft_break > 0 else size, segments)
+        return segments
+
+    def flush(self) -> str:
+        """取出剩余未成句的文本（已去除首尾标点和表情）"""
+        remaining = "".join(self._chars)
+        self._chars.clear()
+        self._soft_break = -1
+        return textUtils.get_string_no_punctuation_or_emoji(remaining)
+
+    def _cut(self, position: int, segments: List[str]) -> None:
+        chars = self._chars
+        raw = "".join(chars[:position])
+        del chars[:position]
+        # 剩余文本不超过一句，重新查找可切分位置
+        self._soft_break = -1
+        for index, ch in enumerate(chars):
+            if ch in CLAUSE_PUNCTUATIONS or ch.isspace():
+                self._soft_break = index + 1
+        segment = textUtils.get_string_no_punctuation_or_emoji(raw)
+        if segment:
+            segments.append(segment)
+            self.is_first = False
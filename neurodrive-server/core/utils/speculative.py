@@ -0,0 +1,80 @@
+"""
+意图判定期间的推测执行
+
+规则意图与LLM对话同时开始，LLM输出先暂存在本轮的缓冲中：
+1. 意图未命中：立即按顺序放出缓冲内容，之后的输出直接下发
+2. 意图命中：丢弃缓冲内容，之后的输出全部忽略
+3. 超过等待时间仍未判定：按未命中处理，避免对话一直被挂起
+"""
+
+import asyncio
+from typing import Any, Callable, List
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+PENDING = "pending"
+RELEASED = "released"
+DROPPED = "dropped"
+
+
+class SpeculativeTurn:
+    """一轮对话的推测输出缓冲（仅在事件循环中使用）"""
+
+    def __init__(self, sink: Callable[[Any], None]):
+        """
+        Args:
+            sink: 放行后接收输出的回调，例如TTS文本队列的put
+        """
+        self.sink = sink
+        self.state = PENDING
+        self._held: List[Any] = []
+        self._timer = None
+
+    @property
+    def pending(self) -> bool:
+        return self.state == PENDING
+
+    def put(self, item) -> None:
+        """提交一条输出：判定前暂存，放行后直接下发，丢弃后忽略"""
+        if self.state == PENDING:
+            self._held.append(item)
+        elif self.state == RELEASED:
+            self.sink(item)
+
+    def release(self) -> None:
+        """意图未命中，按顺序放出暂存的输出"""
+        if self.state != PENDING:
+            return
+        self.state = RELEASED
+        held, self._held = self._held, []
+        for item in held:
+            self.sink(item)
+        self._finish()
+
+    def drop(self) -> None:
+        """意图已命中，丢弃暂存的输出"""
+        if self.state != PENDING:
+            return
+        self.state = DROPPED
+        self._held.clear()
+        self._finish()
+
+    def release_after(self, timeout: float) -> None:
+        """超时未判定时自动放行"""
+        if timeout > 0 and self.state == PENDING:
+            self._timer = asyncio.get_running_loop().call_later(
+                timeout, self._on_timeout
+            )
+
+    def _on_timeout(self) -> None:
+        if self.state == PENDING:
+            logger.bind(tag=TAG).warning("意图判定超时，放行LLM输出")
+            self.release()
+
+    def _finish(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
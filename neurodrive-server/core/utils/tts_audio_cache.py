@@ -0,0 +1,176 @@
+"""
+TTS合成结果缓存
+
+车控确认语、欢迎语等固定短句会被反复合成，这里按 (TTS实现, 生效配置, 文本, 音频格式)
+缓存已编码好的音频帧列表：
+1. 内存层：全局缓存管理器中的LRU缓存，进程内所有连接共享
+2. 磁盘层（可选）：按内容哈希保存到目录中，重启后仍可命中
+命中时跳过TTS接口调用和Opus编码
+"""
+
+import os
+import struct
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from config.logger import setup_logging
+from core.utils.cache.manager import cache_manager, CacheType
+from core.utils.provider_pool import ProviderPool
+
+TAG = __name__
+logger = setup_logging()
+
+# 只缓存不超过该长度的文本，LLM回复大多不会重复
+DEFAULT_MAX_TEXT_LENGTH = 40
+# 初始化后仍可能被修改、影响合成结果的TTS属性（生效配置之外单独计入）
+VOICE_ATTRS = (
+    "voice",
+    "speaker",
+    "voice_id",
+    "voice_type",
+    "model",
+    "format",
+    "sample_rate",
+    "audio_file_type",
+)
+# 磁盘文件中每帧的长度前缀
+FRAME_HEADER = struct.Struct(">I")
+
+
+def get_voice_key(tts) -> str:
+    """根据TTS实现类型、生效配置的哈希和音色相关属性生成音色标识
+
+    语速、音量、参考音频、自定义请求参数等都会改变合成结果，因此按整份配置区分
+    """
+    parts = [f"{type(tts).__module__}.{type(tts).__name__}"]
+    config = getattr(tts, "config", None)
+    if isinstance(config, dict):
+        parts.append(ProviderPool.config_key(config))
+    for attr in VOICE_ATTRS:
+        value = getattr(tts, attr, None)
+        if isinstance(value, (str, int, float)) and value != "":
+            parts.append(f"{attr}={value}")
+    return "|".join(parts)
+
+
+class TTSAudioCache:
+    """进程级TTS合成结果缓存（线程安全，供tts线程池中的任务调用）"""
+
+    def __init__(self):
+        self.enabled = True
+        self.max_text_length = DEFAULT_MAX_TEXT_LENGTH
+        self.disk_dir = ""
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据配置设置缓存开关、可缓存文本长度和磁盘目录"""
+        cache_config = (config or {}).get("tts_cache") or {}
+        try:
+            self.enabled = str(cache_config.get("enabled", self.enabled)).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
+            self.max_text_length = int(
+                cache_config.get("max_text_length", self.max_text_length)
+            )
+            self.disk_dir = cache_config.get("disk_dir", self.disk_dir) or ""
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(f"tts_cache配置无效: {cache_config}")
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def cacheable(self, text: Optional[str]) -> bool:
+        return bool(self.enabled and text and len(text) <= self.max_text_length)
+
+    def _cache_key(self, tts, text: str, audio_format: str) -> str:
+        raw = f"{get_voice_key(tts)}\n{audio_format}\n{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, tts, text: str, audio_format: str) -> Optional[List[bytes]]:
+        """获取缓存的音频帧列表，未命中返回None"""
+        if not self.cacheable(text):
+            return None
+        key = self._cache_key(tts, text, audio_format)
+        audio_datas = cache_manager.get(CacheType.TTS_AUDIO, key)
+        if audio_datas is not None:
+            self._count("hits")
+            return audio_datas
+
+        audio_datas = self._disk_load(key)
+        if audio_datas is not None:
+            cache_manager.set(CacheType.TTS_AUDIO, key, audio_datas)
+            self._count("hits")
+            self._count("disk_hits")
+            return audio_datas
+
+        self._count("misses")
+        return None
+
+    def put(self, tts, text: str, audio_format: str, audio_datas: List[bytes]) -> None:
+        """保存合成结果"""
+        if not audio_datas or not self.cacheable(text):
+            return
+        key = self._cache_key(tts, text, audio_format)
+        audio_datas = [bytes(frame) for frame in audio_datas]
+        cache_manager.set(CacheType.TTS_AUDIO, key, audio_datas)
+        self._disk_store(key, audio_datas)
+        self._count("stores")
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _disk_load(self, key: str) -> Optional[List[bytes]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            audio_datas = []
+            offset = 0
+            while offset < len(data):
+                (size,) = FRAME_HEADER.unpack_from(data, offset)
+                offset += FRAME_HEADER.size
+                audio_datas.append(data[offset : offset + size])
+                offset += size
+            return audio_datas
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"读取TTS磁盘缓存失败: {path}，错误: {e}")
+            return None
+
+    def _disk_store(self, key: str, audio_datas: List[bytes]) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        partial_path = f"{path}.{threading.get_ident()}.part"
+        try:
+            with open(partial_path, "wb") as f:
+                for frame in audio_datas:
+                    f.write(FRAME_HEADER.pack(len(frame)))
+                    f.write(frame)
+            os.replace(partial_path, path)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"写入TTS磁盘缓存失败: {path}，错误: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0
+        return stats
+
+
+# 全局TTS合成结果缓存实例
+tts_audio_cache = TTSAudioCache()
@@ -0,0 +1,49 @@
+"""
+TTS流水线统计
+
+非流式TTS在播放当前句子的同时预先合成后续句子，打断时通过轮次代号丢弃旧的合成结果。
+这里汇总所有连接的流水线计数和耗时：
+1. first_audio：从开始调用大模型到首段音频开始下发的耗时（每轮一次）
+2. first_token_to_frame：从LLM首个token到达到首段音频合成完成的耗时，反映分句和合成带来的延迟
+3. synthesis：单句合成耗时（含缓存命中）
+4. skipped：打断后尚未开始就被跳过的合成；discarded：合成完成但因打断未播放的句子
+"""
+
+import threading
+from typing import Any, Dict
+
+from core.utils.latency import LatencyWindow
+
+
+class TTSPipelineStats:
+    """TTS流水线统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "turns": 0,
+            "interrupts": 0,
+            "synthesized": 0,
+            "skipped": 0,
+            "discarded": 0,
+            "errors": 0,
+        }
+        self.first_audio = LatencyWindow()
+        self.first_token_to_frame = LatencyWindow()
+        self.synthesis = LatencyWindow()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        stats["first_audio_ms"] = self.first_audio.summary()
+        stats["first_token_to_frame_ms"] = self.first_token_to_frame.summary()
+        stats["synthesis_ms"] = self.synthesis.summary()
+        return stats
+
+
+# 全局TTS流水线统计
+tts_pipeline_stats = TTSPipelineStats()
@@ -27,7 +27,7 @@ class UserWakeupWordsManager:
         cache_key = self._get_cache_key(device_id, "car")
         
         # 尝试从缓存获取
-        cached_word = cache_manager.get(CacheType.WAKEUP_WORDS, cache_key)
+        cached_word = await cache_manager.aget(CacheType.WAKEUP_WORDS, cache_key)
         if cached_word is not None:
             return cached_word
         
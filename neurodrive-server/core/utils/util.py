@@ -776,74 +776,158 @@ def analyze_emotion(text):
     return top_emotions[0]  # 如果都不在优先级列表里，返回第一个
 
 
-def audio_to_data(audio_file_path, is_opus=True):
+# 设备端播放使用的音频参数
+TARGET_SAMPLE_RATE = 16000
+OPUS_FRAME_DURATION = 60  # 60ms per frame
+OPUS_FRAME_SIZE = TARGET_SAMPLE_RATE * OPUS_FRAME_DURATION // 1000  # 960 samples/frame
+# 降采样时抗混叠滤波器的阶数
+RESAMPLE_FILTER_TAPS = 63
+
+
+def create_opus_encoder():
+    """创建与pcm_to_data输出格式一致的Opus编码器，可在同一会话内复用"""
+    return opuslib_next.Encoder(TARGET_SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+
+
+def resample_pcm16(samples, src_rate, dst_rate=TARGET_SAMPLE_RATE):
+    """将单声道int16采样重采样到目标采样率，降采样前先做低通滤波"""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples.astype(np.int16, copy=False)
+
+    data = samples.astype(np.float32)
+    if dst_rate < src_rate:
+        # 加窗sinc低通滤波，截止频率为目标采样率的奈奎斯特频率
+        cutoff = dst_rate / src_rate / 2
+        n = np.arange(RESAMPLE_FILTER_TAPS) - (RESAMPLE_FILTER_TAPS - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(RESAMPLE_FILTER_TAPS)
+        taps /= taps.sum()
+        data = np.convolve(data, taps.astype(np.float32), mode="same")
+
+    dst_len = int(round(len(data) * dst_rate / src_rate))
+    positions = np.arange(dst_len, dtype=np.float64) * (src_rate / dst_rate)
+    resampled = np.interp(positions, np.arange(len(data)), data)
+    return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+
+def normalize_pcm(raw_data, sample_rate, channels=1, sample_width=2):
+    """把PCM数据转换为单声道/16kHz/16位小端编码，返回(PCM字节, 时长秒)"""
+    if sample_width == 1:
+        samples = (np.frombuffer(raw_data, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sample_width == 2:
+        samples = np.frombuffer(raw_data, dtype="<i2")
+    elif sample_width == 3:
+        usable = len(raw_data) - len(raw_data) % 3
+        b = np.frombuffer(raw_data[:usable], dtype=np.uint8).reshape(-1, 3)
+        samples = (b[:, 1].astype(np.int16) | (b[:, 2].astype(np.int16) << 8))
+    elif sample_width == 4:
+        samples = (np.frombuffer(raw_data, dtype="<i4") >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"不支持的采样位宽: {sample_width}")
+
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = (
+            samples[:usable].reshape(-1, channels).astype(np.int32).mean(axis=1)
+        ).astype(np.int16)
+
+    duration = len(samples) / sample_rate if sample_rate else 0
+    samples = resample_pcm16(samples, sample_rate)
+    return samples.astype("<i2", copy=False).tobytes(), duration
+
+
+def decode_wav_bytes(audio_bytes):
+    """在进程内解析PCM编码的wav，返回(16kHz单声道PCM字节, 时长秒)，无法解析时返回None"""
+    try:
+        with wave.open(BytesIO(audio_bytes), "rb") as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            sample_rate = wf.getframerate()
+            raw_data = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError):
+        # 浮点、压缩编码等非PCM的wav交给ffmpeg处理
+        return None
+    return normalize_pcm(raw_data, sample_rate, channels, sample_width)
+
+
+def _decode_with_ffmpeg(source, file_type):
+    """通过pydub调用ffmpeg解码其他格式，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞"""
+    audio = AudioSegment.from_file(source, format=file_type, parameters=["-nostdin"])
+    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
+    audio = (
+        audio.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+    )
+    # 音频时长(秒)
+    return audio.raw_data, len(audio) / 1000.0
+
+
+def audio_to_data(audio_file_path, is_opus=True, encoder=None):
     # 获取文件后缀名
     file_type = os.path.splitext(audio_file_path)[1]
     if file_type:
         file_type = file_type.lstrip(".")
-    # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
-    audio = AudioSegment.from_file(
-        audio_file_path, format=file_type, parameters=["-nostdin"]
-    )
 
-    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-
-    # 音频时长(秒)
-    duration = len(audio) / 1000.0
+    if file_type == "wav":
+        with open(audio_file_path, "rb") as f:
+            decoded = decode_wav_bytes(f.read())
+        if decoded is not None:
+            raw_data, duration = decoded
+            return pcm_to_data(raw_data, is_opus, encoder), duration
 
-    # 获取原始PCM数据（16位小端）
-    raw_data = audio.raw_data
-    return pcm_to_data(raw_data, is_opus), duration
+    raw_data, duration = _decode_with_ffmpeg(audio_file_path, file_type)
+    return pcm_to_data(raw_data, is_opus, encoder), duration
 
 
-def audio_bytes_to_data(audio_bytes, file_type, is_opus=True):
+def audio_bytes_to_data(
+    audio_bytes, file_type, is_opus=True, encoder=None, sample_rate=TARGET_SAMPLE_RATE
+):
     """
-    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    直接用音频二进制数据转为opus/pcm数据，支持wav、pcm、mp3、p3
+    wav和pcm在进程内解码，其他格式才调用ffmpeg
     """
     if file_type == "p3":
         # 直接用p3解码
         return p3.decode_opus_from_bytes(audio_bytes)
-    else:
-        # 其他格式用pydub
-        audio = AudioSegment.from_file(
-            BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
-        )
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-        duration = len(audio) / 1000.0
-        raw_data = audio.raw_data
-        return pcm_to_data(raw_data, is_opus), duration
-
-
-def pcm_to_data(raw_data, is_opus=True):
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
-    # 编码参数
-    frame_duration = 60  # 60ms per frame
-    frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
-
-    datas = []
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
-
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
+    if file_type == "pcm":
+        # 裸PCM按16位单声道处理
+        raw_data, duration = normalize_pcm(audio_bytes, sample_rate)
+        return pcm_to_data(raw_data, is_opus, encoder), duration
+    if file_type == "wav":
+        decoded = decode_wav_bytes(audio_bytes)
+        if decoded is not None:
+            raw_data, duration = decoded
+            return pcm_to_data(raw_data, is_opus, encoder), duration
+
+    # 其他格式用pydub
+    raw_data, duration = _decode_with_ffmpeg(BytesIO(audio_bytes), file_type)
+    return pcm_to_data(raw_data, is_opus, encoder), duration
+
+
+def iter_pcm_frames(raw_data, is_opus=True, encoder=None):
+    """按60ms分帧并逐帧产出opus/pcm数据（最后一帧不足时补零）"""
+    if is_opus and encoder is None:
+        encoder = create_opus_encoder()
+
+    frame_bytes = OPUS_FRAME_SIZE * 2  # 16bit=2bytes/sample
+    view = memoryview(raw_data)
+    for i in range(0, len(view), frame_bytes):
+        chunk = view[i : i + frame_bytes]
+        if len(chunk) < frame_bytes:
+            chunk = bytes(chunk) + b"\x00" * (frame_bytes - len(chunk))
+        else:
+            chunk = bytes(chunk)
 
         if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
-            # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
+            yield encoder.encode(chunk, OPUS_FRAME_SIZE)
         else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
+            yield chunk
 
-        datas.append(frame_data)
 
-    return datas
+def pcm_to_data(raw_data, is_opus=True, encoder=None):
+    """
+    将16kHz单声道PCM转换为opus/pcm帧列表
+    encoder: 可选的Opus编码器，传入时复用（同一会话按顺序调用），否则新建
+    """
+    return list(iter_pcm_frames(raw_data, is_opus, encoder))
 
 
 def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
@@ -919,6 +1003,22 @@ def check_asr_update(before_config, new_config):
     return update_asr
 
 
+def check_llm_update(before_config, new_config):
+    """所选LLM及其参数均未变化时可以复用已有实例"""
+    if (
+        new_config.get("selected_module") is None
+        or new_config["selected_module"].get("LLM") is None
+    ):
+        return False
+    current_llm_module = before_config["selected_module"].get("LLM")
+    new_llm_module = new_config["selected_module"]["LLM"]
+    if current_llm_module != new_llm_module:
+        return True
+    current_llm_config = before_config.get("LLM", {}).get(current_llm_module)
+    new_llm_config = (new_config.get("LLM") or {}).get(new_llm_module)
+    return current_llm_config != new_llm_config
+
+
 def filter_sensitive_info(config: dict) -> dict:
     """
     过滤配置中的敏感信息
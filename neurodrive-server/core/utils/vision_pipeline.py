@@ -0,0 +1,178 @@
+"""
+视觉分析流水线
+
+视觉解释接口运行在aiohttp事件循环中，这里负责把耗时步骤移出事件循环：
+1. 提供者实例：相同VLLM配置共享实例（provider_pool），不再每个请求新建客户端
+2. 图片预处理：安装了Pillow时在io线程池中缩放并重新编码为JPEG，减少上传体积；未安装时原样上传
+3. 模型调用：优先使用提供者的异步接口，并发数受 max_concurrency 限制，排队超时直接返回繁忙
+4. 统计：请求数、排队/预处理/模型调用耗时、上传字节数
+"""
+
+import io
+import time
+import base64
+import asyncio
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+from config.logger import setup_logging
+from core.utils import vllm
+from core.utils.scheduler import scheduler
+from core.utils.latency import LatencyWindow
+from core.utils.provider_pool import provider_pool
+
+TAG = __name__
+logger = setup_logging()
+
+# 是否可以进行图片缩放（需要Pillow）
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_QUEUE_TIMEOUT = 10
+DEFAULT_MAX_IMAGE_SIDE = 1280
+DEFAULT_JPEG_QUALITY = 85
+
+
+def downscale_image(image_data: bytes, max_side: int, quality: int) -> bytes:
+    """将图片缩放到最长边不超过max_side并编码为JPEG，已满足要求的JPEG原样返回"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        is_jpeg = image.format == "JPEG"
+        if is_jpeg and max(image.size) <= max_side:
+            return image_data
+        # JPEG可以在解码时直接按比例缩小，减少解码开销
+        image.draft("RGB", (max_side, max_side))
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side))
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality)
+    encoded = output.getvalue()
+    # 已经是JPEG且重新编码后没有变小时保留原图
+    if is_jpeg and len(encoded) >= len(image_data):
+        return image_data
+    return encoded
+
+
+class VisionPipeline:
+    """视觉分析流水线（仅在事件循环中使用）"""
+
+    def __init__(self):
+        self.max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.queue_timeout = DEFAULT_QUEUE_TIMEOUT
+        self.downscale = True
+        self.max_image_side = DEFAULT_MAX_IMAGE_SIDE
+        self.jpeg_quality = DEFAULT_JPEG_QUALITY
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "rejected": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+        self._latencies: Dict[str, LatencyWindow] = {
+            name: LatencyWindow()
+            for name in ("queue", "preprocess", "model", "total")
+        }
+
+    def configure(self, config: Optional[Dict[str, Any]]) -> None:
+        """根据 vision 配置设置并发数与图片预处理参数"""
+        vision_config = (config or {}).get("vision") or {}
+        try:
+            self.max_concurrency = max(
+                1, int(vision_config.get("max_concurrency", self.max_concurrency))
+            )
+            self.queue_timeout = float(
+                vision_config.get("queue_timeout", self.queue_timeout)
+            )
+            self.downscale = str(vision_config.get("downscale", self.downscale)).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
+            self.max_image_side = int(
+                vision_config.get("max_image_side", self.max_image_side)
+            )
+            self.jpeg_quality = int(vision_config.get("jpeg_quality", self.jpeg_quality))
+        except (TypeError, ValueError):
+            logger.bind(tag=TAG).warning(f"vision配置无效: {vision_config}")
+        self._semaphore = None
+        if self.downscale and not PIL_AVAILABLE:
+            logger.bind(tag=TAG).warning("未安装Pillow，视觉分析图片将原样上传")
+
+    def _prepare_image(self, image_data: bytes) -> Tuple[str, int]:
+        """缩放图片（可选）并编码为base64，返回 (base64, 上传字节数)"""
+        if self.downscale and PIL_AVAILABLE:
+            try:
+                image_data = downscale_image(
+                    image_data, self.max_image_side, self.jpeg_quality
+                )
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"图片缩放失败，使用原图: {e}")
+        return base64.b64encode(image_data).decode("utf-8"), len(image_data)
+
+    async def explain(
+        self, vllm_name: str, vllm_config: Dict[str, Any], question: str, image_data: bytes
+    ) -> str:
+        """分析图片，返回模型回复；排队超时抛出 TimeoutError"""
+        begin = time.monotonic()
+        self._stats["requests"] += 1
+        self._stats["bytes_in"] += len(image_data)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._semaphore
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise TimeoutError("视觉分析请求过多，请稍后再试")
+
+        self._in_flight += 1
+        provider = None
+        try:
+            vllm_type = vllm_config.get("type", vllm_name)
+            provider = provider_pool.acquire(
+                "VLLM", vllm_config, lambda: vllm.create_instance(vllm_type, vllm_config)
+            )
+            queued = time.monotonic()
+            image_base64, upload_size = await scheduler.run(
+                "io", self._prepare_image, image_data
+            )
+            self._stats["bytes_out"] += upload_size
+            prepared = time.monotonic()
+            result = await provider.response_async(question, image_base64)
+            done = time.monotonic()
+
+            self._latencies["queue"].add(queued - begin)
+            self._latencies["preprocess"].add(prepared - queued)
+            self._latencies["model"].add(done - prepared)
+            self._latencies["total"].add(done - begin)
+            logger.bind(tag=TAG).debug(
+                f"视觉分析耗时: 排队 {queued - begin:.3f}s, 预处理 {prepared - queued:.3f}s, "
+                f"模型 {done - prepared:.3f}s"
+            )
+            return result
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            provider_pool.release(provider)
+            self._in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回请求计数与各阶段耗时（毫秒，p50/p95）"""
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["in_flight"] = self._in_flight
+        stats["max_concurrency"] = self.max_concurrency
+        stats["downscale"] = self.downscale and PIL_AVAILABLE
+        for name, window in self._latencies.items():
+            stats[f"{name}_ms"] = window.summary()
+        return stats
+
+
+# 全局视觉分析流水线
+vision_pipeline = VisionPipeline()
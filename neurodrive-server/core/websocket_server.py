@@ -2,10 +2,17 @@ import asyncio
 import websockets
 from config.logger import setup_logging
 from core.connection import ConnectionHandler
-from config.config_loader import get_config_from_api
+from config.config_loader import get_config_from_api, config_store
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
 from core.handle.sendAudioHandle import send_tts_message
+from core.utils.scheduler import scheduler
+from core.providers.tools.server_mcp import mcp_pool
+from core.utils.tts_audio_cache import tts_audio_cache
+from core.utils.device_config_cache import device_config_cache
+from core.utils.provider_pool import provider_pool
+from core.utils.cache.manager import cache_manager
+from core.utils.report_pipeline import report_pipeline
 import uuid
 
 TAG = __name__
@@ -16,6 +23,20 @@ class WebSocketServer:
         self.config = config
         self.logger = setup_logging()
         self.config_lock = asyncio.Lock()
+        # 所有连接共享的工作线程池
+        scheduler.configure(self.config)
+        # 所有连接共享的服务端MCP服务
+        mcp_pool.configure(self.config)
+        # 所有连接共享的TTS合成结果缓存
+        tts_audio_cache.configure(self.config)
+        # 所有连接共享的设备差异化配置缓存
+        device_config_cache.configure(self.config)
+        # 相同配置的连接共享提供者实例
+        provider_pool.configure(self.config)
+        # 多副本部署时共享的缓存后端
+        cache_manager.configure_backend(self.config)
+        # 所有连接共享的聊天记录上报流水线
+        report_pipeline.configure(self.config)
         modules = initialize_modules(
             self.logger,
             self.config,
@@ -33,6 +54,8 @@ class WebSocketServer:
         self._memory = modules["memory"] if "memory" in modules else None
 
         self.active_connections = set()
+        # 设备ID -> 连接 的索引，连接认证后注册，断开时移除
+        self.device_connections = {}
 
         # 是否默认进入群聊
         self.debug_group_chat = False 
@@ -80,12 +103,57 @@ class WebSocketServer:
             self.logger.bind(tag=TAG).error(f"处理连接时出错: {e}")
         finally:
             self.active_connections.discard(handler)
+            self.unregister_device(handler)
             try:
                 if hasattr(websocket, 'closed') and not websocket.closed:
                     await websocket.close()
             except Exception as close_error:
                 self.logger.bind(tag=TAG).error(f"关闭连接时出错: {close_error}")
 
+    def register_device(self, handler):
+        """注册设备连接，同一设备重连时新连接覆盖旧连接"""
+        device_id = getattr(handler, "device_id", None)
+        if not device_id:
+            return
+        old_handler = self.device_connections.get(device_id)
+        if old_handler is not None and old_handler is not handler:
+            self.logger.bind(tag=TAG).info(f"设备 {device_id} 重复连接，使用最新连接")
+        self.device_connections[device_id] = handler
+
+    def unregister_device(self, handler):
+        """移除设备连接索引，只移除仍指向该连接的条目"""
+        device_id = getattr(handler, "device_id", None)
+        if device_id and self.device_connections.get(device_id) is handler:
+            del self.device_connections[device_id]
+
+    def get_connection(self, device_id):
+        """按设备ID查找在线连接，O(1)"""
+        if not device_id:
+            return None
+        return self.device_connections.get(device_id)
+
+    def get_online_connections(self, exclude_device=None):
+        """获取所有已注册设备的连接"""
+        return [
+            conn
+            for device_id, conn in list(self.device_connections.items())
+            if device_id != exclude_device
+        ]
+
+    def get_group_connections(self, group_id, exclude_device=None):
+        """获取群组中在线成员的连接"""
+        group_info = self.active_groups.get(group_id)
+        if not group_info:
+            return []
+        connections = []
+        for member_device_id in group_info.get("members", []):
+            if member_device_id == exclude_device:
+                continue
+            conn = self.device_connections.get(member_device_id)
+            if conn is not None:
+                connections.append(conn)
+        return connections
+
     async def _verify_connection_health(self, websocket):
         """验证连接健康状态"""
         try:
@@ -125,8 +193,10 @@ class WebSocketServer:
                 self.logger.bind(tag=TAG).info(
                     f"检查VAD和ASR类型是否需要更新: {update_vad} {update_asr}"
                 )
-                # 更新配置
+                # 更新配置：整体替换快照，已建立的连接继续使用旧快照
                 self.config = new_config
+                version = config_store.publish(new_config)
+                self.logger.bind(tag=TAG).info(f"配置快照已更新至版本 {version}")
                 # 重新初始化组件
                 modules = initialize_modules(
                     self.logger,
@@ -145,6 +215,8 @@ class WebSocketServer:
                 if "asr" in modules:
                     self._asr = modules["asr"]
                 if "llm" in modules:
+                    # 已建立的连接仍持有旧实例，这里只归还服务端的引用
+                    provider_pool.release(self._llm)
                     self._llm = modules["llm"]
                 if "intent" in modules:
                     self._intent = modules["intent"]
@@ -0,0 +1,306 @@
+"""
+指令意图匹配性能测试
+
+对比编译后的关键词匹配器与原逐词扫描实现：
+1. 逐条比较两者的匹配结果，输出不一致的语句
+2. 分别统计单条语句的平均耗时
+
+用法：python performance_tester_intent.py [语料文件]
+语料文件每行一条识别文本（例如从聊天记录中导出的ASR结果），不指定时使用内置样例
+"""
+
+import re
+import sys
+import time
+import difflib
+import statistics
+
+from tabulate import tabulate
+
+from core.handle.intentHandler import (
+    cmd_keywords,
+    match_command,
+    extract_commands,
+    get_command_matcher,
+    DEFAULT_WAKEUP_WORDS,
+)
+
+SAMPLE_UTTERANCES = [
+    "小宝小宝",
+    "打开车窗",
+    "把左前窗降下来",
+    "副驾驶的窗户升起来",
+    "关闭后排右窗",
+    "先不要开窗",
+    "打开双闪",
+    "关闭应急灯",
+    "打开后雾灯",
+    "开一下示宽灯",
+    "开大灯",
+    "把车门打开",
+    "解锁车门",
+    "锁上所有车门",
+    "启动发动机",
+    "熄火",
+    "打開後備箱",
+    "關上後備箱",
+    "声音太小了",
+    "小点声",
+    "音量调到五十",
+    "拉个峨眉山旅游群",
+    "退出群聊",
+    "再见",
+    "今天天气怎么样",
+    "给我讲个笑话吧",
+    "小宝，打开双闪，大灯，后雾灯，启动发动机",
+    "有点热，把窗户打开一点",
+    "帮我导航到最近的加油站",
+    "别关车灯",
+]
+
+
+# ---------------- 原实现（仅用于对比结果） ----------------
+
+def _legacy_normalize_text(t):
+    if not isinstance(t, str):
+        return ''
+    t = t.strip()
+    replacements = {
+        '打開': '打开', '开启': '打开', '开开': '打开',
+        '關': '关', '關閉': '关闭', '关上': '关闭', '關上': '关闭', '关关': '关闭',
+        '車': '车', '燈': '灯', '後備箱': '后备箱', '車窗': '车窗', '車門': '车门',
+        '音量': '音量', '聲音': '声音',
+        '門': '门', '窗戶': '窗户',
+        '雙閃': '双闪', '應急燈': '应急灯', '緊急燈': '紧急灯',
+        '霧燈': '雾灯', '示寬燈': '示宽灯', '位置燈': '位置灯',
+        '駐車燈': '停车灯', '後': '后', '前排': '前', '後排': '后',
+        '主駕': '主驾', '副駕': '副驾'
+    }
+    for k, v in replacements.items():
+        t = t.replace(k, v)
+    return t
+
+
+def _legacy_is_negated(text, keyword):
+    idx = text.find(keyword)
+    if idx == -1:
+        return False
+    window = text[max(0, idx - 4): idx + len(keyword)]
+    negatives = ['不', '不要', '别', '别开', '取消', '先不', '先不要', '先别', '暂时不要', '暂时别']
+    return any(n in window for n in negatives)
+
+
+def _legacy_fuzzy_contains(text, keyword, threshold=0.85):
+    t = _legacy_normalize_text(text.lower())
+    k = _legacy_normalize_text(keyword.lower())
+    if k in t:
+        return not _legacy_is_negated(t, k)
+    sm = difflib.SequenceMatcher(None, t, k)
+    match = sm.find_longest_match(0, len(t), 0, len(k))
+    if match.size == 0:
+        return False
+    score = match.size / len(k) if len(k) > 0 else 0.0
+    if score < threshold:
+        return False
+    start = match.a
+    end = start + match.size
+    window = t[max(0, start - 4): end]
+    negatives = ['不', '不要', '别', '别开', '取消', '先不', '先不要', '先别', '暂时不要', '暂时别']
+    return not any(n in window for n in negatives)
+
+
+def legacy_match_command(keywords_map, text, exclude_cmds=()):
+    text_norm = _legacy_normalize_text(text)
+
+    has_door = any(w in text_norm for w in ["车门", "门"])
+    has_window = any(w in text_norm for w in ["车窗", "窗户", "窗"])
+    has_open_kw = any(w in text_norm for w in ["打开", "开", "升", "升起", "升上", "抬起", "升高"]) and not any(w in text_norm for w in ["降", "降下", "下降", "落下", "降低"])
+    has_close_kw = any(w in text_norm for w in ["关闭", "关", "降", "降下", "下降", "落下", "降低"]) and not any(w in text_norm for w in ["升", "升起", "升上", "抬起", "升高"])
+    has_unlock = any(w in text_norm for w in ["解锁", "解鎖"])
+
+    if any(w in text_norm for w in ["双闪", "应急灯", "紧急灯", "危险警示灯", "危险报警灯", "警示灯"]):
+        if has_close_kw and not _legacy_is_negated(text_norm, "关"):
+            return "close_EmergencyFlasher"
+        if has_open_kw and not _legacy_is_negated(text_norm, "开"):
+            return "open_EmergencyFlasher"
+
+    has_front_fog = any(w in text_norm for w in ["前雾灯", "前雾"])
+    has_rear_fog = any(w in text_norm for w in ["后雾灯", "后雾"])
+    has_fog_generic = "雾灯" in text_norm
+    if (has_rear_fog or (has_fog_generic and not has_front_fog)):
+        if has_close_kw and not _legacy_is_negated(text_norm, "关"):
+            return "close_RearFogLamp"
+        if has_open_kw and not _legacy_is_negated(text_norm, "开"):
+            return "open_RearFogLamp"
+
+    if any(w in text_norm for w in ["停车灯", "示宽灯", "位置灯"]):
+        if has_close_kw and not _legacy_is_negated(text_norm, "关"):
+            return "close_StopLight"
+        if has_open_kw and not _legacy_is_negated(text_norm, "开"):
+            return "open_StopLight"
+
+    if any(w in text_norm for w in ["车灯", "大灯"]) and not any(w in text_norm for w in ["双闪", "应急灯", "紧急灯", "危险警示灯", "危险报警灯", "停车灯", "示宽灯", "位置灯", "雾灯"]):
+        if has_close_kw and not _legacy_is_negated(text_norm, "关"):
+            return "light_off"
+        if has_open_kw and not _legacy_is_negated(text_norm, "开"):
+            return "light_on"
+
+    if has_window:
+        is_left = any(w in text_norm for w in ["左", "主驾", "驾驶位", "驾驶员"])
+        is_right = any(w in text_norm for w in ["右", "副驾", "副驾驶"])
+        is_front = any(w in text_norm for w in ["前", "前排", "驾驶位", "副驾", "主驾"])
+        is_rear = any(w in text_norm for w in ["后", "后排", "后座"])
+        has_open_alt = any(w in text_norm for w in ["降", "降下", "下降", "落下"])
+        has_close_alt = any(w in text_norm for w in ["升", "升起", "升上", "抬起"])
+        open_kw = (has_open_kw and not _legacy_is_negated(text_norm, "开")) or has_open_alt
+        close_kw = (has_close_kw and not _legacy_is_negated(text_norm, "关")) or has_close_alt
+        if open_kw and close_kw:
+            if not any(w in text_norm for w in ["升","升起","升上","抬起"]):
+                close_kw = False
+        if is_left and is_front:
+            if close_kw:
+                return "close_LeftFrontWindow"
+            if open_kw:
+                return "open_LeftFrontWindow"
+        if is_right and is_front:
+            if close_kw:
+                return "close_RightFrontWindow"
+            if open_kw:
+                return "open_RightFrontWindow"
+        if is_left and is_rear:
+            if close_kw:
+                return "close_LeftRearWindow"
+            if open_kw:
+                return "open_LeftRearWindow"
+        if is_right and is_rear:
+            if close_kw:
+                return "close_RightRearWindow"
+            if open_kw:
+                return "open_RightRearWindow"
+
+    if has_door and has_unlock and not _legacy_is_negated(text_norm, "解锁"):
+        return "unlock_door"
+    if has_door and has_open_kw and not _legacy_is_negated(text_norm, "开"):
+        return "unlock_door"
+    if has_window and not any(w in text_norm for w in ["左","右","前","后","主驾","副驾","驾驶位","副驾驶","前排","后排"]) and has_open_kw and not _legacy_is_negated(text_norm, "开"):
+        return "open_windows"
+    if has_window and not any(w in text_norm for w in ["左","右","前","后","主驾","副驾","驾驶位","副驾驶","前排","后排"]) and has_close_kw and not _legacy_is_negated(text_norm, "关"):
+        return "close_windows"
+
+    skip_lock = False
+    if ("解锁" in text_norm) or ("解鎖" in text_norm):
+        for kw in keywords_map.get("unlock_door", []):
+            nkw = _legacy_normalize_text(kw)
+            if nkw in text_norm and not _legacy_is_negated(text_norm, nkw):
+                return "unlock_door"
+        skip_lock = True
+
+    for cmd, keywords in keywords_map.items():
+        if cmd in exclude_cmds:
+            continue
+        if skip_lock and cmd == "lock_door":
+            continue
+        for kw in keywords:
+            nkw = _legacy_normalize_text(kw)
+            if nkw in text_norm and not _legacy_is_negated(text_norm, nkw):
+                return cmd
+
+    for cmd, keywords in keywords_map.items():
+        if cmd in exclude_cmds:
+            continue
+        if any(_legacy_fuzzy_contains(text_norm, kw) for kw in keywords):
+            return cmd
+    return None
+
+
+def legacy_extract_commands(keywords_map, text):
+    text_norm = _legacy_normalize_text(text)
+    matches = []
+    has_open_kw = any(w in text_norm for w in ["打开","开"]) and not any(w in text_norm for w in ["降","降下","下降","落下","降低"])
+    has_close_kw = any(w in text_norm for w in ["关闭","关"]) and not any(w in text_norm for w in ["升","升起","升上","抬起","升高"])
+    if has_open_kw and has_close_kw and ("打开" in text_norm) and not any(w in text_norm for w in ["升","升起","升上","抬起"]):
+        has_close_kw = False
+    for cmd, keywords in keywords_map.items():
+        for kw in keywords:
+            if _legacy_fuzzy_contains(text_norm, kw):
+                if cmd.startswith("close_") and not has_close_kw:
+                    continue
+                if cmd.startswith("open_") and not has_open_kw and cmd not in ("unlock_door",):
+                    continue
+                if cmd not in matches:
+                    matches.append(cmd)
+                break
+    directional = {
+        "open_LeftFrontWindow","close_LeftFrontWindow",
+        "open_RightFrontWindow","close_RightFrontWindow",
+        "open_LeftRearWindow","close_LeftRearWindow",
+        "open_RightRearWindow","close_RightRearWindow",
+    }
+    if any(d in matches for d in directional):
+        matches = [m for m in matches if m not in ("open_windows","close_windows")]
+    for seg in re.split(r'[，,、;；。\.]+', text):
+        c = legacy_match_command(keywords_map, seg)
+        if c and c not in matches:
+            matches.append(c)
+    return matches
+
+
+# ---------------- 测试 ----------------
+
+def load_corpus(path=None):
+    if not path:
+        return SAMPLE_UTTERANCES
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def measure(fn, corpus, rounds):
+    """返回每条语句的平均耗时（微秒）列表"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        timings.append((time.perf_counter() - start) / len(corpus) * 1e6)
+    return timings
+
+
+def main():
+    corpus = load_corpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    keywords_map = {cmd: list(keywords[0]) for cmd, keywords in cmd_keywords.items()}
+    keywords_map["wakeup"] = list(DEFAULT_WAKEUP_WORDS)
+
+    build_start = time.perf_counter()
+    get_command_matcher.cache_clear()
+    matcher = get_command_matcher()
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    mismatches = []
+    for text in corpus:
+        old = (legacy_match_command(keywords_map, text), legacy_extract_commands(keywords_map, text))
+        new = (match_command(matcher, text), extract_commands(matcher, text))
+        if old != new:
+            mismatches.append([text, old, new])
+
+    rounds = 20
+    rows = []
+    for name, fn in (
+        ("legacy match", lambda t: legacy_match_command(keywords_map, t)),
+        ("compiled match", lambda t: match_command(matcher, t)),
+        ("legacy extract", lambda t: legacy_extract_commands(keywords_map, t)),
+        ("compiled extract", lambda t: extract_commands(matcher, t)),
+    ):
+        timings = measure(fn, corpus, rounds)
+        rows.append([name, f"{statistics.median(timings):.1f}", f"{min(timings):.1f}"])
+
+    print(f"语料 {len(corpus)} 条，匹配器编译耗时 {build_ms:.1f}ms")
+    print(tabulate(rows, headers=["实现", "中位数(us/条)", "最快(us/条)"], tablefmt="github"))
+    if mismatches:
+        print(f"\n结果不一致 {len(mismatches)} 条：")
+        print(tabulate(mismatches, headers=["文本", "原实现", "新实现"], tablefmt="github"))
+    else:
+        print("\n两种实现的匹配结果完全一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -120,13 +120,10 @@ async def handle_create_group_async(conn, group_name: str, invitation_message: s
     group_id = str(uuid.uuid4().hex)
     
     # 获取所有在线设备（排除当前设备）
-    online_devices = []
-    for connection in conn.server.active_connections:
-        if hasattr(connection, 'device_id') and connection.device_id != current_device_id:
-            online_devices.append({
-                'device_id': connection.device_id,
-                'connection': connection
-            })
+    online_devices = [
+        {'device_id': connection.device_id, 'connection': connection}
+        for connection in conn.server.get_online_connections(exclude_device=current_device_id)
+    ]
     
     if not online_devices:
         logger.bind(tag=TAG).info("当前没有其他在线设备可以邀请")